@@ -0,0 +1,63 @@
+"""Throughput of the dataset scripts (merge, relabel, resplit, subsample) on generated datasets."""
+import os
+import shutil
+import tempfile
+
+from common import make_yolo_dataset, measure, quiet, result
+
+
+def run(opts):
+    import changing_labels
+    import dataset_resplit
+    import merge_4_datasets
+    import subsample_dataset
+
+    records = []
+    work = tempfile.mkdtemp(prefix="robodog_bench_")
+    try:
+        for n in opts.dataset_sizes:
+            src = make_yolo_dataset(os.path.join(work, f"src{n}"), n_images=n, num_classes=2)
+            params = {"images": n}
+            out = os.path.join(work, "out")
+
+            def fresh():
+                shutil.rmtree(out, ignore_errors=True)
+
+            def merge():
+                fresh()
+                for i, mapping in enumerate([merge_4_datasets.dataset2_mapping, merge_4_datasets.dataset4_mapping]):
+                    for split in ("train", "valid", "test"):
+                        merge_4_datasets.process_split(src, split, out, f"ds{i + 1}_{split}", mapping)
+
+            def relabel():
+                fresh()
+                for split in ("train", "valid", "test"):
+                    changing_labels.process_split(os.path.join(src, split), os.path.join(out, split))
+
+            def resplit():
+                fresh()
+                dataset_resplit.SOURCE_DIR, dataset_resplit.DEST_DIR = src, out
+                dataset_resplit.create_directory_structure()
+                pairs = dataset_resplit.get_image_label_pairs()
+                dataset_resplit.copy_files(dataset_resplit.split_dataset(pairs))
+
+            def subsample():
+                # Subsample deletes files, so it works on a fresh copy; the copy is timed separately
+                fresh()
+                shutil.copytree(src, out)
+                subsample_dataset.subsample(out, [0, 1], max(1, n // 10), ["train", "valid", "test"])
+
+            def copy_only():
+                fresh()
+                shutil.copytree(src, out)
+
+            # merge processes the source twice (two datasets)
+            for name, fn, items in [("merge", merge, 2 * n), ("relabel", relabel, n), ("resplit", resplit, n * 0.9),
+                                    ("subsample_with_copy", subsample, n), ("copytree_baseline", copy_only, n)]:
+                print(f"  {name} images={n}")
+                with quiet():
+                    stats = measure(fn, repeat=max(3, opts.repeat // 4), warmup=1)
+                records.append(result("datasets", name, params, stats, items=items, item_unit="images"))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return records
@@ -0,0 +1,52 @@
+"""YOLO.predict latency/throughput per backend and batch size."""
+import importlib.util
+import os
+
+from common import load_photo, measure, result
+
+# Ultralytics export format → package needed to run it
+BACKENDS = {"torch": None, "onnx": "onnxruntime", "openvino": "openvino", "torchscript": None}
+
+
+def load_backend(model_path, backend, imgsz, prebuilt=None):
+    """YOLO model for a backend, exporting from the torch model if needed; None if unavailable"""
+    from ultralytics import YOLO
+
+    if backend == "torch":
+        return YOLO(model_path)
+    if prebuilt:
+        return YOLO(prebuilt, task="detect")
+    required = BACKENDS.get(backend)
+    if required and importlib.util.find_spec(required) is None:
+        print(f"  skipping {backend}: {required} is not installed")
+        return None
+    try:
+        exported = YOLO(model_path).export(format=backend, imgsz=imgsz, dynamic=True, verbose=False)
+    except Exception as e:
+        print(f"  skipping {backend}: export failed ({e})")
+        return None
+    return YOLO(exported, task="detect")
+
+
+def run(opts):
+    records = []
+    frames = [load_photo(i) for i in range(max(opts.batch_sizes))]
+    prebuilt = dict(spec.split("=", 1) for spec in opts.backend_model)
+    for backend in opts.backends:
+        model = load_backend(opts.model, backend, opts.imgsz, prebuilt.get(backend))
+        if model is None:
+            continue
+        for batch in opts.batch_sizes:
+            source = frames[:batch]
+            print(f"  predict {backend} batch={batch} imgsz={opts.imgsz}")
+            try:
+                stats = measure(lambda: model.predict(source=source, imgsz=opts.imgsz, verbose=False),
+                                repeat=opts.repeat, warmup=2)
+            except Exception as e:
+                print(f"  skipping {backend} batch={batch}: {e}")
+                continue
+            records.append(result("inference", "predict",
+                                  {"backend": backend, "batch": batch, "imgsz": opts.imgsz,
+                                   "model": os.path.basename(opts.model)},
+                                  stats, items=batch, item_unit="images"))
+    return records
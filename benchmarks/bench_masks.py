@@ -0,0 +1,39 @@
+"""red_mask / white_mask (and the full coefficient calls) per resolution.
+
+Throughput counts the pixels each call actually processes: red_coefficient only
+masks its centre ROI, white_coefficient the whole frame unless use_roi is set.
+"""
+from common import load_photo, measure, result
+
+RESOLUTIONS = [(320, 240), (640, 480), (1280, 720), (1920, 1080)]
+
+
+def coefficient_pixels(output, w, h):
+    """Pixels masked by a coefficient call: its ROI box, or the whole frame when it returns None"""
+    box = output[1]
+    if box is None:
+        return w * h
+    x0, y0, x1, y1 = box
+    return (x1 - x0) * (y1 - y0)
+
+
+def run(opts):
+    from red_coefficient_photo import SAT_MIN, VAL_MIN, red_coefficient, red_mask
+    from white_coefficient_photo import white_coefficient, white_mask
+
+    records = []
+    for w, h in RESOLUTIONS:
+        frame = load_photo(1, (w, h))
+        params = {"resolution": f"{w}x{h}"}
+        cases = [
+            ("red_mask", lambda: red_mask(frame, SAT_MIN, VAL_MIN), None),
+            ("white_mask", lambda: white_mask(frame), None),
+            ("red_coefficient", lambda: red_coefficient(frame), coefficient_pixels),
+            ("white_coefficient", lambda: white_coefficient(frame), coefficient_pixels),
+        ]
+        for name, fn, pixels in cases:
+            print(f"  {name} {w}x{h}")
+            stats = measure(fn, repeat=opts.repeat * 5, warmup=3)
+            px = pixels(fn(), w, h) if pixels else w * h
+            records.append(result("masks", name, params, stats, items=px / 1e6, item_unit="Mpx"))
+    return records
@@ -0,0 +1,28 @@
+"""Process startup of `robodog-cv <command> --help`, next to a bare interpreter and a full torch import."""
+import os
+import subprocess
+import sys
+
+from common import REPO_ROOT, measure, result
+
+COMMANDS = ["detect", "track", "button", "coef red", "merge", "relabel", "resplit", "subsample", "stats"]
+
+
+def run(opts):
+    cli = os.path.join(REPO_ROOT, "robodog_cv.py")
+    cases = [("python", {"command": "-c pass"}, [sys.executable, "-c", "pass"])]
+    cases += [("cli_help", {"command": c}, [sys.executable, cli] + c.split() + ["--help"]) for c in COMMANDS]
+    # What every command used to pay when ultralytics was imported at module top level
+    cases.append(("import_ultralytics", {"command": "-c import ultralytics"},
+                  [sys.executable, "-c", "import ultralytics"]))
+
+    records = []
+    for name, params, cmd in cases:
+        print(f"  {name} {params['command']}")
+
+        def start():
+            subprocess.run(cmd, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+        stats = measure(start, repeat=max(5, opts.repeat // 2), warmup=1)
+        records.append(result("startup", name, params, stats))
+    return records
@@ -0,0 +1,89 @@
+"""Per-frame cost of the tracking.py loop: detection, threshold filter, DeepSORT update."""
+import numpy as np
+
+from common import load_photo, measure, result
+
+
+def synthetic_detections(n, frame_idx, width, height, rng):
+    """n boxes drifting a few pixels per frame, in DeepSORT's ([x, y, w, h], score, cls) format"""
+    dets = []
+    for i in range(n):
+        x = (50 + 97 * i + 3 * frame_idx) % (width - 120)
+        y = (40 + 61 * i + 2 * frame_idx) % (height - 120)
+        dets.append(([float(x), float(y), 80.0 + i % 5 * 8, 100.0], 0.5 + 0.4 * rng.random(), i % 3))
+    return dets
+
+
+def make_tracker():
+    """DeepSORT as tracking.py configures it; falls back to externally supplied embeddings"""
+    from deep_sort_realtime.deepsort_tracker import DeepSort
+    try:
+        return DeepSort(max_age=30, n_init=3, max_cosine_distance=0.2), "mobilenet"
+    except Exception as e:
+        print(f"  default embedder unavailable ({e}); timing with precomputed embeddings")
+        return DeepSort(max_age=30, n_init=3, max_cosine_distance=0.2, embedder=None), "none"
+
+
+def run(opts):
+    from thresholds import class_threshold_mask
+
+    records = []
+    frame = load_photo(0, (1280, 720))
+    rng = np.random.default_rng(0)
+    for n_dets in opts.track_dets:
+        tracker, embedder = make_tracker()
+        state = {"i": 0}
+
+        def step():
+            dets = synthetic_detections(n_dets, state["i"], frame.shape[1], frame.shape[0], rng)
+            state["i"] += 1
+            if embedder == "none":
+                tracker.update_tracks(dets, embeds=[rng.random(128) for _ in dets])
+            else:
+                tracker.update_tracks(dets, frame=frame)
+
+        print(f"  deepsort update dets={n_dets} embedder={embedder}")
+        stats = measure(step, repeat=opts.repeat * 2, warmup=5)
+        records.append(result("tracking", "deepsort_update", {"detections": n_dets, "embedder": embedder},
+                              stats, items=1, item_unit="frames"))
+
+        if embedder != "none":
+            # Same stream through the embedding cache (static-ish boxes reuse their track's embedding)
+            from embedding_cache import EmbeddingCache
+            tracker, _ = make_tracker()
+            cache = EmbeddingCache(tracker)
+            state["i"] = 0
+
+            def cached_step():
+                dets = synthetic_detections(n_dets, state["i"], frame.shape[1], frame.shape[0], rng)
+                state["i"] += 1
+                cache.update_tracks(dets, frame)
+
+            print(f"  deepsort update dets={n_dets} embedding cache")
+            stats = measure(cached_step, repeat=opts.repeat * 2, warmup=5)
+            records.append(result("tracking", "deepsort_update_cached", {"detections": n_dets, "embedder": embedder},
+                                  stats, items=1, item_unit="frames"))
+
+    # Full tracking.py frame: predict + per-class filter + DeepSORT
+    from ultralytics import YOLO
+    model = YOLO(opts.model)
+    thresholds = np.full(max(len(model.names), 1), 0.25, np.float32)
+    tracker, embedder = make_tracker()
+
+    def frame_step():
+        r = model(frame, imgsz=opts.imgsz, verbose=False)[0]
+        xyxy, scores, classes = r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy(), r.boxes.cls.cpu().numpy()
+        keep = class_threshold_mask(classes, scores, thresholds)
+        dets = [([float(x1), float(y1), float(x2 - x1), float(y2 - y1)], float(s), int(c))
+                for (x1, y1, x2, y2), s, c in zip(xyxy[keep], scores[keep], classes[keep])]
+        if embedder == "none":
+            tracker.update_tracks(dets, embeds=[rng.random(128) for _ in dets])
+        else:
+            tracker.update_tracks(dets, frame=frame)
+
+    print(f"  tracking.py frame imgsz={opts.imgsz}")
+    stats = measure(frame_step, repeat=opts.repeat, warmup=2)
+    records.append(result("tracking", "tracking_frame", {"imgsz": opts.imgsz, "embedder": embedder,
+                                                         "resolution": "1280x720"},
+                          stats, items=1, item_unit="frames"))
+    return records
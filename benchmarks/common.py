@@ -0,0 +1,131 @@
+"""
+Shared helpers for the benchmark suite: timing, machine info and synthetic
+YOLO datasets.
+"""
+import contextlib
+import io
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_ROOT, "scripts")
+PHOTOS = [os.path.join(REPO_ROOT, "photos", f"IMG_775{i}.JPG") for i in (7, 8, 9)]
+
+# Repo modules are flat scripts; make both the root and scripts/ importable
+for path in (REPO_ROOT, SCRIPTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def measure(fn, repeat=20, warmup=2, min_time=0.0):
+    """
+    Time fn() `repeat` times after `warmup` untimed calls (and keep going until
+    min_time seconds have elapsed). Returns summary stats in milliseconds.
+    """
+    for _ in range(warmup):
+        fn()
+    times = []
+    start = time.perf_counter()
+    while len(times) < repeat or time.perf_counter() - start < min_time:
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    ms = np.array(times) * 1000
+    return {"runs": len(ms), "median_ms": float(np.median(ms)), "mean_ms": float(ms.mean()),
+            "p95_ms": float(np.percentile(ms, 95)), "min_ms": float(ms.min())}
+
+
+def result(group, name, params, stats, items=None, item_unit=None):
+    """One benchmark record; `items` per call turns median time into a throughput"""
+    record = {"group": group, "name": name, "params": params, **stats}
+    if items:
+        record["throughput"] = items / (stats["median_ms"] / 1000.0)
+        record["throughput_unit"] = f"{item_unit}/s"
+    return record
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the per-file prints of the dataset scripts while timing them"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _version(module):
+    try:
+        return __import__(module).__version__
+    except Exception:
+        return None
+
+
+def machine_info():
+    info = {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or None,
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "cv2_threads": cv2.getNumThreads(),
+        "torch": _version("torch"),
+        "ultralytics": _version("ultralytics"),
+    }
+    try:
+        import torch
+        info["torch_threads"] = torch.get_num_threads()
+        info["cuda"] = torch.cuda.get_device_name(0) if torch.cuda.is_available() else None
+    except ImportError:
+        pass
+    try:
+        info["git_commit"] = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                                     stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["git_commit"] = None
+    return info
+
+
+def load_photo(index=0, size=None):
+    """One of the bundled IMG_775*.JPG photos (synthetic noise if missing), optionally resized to (w, h)"""
+    image = cv2.imread(PHOTOS[index % len(PHOTOS)])
+    if image is None:
+        image = np.random.default_rng(index).integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA) if size else image
+
+
+def make_yolo_dataset(root, n_images=200, num_classes=3, image_size=64, splits=("train", "valid", "test"),
+                      max_boxes=4, seed=0):
+    """
+    Write a small random YOLO dataset: root/<split>/images/*.jpg + labels/*.txt,
+    split 80/10/10. Returns root.
+    """
+    rng = random.Random(seed)
+    ok, jpg = cv2.imencode(".jpg", np.full((image_size, image_size, 3), 127, np.uint8))
+    jpg = jpg.tobytes()
+    shares = [0.8, 0.1, 0.1][:len(splits)]
+    counts = [int(n_images * s) for s in shares]
+    counts[0] += n_images - sum(counts)
+    idx = 0
+    for split, count in zip(splits, counts):
+        os.makedirs(os.path.join(root, split, "images"), exist_ok=True)
+        os.makedirs(os.path.join(root, split, "labels"), exist_ok=True)
+        for _ in range(count):
+            name = f"img_{idx:06d}"
+            with open(os.path.join(root, split, "images", name + ".jpg"), "wb") as f:
+                f.write(jpg)
+            lines = []
+            for _ in range(rng.randint(1, max_boxes)):
+                w, h = rng.uniform(0.05, 0.4), rng.uniform(0.05, 0.4)
+                lines.append(f"{rng.randrange(num_classes)} {rng.uniform(w / 2, 1 - w / 2):.6f} "
+                             f"{rng.uniform(h / 2, 1 - h / 2):.6f} {w:.6f} {h:.6f}")
+            with open(os.path.join(root, split, "labels", name + ".txt"), "w") as f:
+                f.write("\n".join(lines) + "\n")
+            idx += 1
+    return root
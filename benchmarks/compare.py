@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmarks/run.py result files and flag regressions.
+
+Cases are matched on (group, name, params). A case regresses when its median
+time grew by more than --threshold (relative); exit status is 1 if any did,
+so the comparison can gate a change.
+
+Example:
+  python benchmarks/compare.py benchmarks/results/baseline.json /tmp/after.json --threshold 0.10
+"""
+import argparse
+import json
+import sys
+
+
+def case_key(record):
+    return (record["group"], record["name"], json.dumps(record["params"], sort_keys=True))
+
+
+def compare(old, new, threshold=0.10, metric="median_ms"):
+    """Rows of (key, old value, new value, relative change, status)"""
+    old_cases = {case_key(r): r for r in old["results"]}
+    new_cases = {case_key(r): r for r in new["results"]}
+    rows = []
+    for key in sorted(set(old_cases) | set(new_cases)):
+        if key not in new_cases:
+            rows.append((key, old_cases[key][metric], None, None, "missing"))
+            continue
+        if key not in old_cases:
+            rows.append((key, None, new_cases[key][metric], None, "new"))
+            continue
+        a, b = old_cases[key][metric], new_cases[key][metric]
+        change = (b - a) / a if a > 0 else 0.0
+        status = "REGRESSION" if change > threshold else "faster" if change < -threshold else "ok"
+        rows.append((key, a, b, change, status))
+    return rows
+
+
+def machine_differences(old, new):
+    keys = ["platform", "processor", "cpu_count", "python", "torch", "ultralytics", "opencv", "torch_threads", "cuda"]
+    return [(k, old["machine"].get(k), new["machine"].get(k)) for k in keys
+            if old["machine"].get(k) != new["machine"].get(k)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flag regressions between two benchmark result files.")
+    parser.add_argument("baseline", help="Older result JSON")
+    parser.add_argument("candidate", help="Newer result JSON")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown that counts as a regression (default: 0.10 = 10%%)")
+    parser.add_argument("--metric", default="median_ms", choices=["median_ms", "mean_ms", "p95_ms", "min_ms"])
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        old = json.load(f)
+    with open(args.candidate) as f:
+        new = json.load(f)
+
+    diffs = machine_differences(old, new)
+    if diffs:
+        print("Warning: results come from different environments:")
+        for k, a, b in diffs:
+            print(f"  {k}: {a} -> {b}")
+        print()
+
+    rows = compare(old, new, args.threshold, args.metric)
+    print(f"{'group':<10} {'case':<22} {'params':<58} {'old':>9} {'new':>9} {'change':>8}  status")
+    for (group, name, params), a, b, change, status in rows:
+        params = ", ".join(f"{k}={v}" for k, v in json.loads(params).items())
+        a = f"{a:.2f}" if a is not None else "-"
+        b = f"{b:.2f}" if b is not None else "-"
+        change = f"{change:+.1%}" if change is not None else "-"
+        print(f"{group:<10} {name:<22} {params:<58} {a:>9} {b:>9} {change:>8}  {status}")
+
+    regressions = sum(r[-1] == "REGRESSION" for r in rows)
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%} on {args.metric}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
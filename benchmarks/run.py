@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Headless CPU benchmark suite.
+
+Groups:
+  inference  YOLO.predict per backend (torch; onnx/openvino/torchscript when their runtimes are installed)
+             and batch size on the bundled photos/IMG_775*.JPG
+  tracking   DeepSORT update per number of detections, and a full tracking.py frame
+  masks      red_mask / white_mask and the coefficient functions per resolution
+  datasets   merge, relabel, resplit and subsample on generated YOLO datasets
+  startup    process start of each `robodog-cv <command> --help`
+
+The default model is the yolo11n architecture with random weights, so the suite
+runs offline; pass trained weights with --model for real numbers (latency does
+not depend on the weights). Results go to a JSON file with machine info;
+compare two runs with benchmarks/compare.py.
+
+Example:
+  python benchmarks/run.py --output benchmarks/results/baseline.json
+  python benchmarks/run.py --groups masks datasets --quick --output /tmp/after.json
+  python benchmarks/compare.py benchmarks/results/baseline.json /tmp/after.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+# common sets up sys.path for the repo's flat modules
+from common import machine_info
+
+GROUPS = ["inference", "tracking", "masks", "datasets", "startup"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the robodog-cv benchmark suite (CPU, headless).")
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=GROUPS, help="Benchmark groups to run")
+    parser.add_argument("--output", default=None,
+                        help="Result JSON (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--model", default="yolo11n.yaml", help="Model weights or architecture yaml")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "openvino"],
+                        help="Inference backends to try")
+    parser.add_argument("--backend-model", nargs="*", default=[], metavar="BACKEND=PATH",
+                        help="Use an already exported model for a backend, e.g. onnx=best.onnx")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8], help="predict batch sizes")
+    parser.add_argument("--track-dets", type=int, nargs="+", default=[5, 20], help="Detections per frame for DeepSORT")
+    parser.add_argument("--dataset-sizes", type=int, nargs="+", default=[500, 2000], help="Generated dataset sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed repetitions per case")
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions and smaller inputs (smoke run)")
+    parser.add_argument("--threads", type=int, default=None, help="Pin torch/OpenCV threads for reproducibility")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.repeat = 5
+        args.batch_sizes = [1, 4]
+        args.track_dets = [5]
+        args.dataset_sizes = [200]
+    if args.threads:
+        import cv2
+        import torch
+        cv2.setNumThreads(args.threads)
+        torch.set_num_threads(args.threads)
+
+    results = {"machine": machine_info(), "settings": {k: v for k, v in vars(args).items() if k != "output"},
+               "started": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": []}
+    for group in args.groups:
+        print(f"[{group}]")
+        module = __import__(f"bench_{group}")
+        start = time.perf_counter()
+        try:
+            records = module.run(args)
+        except ImportError as e:
+            print(f"  skipping group {group}: {e}")
+            continue
+        results["results"].extend(records)
+        print(f"  {len(records)} cases in {time.perf_counter() - start:.1f}s")
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results",
+                                         time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{'group':<10} {'case':<22} {'params':<58} {'median ms':>10} {'throughput':>18}")
+    for r in results["results"]:
+        params = ", ".join(f"{k}={v}" for k, v in r["params"].items())
+        tp = f"{r['throughput']:.1f} {r['throughput_unit']}" if "throughput" in r else ""
+        print(f"{r['group']:<10} {r['name']:<22} {params:<58} {r['median_ms']:>10.2f} {tp:>18}")
+    print(f"\nResults written to: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Two-model detection cascade: a small model on every frame, the large one only when needed.
+
+The small (nano) model runs on every frame at the bottom of the uncertainty
+band. Its detections are split into:
+  certain    score >= band high, and not a high-precision class: kept as they are
+  uncertain  band low <= score < band high, or any detection of a class listed
+             in `precise_classes` (e.g. ones that trigger an action on the robot)
+Frames without uncertain detections are done after the small model, which is
+the common case in an empty corridor. Otherwise the large model decides: on
+crops around the uncertain boxes (batched, merged with roi_inference's window
+logic), or on the whole frame when the crops would cover more than
+`max_crop_area` of it, or always with escalation="full". Uncertain small-model
+boxes are dropped; the large model's detections above `conf` replace them and
+are merged with the certain ones by class-aware NMS (intersection over the
+smaller box, so a box cut by a crop edge does not survive next to the full
+one). Both models must have the same class list; a mismatch is a ValueError.
+
+Usage:
+  cascade = CascadeDetector(YOLO("runs/detect/midterm/weights/best.pt"), YOLO("runs/detect/train2/weights/best.pt"))
+  boxes, scores, classes = cascade(frame)           # cascade.last_mode: "small" / "crops x2" / "full"
+  print(cascade.escalation_rate)
+
+scripts/cascade_eval.py reports escalation rate against accuracy on a validation set.
+"""
+import numpy as np
+
+from detections import empty_detections, merge_detections, results_to_arrays
+from roi_inference import roi_windows
+from thresholds import class_threshold_mask
+
+UNCERTAIN_LOW = 0.1            # small-model detections below this are discarded
+UNCERTAIN_HIGH = 0.5           # ...and at or above this are accepted without the large model
+CROP_IMGSZ = 320               # large-model inference size for crops
+CROP_MARGIN = 0.5              # context around each uncertain box, as a fraction of its size
+MAX_CROP_AREA = 0.5            # run the large model on the full frame when crops cover more than this
+MERGE_IOU = 0.5                # overlap (intersection over the smaller box) for merging the two models
+ESCALATION_MODES = ("auto", "crops", "full")
+
+
+class CascadeDetector:
+    def __init__(self, small, large, conf=0.25, band=(UNCERTAIN_LOW, UNCERTAIN_HIGH), precise_classes=(),
+                 thresholds=None, imgsz=None, crop_imgsz=CROP_IMGSZ, escalation="auto", margin=CROP_MARGIN,
+                 max_crop_area=MAX_CROP_AREA, iou=MERGE_IOU):
+        if escalation not in ESCALATION_MODES:
+            raise ValueError(f"escalation must be one of {ESCALATION_MODES}, got {escalation!r}")
+        # Detections of both models are merged by class id, so the ids must mean the same classes
+        if small.names != large.names:
+            raise ValueError(f"small and large models have different classes: {small.names} vs {large.names}")
+        self.small = small
+        self.large = large
+        self.conf = conf
+        self.low, self.high = band
+        self.precise = set(int(c) for c in precise_classes)
+        self.thresholds = thresholds
+        self.imgsz = imgsz
+        self.crop_imgsz = crop_imgsz
+        self.escalation = escalation
+        self.margin = margin
+        self.max_crop_area = max_crop_area
+        self.iou = iou
+        self.frames = 0
+        self.escalations = 0
+        self.full_escalations = 0
+        self.crops = 0
+        self.last_mode = "small"
+
+    @property
+    def escalation_rate(self):
+        return self.escalations / self.frames if self.frames else 0.0
+
+    def _predict(self, model, source, conf, imgsz):
+        kwargs = {"imgsz": imgsz} if imgsz else {}
+        return model.predict(source=source, conf=conf, verbose=False, **kwargs)
+
+    def _large(self, frame, uncertain_boxes):
+        """Large-model detections for the uncertain regions, in frame pixels"""
+        fh, fw = frame.shape[:2]
+        windows = [] if self.escalation == "full" else roi_windows(uncertain_boxes, frame.shape, self.margin)
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in windows)
+        if not windows or (self.escalation == "auto" and area > self.max_crop_area * fh * fw):
+            self.full_escalations += 1
+            self.last_mode = "full"
+            return results_to_arrays(self._predict(self.large, frame, self.conf, self.imgsz)[0])
+
+        self.crops += len(windows)
+        self.last_mode = f"crops x{len(windows)}"
+        results = self._predict(self.large, [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in windows],
+                                self.conf, self.crop_imgsz)
+        all_boxes, all_scores, all_classes = [], [], []
+        for result, (x0, y0, _, _) in zip(results, windows):
+            boxes, scores, classes = results_to_arrays(result)
+            boxes[:, [0, 2]] += x0
+            boxes[:, [1, 3]] += y0
+            all_boxes.append(boxes)
+            all_scores.append(scores)
+            all_classes.append(classes)
+        return np.concatenate(all_boxes), np.concatenate(all_scores), np.concatenate(all_classes)
+
+    def __call__(self, frame):
+        """Detections (boxes, scores, classes) in frame pixels for this frame"""
+        self.frames += 1
+        boxes, scores, classes = results_to_arrays(
+            self._predict(self.small, frame, min(self.low, self.conf), self.imgsz)[0])
+        precise = np.isin(classes, list(self.precise)) if self.precise else np.zeros(len(classes), bool)
+        uncertain = (scores >= self.low) & ((scores < self.high) | precise)
+        certain = (scores >= self.high) & ~precise
+
+        if not uncertain.any():
+            self.last_mode = "small"
+            out = boxes[certain], scores[certain], classes[certain]
+        else:
+            self.escalations += 1
+            large = self._large(frame, boxes[uncertain])
+            if len(large[0]):
+                out = merge_detections(np.concatenate([boxes[certain], large[0]]),
+                                       np.concatenate([scores[certain], large[1]]),
+                                       np.concatenate([classes[certain], large[2]]), self.iou, metric="ios")
+            else:
+                out = boxes[certain], scores[certain], classes[certain]
+
+        boxes, scores, classes = out
+        if not len(boxes):
+            return empty_detections()
+        if self.thresholds is not None:
+            keep = class_threshold_mask(classes, scores, self.thresholds)
+        else:
+            keep = scores >= self.conf
+        return boxes[keep], scores[keep], classes[keep]
+
+
+def add_cascade_args(parser):
+    parser.add_argument("--cascade", type=str, default=None, metavar="LARGE_WEIGHTS",
+                        help="Large model to escalate uncertain frames to (--model is then the small one)")
+    parser.add_argument("--uncertain", type=float, nargs=2, default=[UNCERTAIN_LOW, UNCERTAIN_HIGH],
+                        metavar=("LOW", "HIGH"), help="Small-model score band that is escalated")
+    parser.add_argument("--precise-classes", nargs="+", default=[],
+                        help="Class names always confirmed by the large model")
+    parser.add_argument("--escalation", choices=ESCALATION_MODES, default="auto",
+                        help="Run the large model on crops, the full frame, or crops unless they cover most of it")
+
+
+def class_ids(names, selected):
+    """Class ids for class names (or ids given as strings) in a model's names dict"""
+    lookup = {v: k for k, v in names.items()}
+    ids = []
+    for name in selected:
+        if name.isdigit():
+            ids.append(int(name))
+        elif name in lookup:
+            ids.append(lookup[name])
+        else:
+            raise ValueError(f"Unknown class {name!r}; the model has {sorted(lookup)}")
+    return ids
@@ -1,35 +1,126 @@
-from ultralytics import YOLO
 import cv2
+import argparse
 
-# Load your YOLOv11 model (update with your actual weights path)
-model = YOLO('/home/ruhalis/coin/robodog-cv/runs/detect/train3/weights/best.pt')
+from cascade import CascadeDetector, add_cascade_args, class_ids
+from frame_bus import open_capture
+from keyframe_flow import FlowDetector, add_flow_args
+from metrics import add_metrics_args, metrics_from_args
+from overlay import OverlayRenderer, add_overlay_args, result_labels
+from quality_controller import QualityController, add_quality_args
+from thread_budget import add_thread_args, load_thread_profile
+from thresholds import filter_results, load_threshold_profile
 
-# Open the default camera (0); change the index if needed
-cap = cv2.VideoCapture(0)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Real-time YOLO detection from a camera")
+    # Update with your actual weights path
+    parser.add_argument("--model", type=str, default='/home/ruhalis/coin/robodog-cv/runs/detect/train3/weights/best.pt',
+                        help="Path to the YOLO model weights")
+    parser.add_argument("--camera", type=int, default=0, help="Camera index")
+    parser.add_argument("--bus", type=str, default=None,
+                        help="Read frames from this frame_bus.py capture daemon instead of the camera")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--thresholds", type=str, default=None,
+                        help="Per-class threshold profile from scripts/tune_thresholds.py")
+    add_cascade_args(parser)
+    add_flow_args(parser)
+    add_quality_args(parser)
+    add_overlay_args(parser)
+    add_thread_args(parser)
+    add_metrics_args(parser)
+    args = parser.parse_args(argv)
+    if args.cascade and args.keyframe_interval > 1:
+        parser.error("--cascade and --keyframe-interval cannot be combined")
+    # The quality controller reads the stage timings, so they are collected even without a metrics output
+    metrics = metrics_from_args(args, "detection", enabled=args.latency_budget is not None)
+    budget = load_thread_profile(args.thread_profile).apply()
 
-if not cap.isOpened():
-    print("Error: Could not open camera.")
-    exit()
+    # Load your YOLOv11 model (imported here so --help doesn't pay for torch)
+    from ultralytics import YOLO
+    model = YOLO(args.model)
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("Error: Failed to grab frame")
-        break
+    # With a profile, let the model keep everything above the lowest class threshold
+    # and drop the rest per class after inference
+    thresholds = None
+    conf = args.conf
+    if args.thresholds:
+        thresholds = load_threshold_profile(args.thresholds, model.names)
+        conf = float(thresholds.min())
 
-    # Run inference on the current frame; 'source' can be the frame itself
-    results = model.predict(source=frame, conf=0.25)
-    
-    # Get the annotated frame (bounding boxes and labels are drawn on it)
-    annotated_frame = results[0].plot()  # returns image in BGR format
+    # Open the camera (or attach to the shared frame bus); change the index with --camera if needed
+    cap = open_capture(args.camera, args.bus)
 
-    # Display the annotated frame
-    cv2.imshow("Real-Time YOLOv11", annotated_frame)
+    if not cap.isOpened():
+        print("Error: Could not open camera.")
+        exit()
 
-    # Exit loop when 'q' is pressed
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+    overlay = OverlayRenderer(scale=args.display_scale, every=args.render_every)
+    # Detector on keyframes only, optical-flow box propagation in between
+    flow = FlowDetector(model, conf=conf, thresholds=thresholds,
+                        keyframe_interval=args.keyframe_interval) if args.keyframe_interval > 1 else None
+    # Small model (--model) on every frame, the large one only for uncertain detections
+    cascade = CascadeDetector(model, YOLO(args.cascade), conf=conf, band=args.uncertain,
+                              precise_classes=class_ids(model.names, args.precise_classes), thresholds=thresholds,
+                              escalation=args.escalation) if args.cascade else None
+    controller = QualityController(args.latency_budget, knobs=("imgsz", "skip", "render_every"),
+                                   max_imgsz=args.max_imgsz, min_imgsz=args.min_imgsz,
+                                   render_every=args.render_every) if args.latency_budget else None
+    xyxy, classes, labels = [], [], []
 
-# Release camera and close display windows
-cap.release()
-cv2.destroyAllWindows()
+    while True:
+        with metrics.stage("capture"), budget.stage("capture"):
+            ret, frame = cap.read()
+        if not ret:
+            print("Error: Failed to grab frame")
+            break
+
+        # The quality controller picks the inference size and may skip frames (the last boxes stay on screen)
+        imgsz = controller.imgsz if controller is not None else None
+        detect = controller is None or controller.detect_now()
+        if detect and flow is not None:
+            flow.imgsz = imgsz
+            with metrics.stage("inference"), budget.stage("inference"):
+                xyxy, scores, classes = flow(frame)
+            labels = [f"{model.names.get(int(c), str(int(c)))} {s:.1f}" for c, s in zip(classes, scores)]
+        elif detect and cascade is not None:
+            cascade.imgsz = imgsz
+            with metrics.stage("inference"), budget.stage("inference"):
+                xyxy, scores, classes = cascade(frame)
+            labels = [f"{model.names.get(int(c), str(int(c)))} {s:.1f}" for c, s in zip(classes, scores)]
+        elif detect:
+            # Run inference on the current frame; 'source' can be the frame itself
+            with budget.stage("inference"):
+                results = model.predict(source=frame, conf=conf, verbose=not metrics.enabled,
+                                        **({"imgsz": imgsz} if imgsz else {}))
+            metrics.record_speed(results[0].speed)
+            with metrics.stage("filter"):
+                result = filter_results(results[0], thresholds)
+            xyxy, classes, labels = result.boxes.xyxy.tolist(), result.boxes.cls.tolist(), result_labels(result)
+
+        # Draw boxes and cached label sprites (in place, or into the display buffer)
+        with metrics.stage("render"), budget.stage("render"):
+            annotated_frame = overlay.detections(frame, xyxy, classes, labels)
+
+            # Display the annotated frame (None on frames skipped by --render-every)
+            if annotated_frame is not None:
+                cv2.imshow("Real-Time YOLOv11", annotated_frame)
+        if controller is not None:
+            overlay.every = controller.render_every
+            if controller.frame_done(metrics):
+                print(f"Quality: {controller.describe()} "
+                      f"(frame {controller.frame_time * 1000:.0f} ms, target {args.latency_budget:.0f} ms)")
+        metrics.frame_done(detections=len(xyxy))
+
+        # Exit loop when 'q' is pressed
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    if cascade is not None:
+        print(f"Large model ran on {cascade.escalation_rate:.0%} of frames "
+              f"({cascade.full_escalations} full-frame, {cascade.crops} crops)")
+    # Release camera and close display windows
+    metrics.close()
+    cap.release()
+    cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+    main()
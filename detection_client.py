@@ -0,0 +1,147 @@
+"""
+Client and load test for detection_server.py.
+
+DetectionClient talks to the server over TCP or a Unix socket with one
+keep-alive connection per client. The load test runs --concurrency clients in
+threads, each sending requests back to back, and reports throughput and
+p50/p99 latency together with the server-side queue/inference times and the
+mean micro-batch size.
+
+Example:
+  python detection_client.py --image photos/121.jpeg --requests 200 --concurrency 8
+  python detection_client.py --unix /tmp/robodog-cv.sock --image photos/121.jpeg --raw
+"""
+import argparse
+import http.client
+import json
+import socket
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=30.0):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class DetectionClient:
+    def __init__(self, host="127.0.0.1", port=8700, unix_socket=None, timeout=30.0):
+        if unix_socket:
+            self.conn = UnixHTTPConnection(unix_socket, timeout)
+        else:
+            self.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _post(self, path, body, headers):
+        self.conn.request("POST", path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        payload = json.loads(response.read())
+        if response.status != 200:
+            raise RuntimeError(f"{path}: HTTP {response.status}: {payload.get('error')}")
+        return payload
+
+    def _encode(self, frame, raw):
+        if raw:
+            h, w = frame.shape[:2]
+            channels = 1 if frame.ndim == 2 else frame.shape[2]
+            return frame.tobytes(), {"X-Width": str(w), "X-Height": str(h), "X-Channels": str(channels),
+                                     "Content-Type": "application/octet-stream"}
+        ok, buf = cv2.imencode(".jpg", frame)
+        return buf.tobytes(), {"Content-Type": "image/jpeg"}
+
+    def detect(self, frame=None, jpeg=None, raw=False, model=None, conf=None):
+        """Detections for a BGR frame (or pre-encoded JPEG bytes)"""
+        body, headers = (jpeg, {"Content-Type": "image/jpeg"}) if jpeg is not None else self._encode(frame, raw)
+        query = "&".join(f"{k}={v}" for k, v in (("model", model), ("conf", conf)) if v is not None)
+        return self._post("/detect" + ("?" + query if query else ""), body, headers)
+
+    def coefficient(self, frame, kind="red", raw=False):
+        body, headers = self._encode(frame, raw)
+        return self._post(f"/coefficient/{kind}", body, headers)
+
+    def health(self):
+        self.conn.request("GET", "/health")
+        return json.loads(self.conn.getresponse().read())
+
+    def close(self):
+        self.conn.close()
+
+
+def load_test(make_client, frame, requests=200, concurrency=8, raw=False, model=None):
+    """Returns (client latencies s, server timings, wall seconds, errors)"""
+    ok, buf = cv2.imencode(".jpg", frame)
+    jpeg = None if raw else buf.tobytes()
+    latencies, timings, errors = [], [], []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        client = make_client()
+        try:
+            while True:
+                with lock:
+                    if next(counter, None) is None:
+                        return
+                start = time.perf_counter()
+                try:
+                    result = client.detect(frame, jpeg=jpeg, raw=raw, model=model)
+                except Exception as e:
+                    with lock:
+                        errors.append(str(e))
+                    continue
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    timings.append(result["timing"])
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return np.array(latencies), timings, time.perf_counter() - start, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for detection_server.py")
+    parser.add_argument("--image", required=True, help="Image sent with every request")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--unix", default=None, help="Unix socket path instead of TCP")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel clients")
+    parser.add_argument("--raw", action="store_true", help="Send raw BGR frames instead of JPEG")
+    parser.add_argument("--model", default=None, help="Server model name (default: server's first)")
+    args = parser.parse_args()
+
+    frame = cv2.imread(args.image)
+    if frame is None:
+        raise SystemExit(f"Error: Could not read image at {args.image}")
+
+    make_client = lambda: DetectionClient(args.host, args.port, args.unix)
+    latencies, timings, wall, errors = load_test(make_client, frame, args.requests, args.concurrency,
+                                                 args.raw, args.model)
+    if len(latencies) == 0:
+        raise SystemExit(f"All {len(errors)} requests failed, e.g.: {errors[0] if errors else '?'}")
+    ms = latencies * 1000
+    print(f"Requests:    {len(latencies)} ok, {len(errors)} failed, concurrency {args.concurrency}")
+    print(f"Throughput:  {len(latencies) / wall:.1f} req/s")
+    print(f"Latency:     p50 {np.percentile(ms, 50):.1f} ms | p99 {np.percentile(ms, 99):.1f} ms | "
+          f"max {ms.max():.1f} ms")
+    print(f"Server side: queue p50 {np.median([t['queue_ms'] for t in timings]):.1f} ms | "
+          f"inference p50 {np.median([t['inference_ms'] for t in timings]):.1f} ms | "
+          f"mean batch {np.mean([t['batch_size'] for t in timings]):.2f}")
+
+if __name__ == "__main__":
+    main()
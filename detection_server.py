@@ -0,0 +1,263 @@
+"""
+Local detection API for other robot processes (navigation, reporting).
+
+Serves the YOLO models and the red/white coefficient functions over HTTP on
+localhost or over a Unix domain socket, fully offline (stdlib http.server).
+Concurrent /detect requests for the same model are coalesced into one
+model.predict batch: the first request opens a batch, which is sent when it is
+full (--max-batch) or when its --max-wait-ms deadline expires.
+
+Endpoints:
+  POST /detect[?model=NAME&conf=0.4]      body: JPEG/PNG bytes, or raw BGR uint8
+                                          with X-Width / X-Height headers
+  POST /coefficient/red                   body as above → {"coefficient", "pressed"}
+  POST /coefficient/white[?use_roi=1]
+  GET  /health                            models, classes and batching stats
+
+Example:
+  python detection_server.py --model best=runs/detect/train2/weights/best.pt --port 8700
+  python detection_server.py --model runs/detect/train2/weights/best.pt --unix /tmp/robodog-cv.sock
+  curl --data-binary @photos/121.jpeg -H "Content-Type: image/jpeg" localhost:8700/detect
+"""
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from red_coefficient_photo import COEFF_THRESH as RED_THRESH, red_coefficient
+from thresholds import class_threshold_mask, load_threshold_profile
+from white_coefficient_photo import COEFF_THRESH as WHITE_THRESH, white_coefficient
+
+DEFAULT_PORT = 8700
+MAX_BATCH = 8
+MAX_WAIT_MS = 10.0             # how long the first request of a batch waits for company
+MAX_BODY = 64 * 1024 * 1024
+
+
+class MicroBatcher(threading.Thread):
+    """Coalesces concurrent single-frame requests into model.predict batches"""
+
+    def __init__(self, model, conf=0.25, imgsz=640, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, thresholds=None):
+        super().__init__(daemon=True, name="micro-batcher")
+        self.model = model
+        self.conf = conf
+        self.imgsz = imgsz
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.thresholds = thresholds
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.frames = 0
+
+    def submit(self, frame):
+        """Queue one BGR frame; returns a Future of (boxes, scores, classes, timing)"""
+        future = Future()
+        self.requests.put((frame, time.perf_counter(), future))
+        return future
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = batch[0][1] + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            try:
+                results = self.model.predict(source=[f for f, _, _ in batch], conf=self.conf,
+                                             imgsz=self.imgsz, verbose=False)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            infer_ms = (time.perf_counter() - start) * 1000
+            self.batches += 1
+            self.frames += len(batch)
+            for (_, queued, future), result in zip(batch, results):
+                boxes = result.boxes.xyxy.cpu().numpy()
+                scores = result.boxes.conf.cpu().numpy()
+                classes = result.boxes.cls.cpu().numpy().astype(int)
+                if self.thresholds is not None:
+                    keep = class_threshold_mask(classes, scores, self.thresholds)
+                    boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+                timing = {"queue_ms": round((start - queued) * 1000, 2), "inference_ms": round(infer_ms, 2),
+                          "batch_size": len(batch)}
+                future.set_result((boxes, scores, classes, timing))
+
+
+def decode_frame(body, headers):
+    """BGR frame from an encoded image body or a raw frame with X-Width/X-Height"""
+    width, height = headers.get("X-Width"), headers.get("X-Height")
+    if width and height:
+        channels = int(headers.get("X-Channels", 3))
+        expected = int(width) * int(height) * channels
+        if len(body) != expected:
+            raise ValueError(f"raw frame has {len(body)} bytes, expected {expected}")
+        frame = np.frombuffer(body, np.uint8).reshape(int(height), int(width), channels)
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR) if channels == 1 else frame
+    frame = cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("could not decode image body")
+    return frame
+
+
+class DetectionHandler(BaseHTTPRequestHandler):
+    server_version = "robodog-cv"
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        # Unix socket clients have no (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_frame(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length <= 0 or length > MAX_BODY:
+            raise ValueError("missing or oversized request body")
+        return decode_frame(self.rfile.read(length), self.headers)
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/health":
+            return self._send_json(404, {"error": "not found"})
+        self._send_json(200, {
+            "models": {name: {"classes": b.model.names, "batches": b.batches, "frames": b.frames,
+                              "mean_batch": round(b.frames / max(b.batches, 1), 2)}
+                       for name, b in self.server.batchers.items()},
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            frame = self._read_frame()
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+
+        if url.path == "/detect":
+            name = query.get("model", self.server.default_model)
+            batcher = self.server.batchers.get(name)
+            if batcher is None:
+                return self._send_json(404, {"error": f"unknown model {name}"})
+            try:
+                boxes, scores, classes, timing = batcher.submit(frame).result(timeout=self.server.request_timeout)
+            except Exception as e:
+                return self._send_json(500, {"error": str(e)})
+            min_conf = float(query.get("conf", 0))
+            names = batcher.model.names
+            detections = [{"class_id": int(c), "class_name": names.get(int(c), str(c)), "confidence": round(float(s), 4),
+                           "box": [round(float(v), 1) for v in b]}
+                          for b, s, c in zip(boxes, scores, classes) if s >= min_conf]
+            return self._send_json(200, {"model": name, "image_size": [frame.shape[1], frame.shape[0]],
+                                         "detections": detections, "timing": timing})
+
+        if url.path == "/coefficient/red":
+            coef, roi, _ = red_coefficient(frame)
+            return self._send_json(200, {"coefficient": float(coef), "pressed": bool(coef > RED_THRESH),
+                                         "roi": [int(v) for v in roi]})
+        if url.path == "/coefficient/white":
+            coef, roi, _ = white_coefficient(frame, use_roi=query.get("use_roi", "0") not in ("0", "false", ""))
+            return self._send_json(200, {"coefficient": float(coef), "detected": bool(coef > WHITE_THRESH),
+                                         "roi": [int(v) for v in roi] if roi else None})
+        self._send_json(404, {"error": "not found"})
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(batchers, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None, verbose=False, timeout=30.0):
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        server = UnixHTTPServer(unix_socket, DetectionHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), DetectionHandler)
+        server.daemon_threads = True
+    server.batchers = batchers
+    server.default_model = next(iter(batchers))
+    server.verbose = verbose
+    server.request_timeout = timeout
+    return server
+
+
+def parse_model_specs(specs):
+    """["best=path.pt", "other.pt"] → {"best": "path.pt", "other": "other.pt"}"""
+    models = {}
+    for spec in specs:
+        name, _, path = spec.rpartition("=")
+        models[name or os.path.splitext(os.path.basename(path))[0]] = path
+    return models
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local detection API with request micro-batching")
+    parser.add_argument("--model", nargs="+", default=["yolo11s.pt"],
+                        help="Model weights, optionally named: NAME=PATH (first one is the default)")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="HTTP port")
+    parser.add_argument("--unix", default=None, help="Serve on this Unix socket instead of TCP")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--thresholds", type=str, default=None,
+                        help="Per-class threshold profile from scripts/tune_thresholds.py (first model)")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Largest micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="Max time a request waits for a batch to fill")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    batchers = {}
+    for i, (name, path) in enumerate(parse_model_specs(args.model).items()):
+        model = YOLO(path)
+        conf, thresholds = args.conf, None
+        if args.thresholds and i == 0:
+            thresholds = load_threshold_profile(args.thresholds, model.names)
+            conf = float(thresholds.min())
+        # Warm up so the first client request doesn't pay for fusing/allocation
+        model.predict(source=np.zeros((args.imgsz, args.imgsz, 3), np.uint8), imgsz=args.imgsz, verbose=False)
+        batchers[name] = MicroBatcher(model, conf, args.imgsz, args.max_batch, args.max_wait_ms, thresholds)
+        batchers[name].start()
+        print(f"Loaded model '{name}' from {path}")
+
+    server = make_server(batchers, args.host, args.port, args.unix, args.verbose)
+    print(f"Serving on {'unix:' + args.unix if args.unix else f'http://{args.host}:{args.port}'} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+
+if __name__ == "__main__":
+    main()
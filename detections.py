@@ -0,0 +1,150 @@
+"""
+NumPy helpers for detections kept as parallel arrays:
+    boxes (N,4) xyxy pixels, scores (N,), classes (N,)
+
+Includes class-aware NMS, weighted box fusion and sliced (tiled) inference
+for high-resolution images where small defects vanish at imgsz=640.
+"""
+import numpy as np
+
+MERGE_METHODS = ("nms", "wbf")
+
+
+def empty_detections():
+    return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64)
+
+
+def results_to_arrays(result):
+    """(boxes, scores, classes) from one Ultralytics Results object"""
+    b = result.boxes
+    return (b.xyxy.cpu().numpy().astype(np.float32), b.conf.cpu().numpy().astype(np.float32),
+            b.cls.cpu().numpy().astype(np.int64))
+
+
+def arrays_to_results(image, boxes, scores, classes, names, path=""):
+    """Wrap merged arrays back into a Results object so .plot() and filter_results() work"""
+    import torch
+    from ultralytics.engine.results import Results
+
+    data = np.concatenate([boxes, scores[:, None], classes[:, None]], axis=1).astype(np.float32)
+    return Results(image, path=path, names=names, boxes=torch.from_numpy(data.reshape(-1, 6)))
+
+
+def pairwise_overlap(a, b, metric="iou"):
+    """(len(a), len(b)) IoU, or intersection over the smaller box with metric="ios" """
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    if metric == "ios":
+        denom = np.minimum(area_a[:, None], area_b[None, :])
+    else:
+        denom = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(denom, 1e-9)
+
+
+def nms(boxes, scores, classes, iou=0.5, metric="iou"):
+    """Class-aware greedy NMS; returns kept indices sorted by score"""
+    order = np.argsort(-scores, kind="stable")
+    if len(order) == 0:
+        return order
+    overlap = pairwise_overlap(boxes[order], boxes[order], metric)
+    same_class = classes[order][:, None] == classes[order][None, :]
+    suppress = (overlap > iou) & same_class
+    keep = np.ones(len(order), dtype=bool)
+    for i in range(len(order)):
+        if keep[i]:
+            keep[i + 1:] &= ~suppress[i, i + 1:]
+    return order[keep]
+
+
+def weighted_box_fusion(boxes, scores, classes, iou=0.5, metric="iou"):
+    """
+    Class-aware weighted box fusion: boxes are clustered greedily by score and
+    each cluster is replaced by the score-weighted mean box. The fused score is
+    the cluster's best score, since overlapping tiles are not independent models.
+    """
+    order = np.argsort(-scores, kind="stable")
+    if len(order) == 0:
+        return empty_detections()
+    boxes, scores, classes = boxes[order], scores[order], classes[order]
+    overlap = pairwise_overlap(boxes, boxes, metric)
+    same_class = classes[:, None] == classes[None, :]
+    cluster = np.full(len(order), -1)
+    out_boxes, out_scores, out_classes = [], [], []
+    for i in range(len(order)):
+        if cluster[i] >= 0:
+            continue
+        members = np.flatnonzero((cluster < 0) & same_class[i] & (overlap[i] > iou))
+        members = np.union1d(members, [i])
+        cluster[members] = len(out_boxes)
+        w = scores[members]
+        out_boxes.append((boxes[members] * w[:, None]).sum(0) / w.sum())
+        out_scores.append(w.max())
+        out_classes.append(classes[i])
+    return (np.array(out_boxes, np.float32), np.array(out_scores, np.float32),
+            np.array(out_classes, np.int64))
+
+
+def merge_detections(boxes, scores, classes, iou=0.5, method="nms", metric="iou"):
+    if method == "wbf":
+        return weighted_box_fusion(boxes, scores, classes, iou, metric)
+    keep = nms(boxes, scores, classes, iou, metric)
+    return boxes[keep], scores[keep], classes[keep]
+
+
+# ----- Sliced inference -----
+
+def make_tiles(height, width, tile_size=640, overlap=0.2):
+    """
+    Top-left aligned tile windows (x0, y0, x1, y1) covering the image with at
+    least `overlap` fraction shared between neighbours; the last row/column is
+    shifted back so every tile is full-size (unless the image is smaller).
+    """
+    stride = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        s = list(range(0, length - tile_size, stride))
+        return s + [length - tile_size]
+
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in starts(height) for x in starts(width)]
+
+
+def tiled_predict(model, image, tile_size=640, overlap=0.2, full_frame=True, conf=0.25, iou=0.5,
+                  merge="nms", merge_metric="ios", batch=None, imgsz=None):
+    """
+    Run the model on overlapping tiles (plus the downscaled full frame) and
+    merge everything back into full-image pixel coordinates.
+    All crops go through model.predict as one batch (or chunks of `batch`).
+    Returns (boxes, scores, classes).
+    """
+    h, w = image.shape[:2]
+    windows = make_tiles(h, w, tile_size, overlap)
+    if len(windows) == 1:
+        full_frame = False          # the single tile already is the full frame
+    crops = [image[y0:y1, x0:x1] for x0, y0, x1, y1 in windows]
+    offsets = [(x0, y0) for x0, y0, _, _ in windows]
+    if full_frame:
+        crops.append(image)
+        offsets.append((0, 0))
+
+    batch = batch or len(crops)
+    all_boxes, all_scores, all_classes = [], [], []
+    for start in range(0, len(crops), batch):
+        results = model.predict(source=crops[start:start + batch], conf=conf, iou=iou,
+                                imgsz=imgsz or tile_size, verbose=False)
+        for result, (dx, dy) in zip(results, offsets[start:start + batch]):
+            boxes, scores, classes = results_to_arrays(result)
+            boxes[:, [0, 2]] += dx
+            boxes[:, [1, 3]] += dy
+            all_boxes.append(boxes)
+            all_scores.append(scores)
+            all_classes.append(classes)
+
+    boxes, scores, classes = np.concatenate(all_boxes), np.concatenate(all_scores), np.concatenate(all_classes)
+    # Intersection-over-smaller merges a box cut at a tile border with its complete twin
+    return merge_detections(boxes, scores, classes, iou, merge, merge_metric)
@@ -0,0 +1,109 @@
+"""
+Appearance-embedding cache for DeepSORT.
+
+`tracker.update_tracks(dets, frame=frame)` crops and embeds every detection on
+every frame, although most of our objects are static and look the same from
+frame to frame. EmbeddingCache sits in front of update_tracks: each detection
+is matched (greedy IoU) to the box its track is predicted at, and it reuses the
+track's cached embedding unless
+  - no track is predicted there with IoU >= reuse_iou (new object, or it moved),
+  - the detection overlaps another detection by >= occlusion_iou (occlusion),
+  - the track was missed on the previous frame, or is still tentative,
+  - the cached embedding is refresh_every frames old.
+Only those crops are embedded, in one batched embedder call; the tracker then
+gets the full embeds list, so association works exactly as before.
+
+Usage:
+  tracker = DeepSort(max_age=30, n_init=3, max_cosine_distance=0.2)
+  cache = EmbeddingCache(tracker)
+  tracks = cache.update_tracks(raw_dets, frame)       # instead of tracker.update_tracks(raw_dets, frame=frame)
+"""
+import numpy as np
+
+from detections import pairwise_overlap
+from roi_inference import predicted_track_boxes
+
+REFRESH_EVERY = 10             # re-embed a track at least every K frames
+REUSE_IOU = 0.7                # min IoU between detection and predicted track box to reuse
+OCCLUSION_IOU = 0.3            # detections overlapping each other this much are always re-embedded
+
+
+class EmbeddingCache:
+    def __init__(self, tracker, refresh_every=REFRESH_EVERY, reuse_iou=REUSE_IOU, occlusion_iou=OCCLUSION_IOU):
+        if tracker.embedder is None:
+            raise ValueError("EmbeddingCache needs a DeepSort tracker with an embedder")
+        self.tracker = tracker
+        self.refresh_every = refresh_every
+        self.reuse_iou = reuse_iou
+        self.occlusion_iou = occlusion_iou
+        self.cache = {}            # track_id -> (embedding, frame it was computed on)
+        self.frame_idx = -1
+        self.embedded = 0
+        self.reused = 0
+
+    @property
+    def reuse_ratio(self):
+        total = self.embedded + self.reused
+        return self.reused / total if total else 0.0
+
+    def _reusable(self, boxes):
+        """Per detection: the cached (embedding, frame) it may reuse, or None"""
+        reuse = [None] * len(boxes)
+        tracks, predicted = predicted_track_boxes(self.tracker.tracker.tracks, confirmed_only=True)
+        if not len(boxes) or not tracks:
+            return reuse
+
+        occluded = np.zeros(len(boxes), bool)
+        if len(boxes) > 1:
+            overlap = pairwise_overlap(boxes, boxes)
+            np.fill_diagonal(overlap, 0)
+            occluded = overlap.max(axis=1) >= self.occlusion_iou
+
+        iou = pairwise_overlap(boxes, predicted)
+        # Greedy one-to-one matching, best overlap first
+        used_dets, used_tracks = set(), set()
+        for d, k in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+            if iou[d, k] < self.reuse_iou:
+                break
+            if d in used_dets or k in used_tracks:
+                continue
+            used_dets.add(d)
+            used_tracks.add(k)
+            t = tracks[k]
+            cached = self.cache.get(t.track_id)
+            if (cached is None or occluded[d] or t.time_since_update > 0
+                    or self.frame_idx - cached[1] >= self.refresh_every):
+                continue
+            reuse[d] = cached
+        return reuse
+
+    def update_tracks(self, raw_dets, frame):
+        """Drop-in for tracker.update_tracks(raw_dets, frame=frame)"""
+        self.frame_idx += 1
+        # update_tracks drops empty boxes itself; do it first so embeds stay aligned
+        raw_dets = [d for d in raw_dets if d[0][2] > 0 and d[0][3] > 0]
+        boxes = np.array([[x, y, x + w, y + h] for (x, y, w, h), *_ in raw_dets], np.float32).reshape(-1, 4)
+        reuse = self._reusable(boxes)
+
+        todo = [i for i, r in enumerate(reuse) if r is None]
+        fresh = self.tracker.generate_embeds(frame, [raw_dets[i] for i in todo]) if todo else []
+        embeds, sources = [None] * len(raw_dets), [None] * len(raw_dets)
+        for i, e in zip(todo, fresh):
+            embeds[i], sources[i] = e, (e, self.frame_idx)
+        for i, r in enumerate(reuse):
+            if r is not None:
+                embeds[i], sources[i] = r[0], r
+        self.embedded += len(todo)
+        self.reused += len(raw_dets) - len(todo)
+
+        # The detection index travels with the detection through NMS and matching
+        tracks = self.tracker.update_tracks(raw_dets, embeds=embeds, others=list(range(len(raw_dets))))
+
+        live = set()
+        for t in tracks:
+            live.add(t.track_id)
+            if t.time_since_update == 0 and t.others is not None:
+                self.cache[t.track_id] = sources[t.others]
+        for tid in [tid for tid in self.cache if tid not in live]:
+            del self.cache[tid]
+        return tracks
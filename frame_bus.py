@@ -0,0 +1,229 @@
+"""
+Shared-memory frame bus: one capture process, many consumer processes.
+
+Only one process can hold /dev/video0. The capture daemon owns the camera and
+writes every frame into a ring of slots in a multiprocessing.shared_memory
+block, together with a sequence number and a timestamp. Consumers (detection,
+tracking, red button detection) attach by name and get the newest frame as a
+read-only NumPy view straight into shared memory: no pickling, no copies.
+
+Layout: [header][slot seq x N][slot timestamp x N][frame slot x N]
+A slot's seq is set to -1 while the writer fills it and to the frame's
+sequence number once complete; the header's latest seq is published last.
+A view stays valid until the writer wraps around the ring (N frames later);
+consumers that hold a frame longer can check FrameBusReader.valid(seq).
+
+FrameBusReader mimics cv2.VideoCapture (isOpened/read/get/release), so the
+scripts use the bus with --bus NAME instead of --camera.
+
+Example:
+  python frame_bus.py --camera 0 --name cam0 --slots 32    # capture daemon
+  python detection.py --bus cam0 &  python red_detection.py --bus cam0
+"""
+import argparse
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+MAGIC = 0x524F424F444F47           # "ROBODOG"
+HEADER_FIELDS = 8                  # magic, slots, height, width, channels, latest seq, closed, reserved
+H_MAGIC, H_SLOTS, H_HEIGHT, H_WIDTH, H_CHANNELS, H_LATEST, H_CLOSED = range(7)
+ALIGN = 64
+DEFAULT_SLOTS = 32                 # ~1 s at 30 FPS: longer than the slowest consumer's frame (300-400 ms on the Pi)
+
+
+def _layout(slots, shape):
+    """Byte offsets of (slot seqs, slot timestamps, frames) and the total size"""
+    frame_bytes = int(np.prod(shape))
+    seq_off = HEADER_FIELDS * 8
+    ts_off = seq_off + slots * 8
+    data_off = -(-(ts_off + slots * 8) // ALIGN) * ALIGN
+    slot_bytes = -(-frame_bytes // ALIGN) * ALIGN
+    return seq_off, ts_off, data_off, slot_bytes, data_off + slots * slot_bytes
+
+
+def _shm_name(name):
+    return f"robodog_{name}"
+
+
+def _attach(name):
+    """Attach without registering with the resource tracker, which would unlink the bus when a reader exits"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+class _Ring:
+    """NumPy views over the shared block"""
+
+    def __init__(self, shm, slots, shape):
+        seq_off, ts_off, data_off, slot_bytes, _ = _layout(slots, shape)
+        buf = shm.buf
+        self.header = np.ndarray((HEADER_FIELDS,), np.int64, buf, 0)
+        self.seqs = np.ndarray((slots,), np.int64, buf, seq_off)
+        self.stamps = np.ndarray((slots,), np.float64, buf, ts_off)
+        self.frames = [np.ndarray(shape, np.uint8, buf, data_off + i * slot_bytes) for i in range(slots)]
+        self.slots = slots
+
+    def release(self):
+        # Views must go before the SharedMemory can be closed
+        self.header = self.seqs = self.stamps = self.frames = None
+
+
+class FrameBusWriter:
+    """Creates the shared ring and publishes frames into it"""
+
+    def __init__(self, name, shape, slots=DEFAULT_SLOTS):
+        shape = tuple(shape) if len(shape) == 3 else tuple(shape) + (1,)
+        size = _layout(slots, shape)[-1]
+        try:
+            self.shm = shared_memory.SharedMemory(_shm_name(name), create=True, size=size)
+        except FileExistsError:
+            # Left over from a crashed daemon: take it over
+            stale = shared_memory.SharedMemory(_shm_name(name))
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(_shm_name(name), create=True, size=size)
+        self.ring = _Ring(self.shm, slots, shape)
+        self.ring.seqs[:] = -1
+        self.ring.header[:] = 0
+        self.ring.header[[H_SLOTS, H_HEIGHT, H_WIDTH, H_CHANNELS]] = slots, *shape
+        self.ring.header[H_LATEST] = -1
+        self.ring.header[H_MAGIC] = MAGIC
+        self.seq = 0
+
+    def write(self, frame, timestamp=None):
+        slot = self.seq % self.ring.slots
+        self.ring.seqs[slot] = -1                       # readers skip a slot being written
+        self.ring.frames[slot][...] = frame.reshape(self.ring.frames[slot].shape)
+        self.ring.stamps[slot] = time.time() if timestamp is None else timestamp
+        self.ring.seqs[slot] = self.seq
+        self.ring.header[H_LATEST] = self.seq
+        self.seq += 1
+        return self.seq - 1
+
+    def close(self):
+        self.ring.header[H_CLOSED] = 1
+        self.ring.release()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class FrameBusReader:
+    """Attaches to a running bus; read() returns the newest frame as a read-only view"""
+
+    def __init__(self, name, timeout=10.0, poll=0.001):
+        self.name = name
+        self.poll = poll
+        self.shm = None
+        deadline = time.time() + timeout
+        while self.shm is None:
+            try:
+                self.shm = _attach(_shm_name(name))
+            except FileNotFoundError:
+                if time.time() > deadline:
+                    self.ring = None
+                    return
+                time.sleep(0.05)
+        header = np.ndarray((HEADER_FIELDS,), np.int64, self.shm.buf, 0)
+        while header[H_MAGIC] != MAGIC and time.time() < deadline:
+            time.sleep(0.01)                            # writer still initializing
+        slots, h, w, c = (int(v) for v in header[[H_SLOTS, H_HEIGHT, H_WIDTH, H_CHANNELS]])
+        del header
+        self.ring = _Ring(self.shm, slots, (h, w, c))
+        self.last_seq = -1
+        self.seq = -1
+        self.timestamp = 0.0
+
+    def isOpened(self):
+        return self.ring is not None and not self.ring.header[H_CLOSED]
+
+    def read(self, timeout=1.0):
+        """(True, frame) with a frame newer than the last one read, or (False, None)"""
+        deadline = time.time() + timeout
+        while self.isOpened():
+            latest = int(self.ring.header[H_LATEST])
+            if latest > self.last_seq:
+                slot = latest % self.ring.slots
+                if self.ring.seqs[slot] == latest:
+                    frame = self.ring.frames[slot].view()
+                    frame.flags.writeable = False
+                    self.timestamp = float(self.ring.stamps[slot])
+                    self.last_seq = self.seq = latest
+                    return True, frame if frame.shape[2] > 1 else frame[:, :, 0]
+            if time.time() > deadline:
+                break
+            time.sleep(self.poll)
+        return False, None
+
+    def valid(self, seq=None):
+        """True while the slot of frame `seq` (default: last read) hasn't been overwritten"""
+        seq = self.seq if seq is None else seq
+        return self.ring is not None and int(self.ring.seqs[seq % self.ring.slots]) == seq
+
+    def get(self, prop):
+        if self.ring is None:
+            return 0.0
+        h, w = self.ring.frames[0].shape[:2]
+        return {cv2.CAP_PROP_FRAME_WIDTH: float(w), cv2.CAP_PROP_FRAME_HEIGHT: float(h),
+                cv2.CAP_PROP_POS_FRAMES: float(self.seq + 1)}.get(prop, 0.0)
+
+    def release(self):
+        if self.ring is not None:
+            self.ring.release()
+            self.ring = None
+        if self.shm is not None:
+            try:
+                self.shm.close()
+            except BufferError:
+                pass                # a caller still holds a frame view; the mapping goes with it
+            self.shm = None
+
+
+def open_capture(camera=0, bus=None):
+    """cv2.VideoCapture for a camera, or a FrameBusReader when a bus name is given"""
+    if bus:
+        return FrameBusReader(bus)
+    return cv2.VideoCapture(camera)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture daemon: publish camera frames on a shared-memory bus")
+    parser.add_argument("--camera", default="0", help="Camera index or video path")
+    parser.add_argument("--name", default="cam0", help="Bus name consumers attach to")
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS, help="Ring size in frames")
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(int(args.camera) if args.camera.isdigit() else args.camera)
+    ret, frame = cap.read()
+    if not ret:
+        raise RuntimeError(f"Cannot read from camera {args.camera}")
+
+    writer = FrameBusWriter(args.name, frame.shape, args.slots)
+    print(f"Publishing {frame.shape[1]}x{frame.shape[0]} frames on bus '{args.name}' "
+          f"({args.slots} slots). Ctrl+C to stop.")
+    count, t0 = 0, time.time()
+    try:
+        while ret:
+            writer.write(frame)
+            count += 1
+            if time.time() - t0 >= 5.0:
+                print(f"{count / (time.time() - t0):.1f} frames/s")
+                count, t0 = 0, time.time()
+            ret, frame = cap.read()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        cap.release()
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,19 @@ import cv2
 import argparse
 import os
 
-def detect_image(image_path, model_path, conf_threshold=0.25, save_output=True):
+from detections import MERGE_METHODS, arrays_to_results, tiled_predict
+from thresholds import filter_results, load_threshold_profile
+
+def detect_image(image_path, model_path, conf_threshold=0.25, save_output=True, thresholds_path=None,
+                 tile_size=None, overlap=0.2, full_frame=True, merge="nms"):
     # Load the YOLO model
     model = YOLO(model_path)
+
+    # Per-class thresholds: predict at the lowest one, then filter per class
+    thresholds = None
+    if thresholds_path:
+        thresholds = load_threshold_profile(thresholds_path, model.names)
+        conf_threshold = float(thresholds.min())
     
     # Read the image
     image = cv2.imread(image_path)
@@ -13,11 +23,18 @@ def detect_image(image_path, model_path, conf_threshold=0.25, save_output=True):
         print(f"Error: Could not read image at {image_path}")
         return
     
-    # Run inference on the image
-    results = model.predict(source=image, conf=conf_threshold)
+    # Run inference on the image, either whole or as overlapping tiles batched in one call
+    if tile_size:
+        boxes, scores, classes = tiled_predict(model, image, tile_size=tile_size, overlap=overlap,
+                                               full_frame=full_frame, conf=conf_threshold, merge=merge)
+        result = arrays_to_results(image, boxes, scores, classes, model.names, path=image_path)
+        print(f"Tiled inference: {len(boxes)} detections after {merge.upper()} merge")
+    else:
+        result = model.predict(source=image, conf=conf_threshold)[0]
+    result = filter_results(result, thresholds)
     
     # Get the annotated image
-    annotated_image = results[0].plot()
+    annotated_image = result.plot()
     
     # Display the results
     cv2.imshow("YOLOv11 Detection", annotated_image)
@@ -42,6 +59,15 @@ def main():
     parser.add_argument("--image", type=str, required=True, help="Path to the input image")
     parser.add_argument("--model", type=str, default="yolo11s.pt", help="Path to the YOLO model weights")
     parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--thresholds", type=str, default=None,
+                        help="Per-class threshold profile from scripts/tune_thresholds.py (overrides --conf)")
+    parser.add_argument("--tile", type=int, default=None, metavar="SIZE",
+                        help="Sliced inference with SIZE x SIZE tiles (for small defects in large photos)")
+    parser.add_argument("--overlap", type=float, default=0.2, help="Tile overlap fraction (default: 0.2)")
+    parser.add_argument("--no-full-frame", action="store_true",
+                        help="Skip the extra downscaled full-image pass when tiling")
+    parser.add_argument("--merge", choices=MERGE_METHODS, default="nms",
+                        help="How tile detections are merged (default: nms)")
     parser.add_argument("--no-save", action="store_true", help="Don't save the output image")
     
     args = parser.parse_args()
@@ -50,7 +76,12 @@ def main():
         image_path=args.image,
         model_path=args.model,
         conf_threshold=args.conf,
-        save_output=not args.no_save
+        save_output=not args.no_save,
+        thresholds_path=args.thresholds,
+        tile_size=args.tile,
+        overlap=args.overlap,
+        full_frame=not args.no_full_frame,
+        merge=args.merge
     )
 
 if __name__ == "__main__":
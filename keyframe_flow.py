@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Keyframe detection with optical-flow box propagation.
+
+Consecutive camera frames are mostly the same picture, even while the robot
+walks. FlowDetector runs YOLO only on keyframes: every `keyframe_interval`
+frames, or earlier when the flow check fails. In between, each box is carried
+forward by sparse Lucas-Kanade flow on corner features inside it, tracked
+forward and backward on a downscaled gray frame. The box is shifted by the
+median point motion and scaled by the median change in point spread.
+
+The flow check fails, and the frame is detected instead, when a box keeps
+fewer than MIN_POINTS good points or loses more than half of them (occlusion,
+motion blur, the object leaving the frame).
+
+Usage:
+  flow = FlowDetector(model, conf=0.25, keyframe_interval=5)
+  boxes, scores, classes = flow(frame)              # flow.last_mode: "keyframe" / "flow" / "keyframe (flow check)"
+
+Measure speed and agreement with every-frame detection on recorded footage:
+  python keyframe_flow.py --video patrol.mp4 --model runs/detect/train2/weights/best.pt --intervals 1 2 3 5 10
+"""
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from detections import empty_detections, pairwise_overlap, results_to_arrays
+from thresholds import class_threshold_mask
+
+KEYFRAME_INTERVAL = 5          # detector pass every N frames
+FLOW_SCALE = 0.5               # flow runs on the gray frame resized by this factor
+MAX_CORNERS = 20               # features seeded per box
+MIN_POINTS = 4                 # a box needs this many well-tracked points to be propagated
+MAX_FB_ERROR = 1.0             # max forward-backward error (flow pixels) of a good point
+MIN_GOOD_FRACTION = 0.5        # re-detect when a box keeps less than this fraction of its points
+MAX_SCALE_STEP = 1.25          # per-frame box scale change is clamped to [1/x, x]
+MATCH_IOU = 0.5                # evaluation: a box agrees with the every-frame detection above this IoU
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+class FlowDetector:
+    """Detector on keyframes, Lucas-Kanade box propagation on the frames in between"""
+
+    def __init__(self, model, conf=0.25, imgsz=None, thresholds=None, keyframe_interval=KEYFRAME_INTERVAL,
+                 flow_scale=FLOW_SCALE, max_fb_error=MAX_FB_ERROR, min_good_fraction=MIN_GOOD_FRACTION):
+        self.model = model
+        self.conf = conf
+        self.imgsz = imgsz
+        self.thresholds = thresholds
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.flow_scale = flow_scale
+        self.max_fb_error = max_fb_error
+        self.min_good_fraction = min_good_fraction
+        self.gray = None
+        self.boxes, self.scores, self.classes = empty_detections()
+        self.points = np.zeros((0, 1, 2), np.float32)    # features in flow-frame pixels
+        self.owner = np.zeros(0, np.int64)               # box index of each feature
+        self.since_keyframe = 0
+        self.frames = 0
+        self.keyframes = 0
+        self.flow_failures = 0
+        self.last_mode = "keyframe"
+
+    @property
+    def keyframe_ratio(self):
+        return self.keyframes / self.frames if self.frames else 0.0
+
+    def _gray(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.flow_scale != 1:
+            gray = cv2.resize(gray, None, fx=self.flow_scale, fy=self.flow_scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _detect(self, frame, gray):
+        kwargs = {"imgsz": self.imgsz} if self.imgsz else {}
+        result = self.model.predict(source=frame, conf=self.conf, verbose=False, **kwargs)[0]
+        boxes, scores, classes = results_to_arrays(result)
+        if self.thresholds is not None:
+            keep = class_threshold_mask(classes, scores, self.thresholds)
+            boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+        self.boxes, self.scores, self.classes = boxes, scores, classes
+        self._seed(gray)
+        self.keyframes += 1
+        self.since_keyframe = 0
+
+    def _seed(self, gray):
+        """Corner features inside every box; a 3x3 grid where a box has too few corners"""
+        points, owner = [], []
+        h, w = gray.shape
+        for i, box in enumerate(self.boxes * self.flow_scale):
+            x0, y0 = max(0, int(box[0])), max(0, int(box[1]))
+            x1, y1 = min(w, int(np.ceil(box[2]))), min(h, int(np.ceil(box[3])))
+            if x1 - x0 < 3 or y1 - y0 < 3:
+                continue
+            corners = cv2.goodFeaturesToTrack(gray[y0:y1, x0:x1], MAX_CORNERS, 0.01, 3)
+            if corners is None or len(corners) < MIN_POINTS:
+                gx, gy = np.meshgrid(np.linspace(0.2, 0.8, 3) * (x1 - x0), np.linspace(0.2, 0.8, 3) * (y1 - y0))
+                corners = np.stack([gx.ravel(), gy.ravel()], axis=1)[:, None, :]
+            corners = corners.astype(np.float32) + np.float32([x0, y0])
+            points.append(corners)
+            owner.append(np.full(len(corners), i, np.int64))
+        self.points = np.concatenate(points) if points else np.zeros((0, 1, 2), np.float32)
+        self.owner = np.concatenate(owner) if owner else np.zeros(0, np.int64)
+        self.gray = gray
+
+    def _propagate(self, gray, frame_shape):
+        """Move every box with the flow of its points; False when any box fails the flow check"""
+        if not len(self.boxes):
+            self.gray = gray
+            return True
+        if not len(self.points):
+            return False
+        p0 = self.points
+        p1, st1, _ = cv2.calcOpticalFlowPyrLK(self.gray, gray, p0, None, **LK_PARAMS)
+        back, st2, _ = cv2.calcOpticalFlowPyrLK(gray, self.gray, p1, None, **LK_PARAMS)
+        fb_error = np.linalg.norm((p0 - back).reshape(-1, 2), axis=1)
+        good = (st1.ravel() == 1) & (st2.ravel() == 1) & (fb_error < self.max_fb_error)
+        p0, p1 = p0.reshape(-1, 2), p1.reshape(-1, 2)
+
+        boxes = self.boxes.copy()
+        for i in range(len(boxes)):
+            mine = self.owner == i
+            ok = mine & good
+            n = int(ok.sum())
+            if n < MIN_POINTS or n < self.min_good_fraction * mine.sum():
+                return False
+            a, b = p0[ok], p1[ok]
+            shift = np.median(b - a, axis=0) / self.flow_scale
+            spread0 = np.median(np.linalg.norm(a - np.median(a, axis=0), axis=1))
+            spread1 = np.median(np.linalg.norm(b - np.median(b, axis=0), axis=1))
+            scale = np.clip(spread1 / spread0, 1 / MAX_SCALE_STEP, MAX_SCALE_STEP) if spread0 > 1e-3 else 1.0
+            center = (boxes[i, :2] + boxes[i, 2:]) / 2 + shift
+            half = (boxes[i, 2:] - boxes[i, :2]) / 2 * scale
+            boxes[i] = np.concatenate([center - half, center + half])
+
+        fh, fw = frame_shape[:2]
+        self.boxes = np.clip(boxes, 0, [fw, fh, fw, fh]).astype(np.float32)
+        self.points, self.owner = p1[good].reshape(-1, 1, 2), self.owner[good]
+        self.gray = gray
+        return True
+
+    def __call__(self, frame):
+        """Detections (boxes, scores, classes) in frame pixels for this frame"""
+        self.frames += 1
+        gray = self._gray(frame)
+        if self.gray is None or self.since_keyframe + 1 >= self.keyframe_interval:
+            self.last_mode = "keyframe"
+            self._detect(frame, gray)
+        elif self._propagate(gray, frame.shape):
+            self.last_mode = "flow"
+            self.since_keyframe += 1
+        else:
+            self.last_mode = "keyframe (flow check)"
+            self.flow_failures += 1
+            self._detect(frame, gray)
+        return self.boxes.copy(), self.scores.copy(), self.classes.copy()
+
+
+def add_flow_args(parser):
+    parser.add_argument("--keyframe-interval", type=int, default=1,
+                        help="Run the detector every N frames and propagate boxes with optical flow in between "
+                             "(1 = detect every frame)")
+
+# ----- Evaluation -----
+
+def match_counts(boxes, classes, ref_boxes, ref_classes, iou_thr=MATCH_IOU):
+    """(matched, unmatched, missed, summed IoU of matches) with greedy class-aware IoU matching"""
+    if not len(boxes) or not len(ref_boxes):
+        return 0, len(boxes), len(ref_boxes), 0.0
+    iou = pairwise_overlap(boxes, ref_boxes)
+    iou[classes[:, None] != ref_classes[None, :]] = 0
+    used_a, used_b, iou_sum = set(), set(), 0.0
+    for a, b in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+        if iou[a, b] < iou_thr:
+            break
+        if a in used_a or b in used_b:
+            continue
+        used_a.add(a)
+        used_b.add(b)
+        iou_sum += float(iou[a, b])
+    n = len(used_a)
+    return n, len(boxes) - n, len(ref_boxes) - n, iou_sum
+
+
+def evaluate(model, frames, intervals, conf=0.25, imgsz=None):
+    """Per interval: effective FPS and agreement with every-frame detection on the same frames"""
+    FlowDetector(model, conf=conf, imgsz=imgsz)(frames[0])      # warm-up, so the first run isn't penalized
+    reference, rows = None, []
+    for interval in sorted(set([1] + list(intervals))):
+        flow = FlowDetector(model, conf=conf, imgsz=imgsz, keyframe_interval=interval)
+        outputs, start = [], time.perf_counter()
+        for frame in frames:
+            outputs.append(flow(frame))
+        seconds = time.perf_counter() - start
+        if reference is None:
+            reference = outputs
+        tp = fp = fn = 0
+        iou_sum = 0.0
+        for (b, _, c), (rb, _, rc) in zip(outputs, reference):
+            m, u, miss, s = match_counts(b, c, rb, rc)
+            tp, fp, fn, iou_sum = tp + m, fp + u, fn + miss, iou_sum + s
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / (tp + fn) if tp + fn else 1.0
+        rows.append({
+            "interval": interval,
+            "fps": len(frames) / seconds,
+            "ms_per_frame": seconds * 1000 / len(frames),
+            "keyframe_ratio": flow.keyframe_ratio,
+            "flow_failures": flow.flow_failures,
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "mean_iou": iou_sum / tp if tp else 0.0,
+        })
+    base_fps = rows[0]["fps"]
+    for row in rows:
+        row["speedup"] = row["fps"] / base_fps
+    return rows
+
+
+def read_frames(video, max_frames):
+    """Decode up to max_frames frames into memory so decoding stays out of the timings"""
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open {video}")
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise RuntimeError(f"No frames in {video}")
+    return frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Speed and accuracy of keyframe detection + optical-flow propagation")
+    parser.add_argument("--video", required=True, help="Recorded footage to replay")
+    parser.add_argument("--model", type=str, default="yolo11s.pt", help="Path to the YOLO model weights")
+    parser.add_argument("--intervals", type=int, nargs="+", default=[2, 3, 5, 10], help="Keyframe intervals to test")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--imgsz", type=int, default=None, help="Inference image size")
+    parser.add_argument("--frames", type=int, default=300, help="Frames to replay")
+    parser.add_argument("--output", type=str, default=None, help="Also write the table to this JSON file")
+    args = parser.parse_args(argv)
+
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+    frames = read_frames(args.video, args.frames)
+    print(f"Replaying {len(frames)} frames of {args.video}; reference: detection on every frame")
+    rows = evaluate(model, frames, args.intervals, args.conf, args.imgsz)
+
+    print(f"{'interval':>8} {'fps':>7} {'speedup':>8} {'keyframes':>9} {'precision':>9} {'recall':>7} "
+          f"{'F1':>6} {'mIoU':>6}")
+    for r in rows:
+        print(f"{r['interval']:>8} {r['fps']:>7.1f} {r['speedup']:>7.2f}x {r['keyframe_ratio']:>9.0%} "
+              f"{r['precision']:>9.3f} {r['recall']:>7.3f} {r['f1']:>6.3f} {r['mean_iou']:>6.3f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"video": args.video, "model": args.model, "frames": len(frames), "results": rows}, f, indent=2)
+        print(f"Results written to: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
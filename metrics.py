@@ -0,0 +1,242 @@
+"""
+Per-stage timing for the runtime loops (capture, preprocess, inference,
+postprocess, tracker, mask, render, ...).
+
+Each stage keeps its last `window` durations in a NumPy ring buffer, from which
+percentiles are computed on demand, plus running totals. Output options, any
+combination:
+  --metrics-log SECONDS   periodic one-line summary on stdout
+  --metrics-port PORT     Prometheus text format on http://127.0.0.1:PORT/metrics
+  --metrics-jsonl PATH    one JSON record per frame with every stage's ms
+
+With none of them given the Metrics object is disabled: stage() returns a shared
+no-op context manager and record()/frame_done() return immediately.
+
+gauge(name, value) publishes a current value next to the timings, e.g. the
+operating point chosen by quality_controller.py.
+
+Usage:
+  metrics = metrics_from_args(args)
+  with metrics.stage("capture"):
+      ret, frame = cap.read()
+  results = model.predict(frame)
+  metrics.record_speed(results[0].speed)     # Ultralytics preprocess/inference/postprocess ms
+  metrics.frame_done()
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+ULTRALYTICS_STAGES = ("preprocess", "inference", "postprocess")
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """Times one `with` block into its ring"""
+    __slots__ = ("ring", "start")
+
+    def __init__(self, ring):
+        self.ring = ring
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.ring.add(time.perf_counter() - self.start)
+        return False
+
+
+class StageRing:
+    """Last `window` durations (seconds) of one stage plus lifetime sum/count"""
+
+    def __init__(self, window=WINDOW):
+        self.values = np.zeros(window, np.float64)
+        self.index = 0
+        self.filled = 0
+        self.total = 0.0
+        self.count = 0
+        self.current = None          # duration within the frame being timed
+        self.lock = threading.Lock()  # stages may be recorded from worker threads
+
+    def add(self, seconds):
+        with self.lock:
+            self.values[self.index] = seconds
+            self.index = (self.index + 1) % len(self.values)
+            self.filled = min(self.filled + 1, len(self.values))
+            self.total += seconds
+            self.count += 1
+            self.current = seconds if self.current is None else self.current + seconds
+
+    def window(self):
+        return self.values[:self.filled]
+
+    def quantiles(self, qs=QUANTILES):
+        w = self.window()
+        return np.quantile(w, qs) if len(w) else np.zeros(len(qs))
+
+
+class Metrics:
+    def __init__(self, enabled=True, window=WINDOW, log_every=None, jsonl=None, port=None, name="robodog"):
+        self.enabled = enabled
+        self.window = window
+        self.name = name
+        self.stages = {}
+        self.gauges = {}
+        self.frames = 0
+        self.log_every = log_every
+        self.last_log = time.perf_counter()
+        self.frames_at_log = 0
+        self.jsonl = open(jsonl, "a") if enabled and jsonl else None
+        self.lock = threading.Lock()
+        self.server = None
+        if enabled and port:
+            self.serve(port)
+
+    def _ring(self, name):
+        ring = self.stages.get(name)
+        if ring is None:
+            with self.lock:
+                ring = self.stages.setdefault(name, StageRing(self.window))
+        return ring
+
+    def stage(self, name):
+        """Context manager timing one stage"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self._ring(name))
+
+    def record(self, name, seconds):
+        if self.enabled:
+            self._ring(name).add(seconds)
+
+    def record_speed(self, speed):
+        """Ultralytics Results.speed ({"preprocess": ms, "inference": ms, "postprocess": ms})"""
+        if self.enabled and speed:
+            for key in ULTRALYTICS_STAGES:
+                if speed.get(key) is not None:
+                    self._ring(key).add(speed[key] / 1000.0)
+
+    def gauge(self, name, value):
+        """Current value of a setting or level (last write wins)"""
+        if self.enabled:
+            self.gauges[name] = value
+
+    def frame_done(self, **extra):
+        """Close the current frame: JSONL trace record and periodic log line"""
+        if not self.enabled:
+            return
+        self.frames += 1
+        if self.jsonl is not None:
+            record = {"t": round(time.time(), 4), "frame": self.frames}
+            record.update({k: round(r.current * 1000, 3) for k, r in list(self.stages.items()) if r.current is not None})
+            record.update(self.gauges)
+            record.update(extra)
+            self.jsonl.write(json.dumps(record) + "\n")
+        for ring in list(self.stages.values()):
+            ring.current = None
+        if self.log_every:
+            now = time.perf_counter()
+            if self.frames == 1:
+                self.last_log, self.frames_at_log = now, 1     # don't count model loading/warm-up
+            elif now - self.last_log >= self.log_every:
+                fps = (self.frames - self.frames_at_log) / (now - self.last_log)
+                self.last_log, self.frames_at_log = now, self.frames
+                print(self.summary_line(fps))
+
+    def summary_line(self, fps=None):
+        parts = [f"{fps:.1f} fps"] if fps is not None else []
+        for name, ring in list(self.stages.items()):
+            p50, p95, _ = ring.quantiles() * 1000
+            parts.append(f"{name} {p50:.1f}/{p95:.1f}ms")
+        line = f"[{self.name}] " + " | ".join(parts) + " (p50/p95)"
+        if self.gauges:
+            line += " | " + " ".join(f"{k}={v}" for k, v in list(self.gauges.items()))
+        return line
+
+    def summary(self):
+        """{stage: {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"}} over the window"""
+        out = {}
+        for name, ring in list(self.stages.items()):
+            w = ring.window()
+            q = ring.quantiles() * 1000
+            out[name] = {"count": ring.count, "mean_ms": float(w.mean() * 1000) if len(w) else 0.0,
+                         **{f"p{int(p * 100)}_ms": float(v) for p, v in zip(QUANTILES, q)}}
+        return out
+
+    def prometheus_text(self):
+        metric = f"{self.name}_stage_seconds"
+        lines = [f"# HELP {metric} Per-stage duration over the last {self.window} samples",
+                 f"# TYPE {metric} summary"]
+        for name, ring in list(self.stages.items()):
+            for p, v in zip(QUANTILES, ring.quantiles()):
+                lines.append(f'{metric}{{stage="{name}",quantile="{p}"}} {v:.6f}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {ring.total:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {ring.count}')
+        lines.append(f"# TYPE {self.name}_frames_total counter")
+        lines.append(f"{self.name}_frames_total {self.frames}")
+        for name, value in list(self.gauges.items()):
+            lines.append(f"# TYPE {self.name}_{name} gauge")
+            lines.append(f"{self.name}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Prometheus endpoint on a background thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode()
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="metrics-http").start()
+        print(f"Metrics on http://{host}:{port}/metrics")
+
+    def close(self):
+        if self.enabled and self.log_every and self.frames:
+            print(self.summary_line())
+        if self.jsonl is not None:
+            self.jsonl.close()
+            self.jsonl = None
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
+
+
+def add_metrics_args(parser):
+    group = parser.add_argument_group("metrics")
+    group.add_argument("--metrics-log", type=float, default=None, metavar="SECONDS",
+                       help="Print per-stage latency percentiles every SECONDS")
+    group.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+    group.add_argument("--metrics-jsonl", type=str, default=None, help="Write a per-frame JSONL stage trace")
+    return parser
+
+
+def metrics_from_args(args, name="robodog", enabled=False):
+    """enabled=True collects stage timings even without an output (e.g. for the quality controller)"""
+    enabled = enabled or bool(args.metrics_log or args.metrics_port or args.metrics_jsonl)
+    return Metrics(enabled, log_every=args.metrics_log, jsonl=args.metrics_jsonl, port=args.metrics_port, name=name)
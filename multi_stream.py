@@ -0,0 +1,294 @@
+"""
+Multi-camera inference service: one shared model, N streams, cross-stream batching.
+
+Each source (camera index, RTSP URL or video file) is read by its own thread
+that only keeps the newest frame. The main loop gathers the pending frames of
+all streams into one batch for a single model.predict call. A batch goes out
+as soon as every stream has a new frame, or when waiting any longer would push
+the oldest pending frame past its stream's latency budget (taking the running
+average inference time into account). Detections are handed to per-stream
+tracker threads (DeepSORT), so a slow tracker never blocks inference.
+
+Video files play back at their native frame rate by default, so a file can
+stand in for an RTSP camera when testing.
+
+Example:
+  python multi_stream.py --model runs/detect/train2/weights/best.pt --sources 0 1 --show
+  python multi_stream.py --sources front.mp4 rear.mp4 --budget-ms 80 --no-track
+"""
+import argparse
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from metrics import Metrics, add_metrics_args, metrics_from_args
+from overlay import OverlayRenderer
+from thresholds import class_threshold_mask, load_threshold_profile
+from track_store import TrackStore
+
+LATENCY_BUDGET_MS = 100        # max age of a frame when its batch starts
+MAX_BATCH = 8
+STATS_EVERY = 5.0              # seconds between throughput reports
+
+
+def open_capture(source):
+    """cv2.VideoCapture for a camera index ("0") or a path/URL"""
+    return cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+
+
+class StreamReader(threading.Thread):
+    """Reads one source in the background, keeping only the newest frame"""
+
+    def __init__(self, name, source, budget_ms=LATENCY_BUDGET_MS, realtime=True):
+        super().__init__(daemon=True, name=f"reader-{name}")
+        self.name_ = name
+        self.source = source
+        self.budget = budget_ms / 1000.0
+        self.cap = open_capture(source)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Cannot open source {source}")
+        self.is_file = not str(source).isdigit() and "://" not in str(source)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 0
+        self.frame_interval = 1.0 / fps if realtime and self.is_file and fps > 0 else 0.0
+        self.lock = threading.Lock()
+        self.frame = None
+        self.stamp = 0.0
+        self.seq = 0
+        self.taken_seq = 0
+        self.dropped = 0
+        self.running = True
+
+    def run(self):
+        next_due = time.perf_counter()
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            if self.frame_interval:
+                next_due += self.frame_interval
+                time.sleep(max(0.0, next_due - time.perf_counter()))
+            with self.lock:
+                if self.seq > self.taken_seq:
+                    self.dropped += 1        # previous frame was never batched
+                self.frame, self.stamp = frame, time.perf_counter()
+                self.seq += 1
+        self.running = False
+        self.cap.release()
+
+    def pending(self):
+        """Timestamp of an unbatched frame, or None"""
+        with self.lock:
+            return self.stamp if self.seq > self.taken_seq else None
+
+    def take(self):
+        with self.lock:
+            self.taken_seq = self.seq
+            return self.frame, self.stamp
+
+    def stop(self):
+        self.running = False
+
+
+class StreamTracker(threading.Thread):
+    """Per-stream DeepSORT worker fed with (frame, boxes, scores, classes)"""
+
+    def __init__(self, name, names, track=True, metrics=None):
+        super().__init__(daemon=True, name=f"tracker-{name}")
+        self.names = names
+        self.metrics = metrics or Metrics(enabled=False)
+        self.inbox = queue.Queue(maxsize=2)
+        self.output = None             # latest annotated frame
+        self.overlay = OverlayRenderer()
+        self.store = TrackStore(names=names)   # unique track count in constant memory
+        self.tracker = None
+        if track:
+            from deep_sort_realtime.deepsort_tracker import DeepSort
+            self.tracker = DeepSort(max_age=30, n_init=3, max_cosine_distance=0.2)
+
+    def submit(self, item):
+        # Latest wins: drop the oldest queued result rather than block the batcher
+        try:
+            self.inbox.put_nowait(item)
+        except queue.Full:
+            try:
+                self.inbox.get_nowait()
+            except queue.Empty:
+                pass
+            self.inbox.put_nowait(item)
+
+    def run(self):
+        while True:
+            item = self.inbox.get()
+            if item is None:
+                break
+            frame, boxes, scores, classes = item
+            start = time.perf_counter()
+            # Frames are shared with the reader, so the overlay draws into its own buffer
+            frame.flags.writeable = False
+            canvas = self.overlay.begin(frame)
+            if self.tracker is None:
+                for box, cls in zip(boxes, classes):
+                    self.overlay.box(canvas, box, self.names.get(int(cls), str(cls)), cls)
+            else:
+                dets = [([float(x1), float(y1), float(x2 - x1), float(y2 - y1)], float(s), int(c))
+                        for (x1, y1, x2, y2), s, c in zip(boxes, scores, classes)]
+                tracks = self.tracker.update_tracks(dets, frame=frame)
+                self.store.update(tracks)
+                for t in tracks:
+                    if not t.is_confirmed():
+                        continue
+                    self.overlay.box(canvas, t.to_ltrb(),
+                                     f"{self.names.get(t.det_class, str(t.det_class))} ID:{t.track_id}", t.det_class)
+            self.output = canvas.copy()
+            self.metrics.record("tracker" if self.tracker is not None else "render", time.perf_counter() - start)
+
+
+class MultiStreamServer:
+    """Batches the newest frames of several streams through one model"""
+
+    def __init__(self, model, sources, budgets_ms=None, conf=0.25, thresholds=None, imgsz=640,
+                 max_batch=MAX_BATCH, track=True, realtime=True, metrics=None):
+        self.model = model
+        self.metrics = metrics or Metrics(enabled=False)
+        self.conf = conf
+        self.thresholds = thresholds
+        self.imgsz = imgsz
+        self.max_batch = max_batch
+        budgets_ms = budgets_ms or [LATENCY_BUDGET_MS]
+        self.readers, self.trackers = [], []
+        for i, source in enumerate(sources):
+            name = f"stream{i}"
+            self.readers.append(StreamReader(name, source, budgets_ms[min(i, len(budgets_ms) - 1)], realtime))
+            self.trackers.append(StreamTracker(name, model.names, track, self.metrics))
+        self.infer_time = 0.0          # running average seconds per batch
+        self.batches = 0
+        self.frames = 0
+        self.latencies = []
+
+    def _ready_batch(self):
+        """Indices of streams to batch now, or [] to keep waiting"""
+        now = time.perf_counter()
+        pending = [(i, r.pending()) for i, r in enumerate(self.readers)]
+        pending = [(i, ts) for i, ts in pending if ts is not None]
+        if not pending:
+            return []
+        alive = [r for r in self.readers if r.running]
+        all_fresh = len(pending) >= len(alive)
+        # Fire early enough that the oldest frame still meets its budget after inference
+        urgent = any(now - ts + self.infer_time >= self.readers[i].budget for i, ts in pending)
+        if all_fresh or urgent or len(pending) >= self.max_batch:
+            pending.sort(key=lambda p: p[1])
+            return [i for i, _ in pending[:self.max_batch]]
+        return []
+
+    def step(self):
+        """Run at most one batch; returns the number of frames inferred"""
+        idx = self._ready_batch()
+        if not idx:
+            time.sleep(0.001)
+            return 0
+        taken = [self.readers[i].take() for i in idx]
+        frames = [f for f, _ in taken]
+        start = time.perf_counter()
+        results = self.model.predict(source=frames, conf=self.conf, imgsz=self.imgsz, verbose=False)
+        done = time.perf_counter()
+        self.infer_time = (done - start) if self.batches == 0 else 0.8 * self.infer_time + 0.2 * (done - start)
+        self.batches += 1
+        self.frames += len(frames)
+        self.metrics.record_speed(results[0].speed)
+        for i, frame, (_, stamp), result in zip(idx, frames, taken, results):
+            self.latencies.append(done - stamp)
+            self.metrics.record("queue", start - stamp)
+            boxes = result.boxes.xyxy.cpu().numpy()
+            scores = result.boxes.conf.cpu().numpy()
+            classes = result.boxes.cls.cpu().numpy().astype(int)
+            if self.thresholds is not None:
+                keep = class_threshold_mask(classes, scores, self.thresholds)
+                boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+            self.trackers[i].submit((frame, boxes, scores, classes))
+        self.metrics.frame_done(batch=len(frames))
+        return len(frames)
+
+    def report(self, elapsed):
+        lat = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        dropped = sum(r.dropped for r in self.readers)
+        print(f"{self.frames / elapsed:6.1f} frames/s | {self.frames / max(self.batches, 1):.2f} frames/batch | "
+              f"infer {self.infer_time * 1000:.1f} ms | latency p50 {np.percentile(lat, 50):.1f} / "
+              f"p95 {np.percentile(lat, 95):.1f} ms | dropped {dropped}")
+        self.frames, self.batches, self.latencies = 0, 0, []
+
+    def run(self, show=False):
+        # Warm up (fuse, allocate) before the readers start so the first batch isn't seconds late
+        dummy = np.zeros((self.imgsz, self.imgsz, 3), np.uint8)
+        self.model.predict(source=[dummy] * min(len(self.readers), self.max_batch), imgsz=self.imgsz, verbose=False)
+        for r in self.readers:
+            r.start()
+        for t in self.trackers:
+            t.start()
+        last_report = time.perf_counter()
+        try:
+            while any(r.running or r.pending() is not None for r in self.readers):
+                self.step()
+                now = time.perf_counter()
+                if now - last_report >= STATS_EVERY:
+                    self.report(now - last_report)
+                    last_report = now
+                if show:
+                    for r, t in zip(self.readers, self.trackers):
+                        if t.output is not None:
+                            cv2.imshow(r.name_, t.output)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+        finally:
+            for r in self.readers:
+                r.stop()
+            for t in self.trackers:
+                t.inbox.put(None)
+            for t in self.trackers:
+                t.join(timeout=5)
+            self.metrics.close()
+            if show:
+                cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-model inference over several camera streams")
+    parser.add_argument("--model", type=str, default="yolo11s.pt", help="Path to the YOLO model weights")
+    parser.add_argument("--sources", nargs="+", default=["0"],
+                        help="Camera indexes, RTSP URLs or video files")
+    parser.add_argument("--budget-ms", type=float, nargs="+", default=[LATENCY_BUDGET_MS],
+                        help="Latency budget per stream in ms (one value applies to all)")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--thresholds", type=str, default=None,
+                        help="Per-class threshold profile from scripts/tune_thresholds.py")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Largest cross-stream batch")
+    parser.add_argument("--no-track", action="store_true", help="Skip DeepSORT, just draw detections")
+    parser.add_argument("--no-realtime", action="store_true",
+                        help="Read video files as fast as possible instead of at their frame rate")
+    parser.add_argument("--show", action="store_true", help="Display one window per stream")
+    add_metrics_args(parser)
+    args = parser.parse_args()
+
+    model = YOLO(args.model)
+    thresholds = None
+    conf = args.conf
+    if args.thresholds:
+        thresholds = load_threshold_profile(args.thresholds, model.names)
+        conf = float(thresholds.min())
+
+    server = MultiStreamServer(model, args.sources, args.budget_ms, conf=conf, thresholds=thresholds,
+                               imgsz=args.imgsz, max_batch=args.max_batch, track=not args.no_track,
+                               realtime=not args.no_realtime, metrics=metrics_from_args(args, "multi_stream"))
+    print(f"Serving {len(args.sources)} streams with one model. Press 'q' in a window (or Ctrl+C) to quit.")
+    try:
+        server.run(show=args.show)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Cheap box/label overlay for the live loops.
+
+Results.plot() copies the frame, builds an Annotator and rasterizes every label
+with full font rendering on every frame. OverlayRenderer instead draws into one
+reusable display buffer (or straight into the frame when it is writeable and
+shown at full size), and keeps each label as a pre-rendered sprite keyed by its
+text and color, so a label is rasterized once and afterwards only blitted with
+a slice copy. It can also render at a lower display resolution, or only every
+Nth frame.
+"""
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+MAX_SPRITES = 512              # cached label sprites (track IDs keep growing, so this is an LRU)
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.5
+LINE_THICKNESS = 2
+TEXT_COLOR = (255, 255, 255)
+
+# BGR colors per class id (class id modulo the palette length)
+PALETTE = [
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207), (10, 249, 72),
+    (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0), (168, 153, 44), (255, 194, 0),
+    (147, 69, 52), (255, 115, 100), (236, 24, 0), (255, 56, 132), (133, 0, 82), (255, 56, 203),
+]
+
+
+def class_color(cls):
+    return PALETTE[int(cls) % len(PALETTE)]
+
+
+class OverlayRenderer:
+    """
+    Usage per frame:
+        canvas = overlay.begin(frame)       # None on skipped frames
+        if canvas is not None:
+            overlay.box(canvas, xyxy, "person ID:3", cls)
+            overlay.text(canvas, "Unique objects: 4", (20, 30))
+            cv2.imshow(name, canvas)
+
+    Box coordinates are always in frame pixels; they are scaled to the display size here.
+    """
+
+    def __init__(self, scale=1.0, every=1, font_scale=FONT_SCALE, thickness=LINE_THICKNESS,
+                 max_sprites=MAX_SPRITES):
+        self.scale = scale
+        self.every = max(1, every)
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self.max_sprites = max_sprites
+        self.sprites = OrderedDict()   # (text, color, font_scale) -> BGR sprite
+        self.buffer = None
+        self.frame_idx = -1
+
+    # ----- Frame -----
+
+    def begin(self, frame):
+        """Canvas to draw this frame on, or None when this frame is not rendered"""
+        self.frame_idx += 1
+        if self.frame_idx % self.every:
+            return None
+        if self.scale == 1.0:
+            # Writeable frames are drawn on in place; shared read-only views go through the buffer
+            if frame.flags.writeable:
+                return frame
+            if self.buffer is None or self.buffer.shape != frame.shape:
+                self.buffer = np.empty_like(frame)
+            np.copyto(self.buffer, frame)
+            return self.buffer
+        h, w = frame.shape[:2]
+        size = (max(1, int(w * self.scale)), max(1, int(h * self.scale)))
+        if self.buffer is None or self.buffer.shape[:2] != size[::-1]:
+            self.buffer = np.empty((size[1], size[0]) + frame.shape[2:], frame.dtype)
+        cv2.resize(frame, size, dst=self.buffer, interpolation=cv2.INTER_NEAREST)
+        return self.buffer
+
+    # ----- Drawing -----
+
+    def sprite(self, text, color, font_scale=None):
+        """Label rendered once on a filled background, then reused"""
+        font_scale = font_scale or self.font_scale
+        key = (text, color, font_scale)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            return sprite
+        thickness = max(1, round(font_scale * 2))
+        (tw, th), baseline = cv2.getTextSize(text, FONT, font_scale, thickness)
+        sprite = np.empty((th + baseline + 4, tw + 4, 3), np.uint8)
+        sprite[:] = color
+        cv2.putText(sprite, text, (2, th + 2), FONT, font_scale, TEXT_COLOR, thickness, cv2.LINE_AA)
+        self.sprites[key] = sprite
+        if len(self.sprites) > self.max_sprites:
+            self.sprites.popitem(last=False)
+        return sprite
+
+    def blit(self, canvas, sprite, x, y):
+        """Copy a sprite with its top-left corner at (x, y), clipped to the canvas"""
+        ch, cw = canvas.shape[:2]
+        sh, sw = sprite.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sw, cw), min(y + sh, ch)
+        if x1 <= x0 or y1 <= y0:
+            return
+        canvas[y0:y1, x0:x1] = sprite[y0 - y:y1 - y, x0 - x:x1 - x]
+
+    def box(self, canvas, xyxy, label=None, cls=0, color=None):
+        color = color or class_color(cls)
+        x1, y1, x2, y2 = (int(v * self.scale) for v in xyxy)
+        cv2.rectangle(canvas, (x1, y1), (x2, y2), color, self.thickness)
+        if label:
+            sprite = self.sprite(label, color)
+            # Above the box, or inside it when the box touches the top edge
+            y = y1 - sprite.shape[0] if y1 >= sprite.shape[0] else y1
+            self.blit(canvas, sprite, x1, y)
+
+    def text(self, canvas, text, org, color=(0, 0, 0), font_scale=None):
+        """HUD text on a `color` background; org is the top-left corner in display pixels"""
+        self.blit(canvas, self.sprite(text, color, font_scale), *org)
+
+    def detections(self, frame, xyxy, classes, labels):
+        """begin() + one box per detection; returns the canvas or None"""
+        canvas = self.begin(frame)
+        if canvas is not None:
+            for box, cls, label in zip(xyxy, classes, labels):
+                self.box(canvas, box, label, cls)
+        return canvas
+
+
+def result_labels(result):
+    """Labels for an Ultralytics result; confidence is rounded to one decimal so the sprites stay cached"""
+    names = result.names
+    return [f"{names.get(int(c), str(int(c)))} {s:.1f}"
+            for c, s in zip(result.boxes.cls.tolist(), result.boxes.conf.tolist())]
+
+
+def add_overlay_args(parser):
+    parser.add_argument("--display-scale", type=float, default=1.0,
+                        help="Render the overlay at this fraction of the frame size")
+    parser.add_argument("--render-every", type=int, default=1,
+                        help="Only render/display every Nth frame")
@@ -0,0 +1,187 @@
+"""
+Adaptive quality control that holds a per-frame latency budget in the live loops.
+
+Without it a frame costs whatever the scene makes it cost, and cluttered scenes
+make the robot's control loop miss deadlines. QualityController watches the
+smoothed frame time and the per-stage timings that `metrics.py` already
+collects. When the frame time rises above the target, it makes the stage that
+currently costs the most cheaper by one step:
+  inference  lower imgsz (down to min_imgsz), then detect only every Nth frame
+  tracker    re-embed tracks less often (needs the embedding cache)
+  render     refresh the display less often
+Once the frame time falls below `low_water` x target, the most recent step is
+undone, but only if the stage cost, scaled to the better setting, is predicted
+to still fit under UPGRADE_HEADROOM x target. After every change the
+controller holds for `hold` frames so the smoothed timings can settle. This
+band plus the hold are the hysteresis that keeps it from oscillating.
+
+The operating point (imgsz, frame skip, embed refresh, render interval,
+smoothed frame time) is published as metrics gauges, so it shows up in the
+Prometheus endpoint, the JSONL trace and the periodic log line.
+
+Usage:
+  controller = QualityController(target_ms=66, knobs=("imgsz", "skip", "render_every"))
+  while True:
+      if controller.detect_now():
+          results = model(frame, imgsz=controller.imgsz)
+      ...
+      overlay.every = controller.render_every
+      controller.frame_done(metrics)        # before metrics.frame_done()
+      metrics.frame_done()
+"""
+import time
+
+MAX_IMGSZ = 640                # best (starting) inference size
+MIN_IMGSZ = 320                # smallest inference size the controller may pick
+IMGSZ_STEP = 64                # inference size ladder step (a multiple of the model stride, 32)
+SKIP_LEVELS = (1, 2, 3)        # detect every Nth frame
+EMBED_REFRESH_LEVELS = (1, 3, 5, 10, 20)
+RENDER_EVERY_LEVELS = (1, 2, 3, 5)
+LOW_WATER = 0.7                # upgrade only once the frame time is below this fraction of the target
+UPGRADE_HEADROOM = 0.85        # ...and the upgrade is predicted to stay below this fraction
+HOLD_FRAMES = 15               # frames to wait after a change before the next one
+WARMUP_FRAMES = 10             # first frames (model warm-up) are not acted on
+SMOOTHING = 0.2                # EWMA weight of the newest frame
+
+# Metric stage names -> the stage group whose knobs can make them cheaper
+STAGE_GROUPS = {"preprocess": "inference", "inference": "inference", "postprocess": "inference",
+                "filter": "inference", "tracker": "tracker", "render": "render"}
+GROUP_KNOBS = {"inference": ("imgsz", "skip"), "tracker": ("embed_refresh",), "render": ("render_every",)}
+
+
+class QualityController:
+    def __init__(self, target_ms, knobs=("imgsz", "skip", "embed_refresh", "render_every"), max_imgsz=MAX_IMGSZ,
+                 min_imgsz=MIN_IMGSZ, embed_refresh=1, render_every=1, low_water=LOW_WATER, hold=HOLD_FRAMES):
+        """embed_refresh/render_every: the configured (best) settings the ladders start from"""
+        self.target = target_ms / 1000.0
+        self.low_water = low_water
+        self.hold = hold
+        self.levels = {
+            "imgsz": tuple(range(max_imgsz, min_imgsz - 1, -IMGSZ_STEP)) or (max_imgsz,),
+            "skip": SKIP_LEVELS,
+            "embed_refresh": (embed_refresh,) + tuple(v for v in EMBED_REFRESH_LEVELS if v > embed_refresh),
+            "render_every": (render_every,) + tuple(v for v in RENDER_EVERY_LEVELS if v > render_every),
+        }
+        self.knobs = set(knobs)
+        self.index = {knob: 0 for knob in self.levels}
+        self.history = []          # knobs stepped down, most recent last
+        self.frame_time = None     # smoothed frame time (s)
+        self.costs = {}            # stage group -> smoothed cost per frame (s)
+        self.last_time = None
+        self.frame_idx = 0
+        self.since_change = 0
+        self.changes = 0
+
+    # ----- Operating point -----
+
+    def setting(self, knob):
+        return self.levels[knob][self.index[knob]]
+
+    @property
+    def imgsz(self):
+        return self.setting("imgsz")
+
+    @property
+    def skip(self):
+        return self.setting("skip")
+
+    @property
+    def embed_refresh(self):
+        return self.setting("embed_refresh")
+
+    @property
+    def render_every(self):
+        return self.setting("render_every")
+
+    def detect_now(self):
+        """False on frames the detector (and tracker) are skipped"""
+        return self.frame_idx % self.skip == 0
+
+    def describe(self):
+        return (f"imgsz={self.imgsz} skip={self.skip} embed_refresh={self.embed_refresh} "
+                f"render_every={self.render_every}")
+
+    def state(self):
+        return {"imgsz": self.imgsz, "frame_skip": self.skip, "embed_refresh": self.embed_refresh,
+                "render_every": self.render_every, "quality_changes": self.changes,
+                "frame_ms_smoothed": round((self.frame_time or 0.0) * 1000, 3),
+                "target_ms": round(self.target * 1000, 3)}
+
+    # ----- Control -----
+
+    def _step(self, knob, delta):
+        self.index[knob] += delta
+        self.since_change = 0
+        self.changes += 1
+
+    def _degrade(self):
+        """One step cheaper on the most expensive stage that still has a step left"""
+        for group, _ in sorted(self.costs.items(), key=lambda kv: -kv[1]):
+            for knob in GROUP_KNOBS[group]:
+                if knob in self.knobs and self.index[knob] < len(self.levels[knob]) - 1:
+                    self._step(knob, +1)
+                    self.history.append(knob)
+                    return True
+        return False
+
+    def _predicted_upgrade(self, knob):
+        """Smoothed frame time if `knob` went back one step, scaling its stage's cost"""
+        old, new = self.setting(knob), self.levels[knob][self.index[knob] - 1]
+        group = next(g for g, knobs in GROUP_KNOBS.items() if knob in knobs)
+        # Inference cost grows with the pixel count; skip/refresh/render intervals divide their stage's cost
+        factor = (new / old) ** 2 if knob == "imgsz" else old / new
+        return self.frame_time + self.costs.get(group, 0.0) * (factor - 1)
+
+    def _upgrade(self):
+        knob = self.history[-1]
+        if self._predicted_upgrade(knob) >= UPGRADE_HEADROOM * self.target:
+            return False
+        self.history.pop()
+        self._step(knob, -1)
+        return True
+
+    def frame_done(self, metrics=None, stage_seconds=None):
+        """
+        Feed this frame's stage timings (the current values of `metrics`'s stage
+        rings, or an explicit {stage: seconds}) and the wall time since the last
+        call; may change the operating point. Publishes it as metrics gauges.
+        Returns True when the operating point changed.
+        """
+        now = time.perf_counter()
+        if stage_seconds is None:
+            stage_seconds = {} if metrics is None else {
+                name: ring.current for name, ring in list(metrics.stages.items()) if ring.current is not None}
+        self.frame_idx += 1
+        self.since_change += 1
+
+        groups = dict.fromkeys(GROUP_KNOBS, 0.0)
+        for name, seconds in stage_seconds.items():
+            group = STAGE_GROUPS.get(name)
+            if group is not None:
+                groups[group] += seconds
+        for group, seconds in groups.items():
+            prev = self.costs.get(group)
+            self.costs[group] = seconds if prev is None else prev + SMOOTHING * (seconds - prev)
+        if self.last_time is not None:
+            dt = now - self.last_time
+            self.frame_time = dt if self.frame_time is None else self.frame_time + SMOOTHING * (dt - self.frame_time)
+        self.last_time = now
+
+        changed = False
+        if self.frame_time is not None and self.frame_idx > WARMUP_FRAMES and self.since_change >= self.hold:
+            if self.frame_time > self.target:
+                changed = self._degrade()
+            elif self.frame_time < self.low_water * self.target and self.history:
+                changed = self._upgrade()
+        if metrics is not None:
+            for name, value in self.state().items():
+                metrics.gauge(name, value)
+        return changed
+
+
+def add_quality_args(parser):
+    parser.add_argument("--latency-budget", type=float, default=None, metavar="MS",
+                        help="Target per-frame latency; adapt imgsz, frame skip, embedding and render rate to hold it")
+    parser.add_argument("--max-imgsz", type=int, default=MAX_IMGSZ, help="Best inference size for --latency-budget")
+    parser.add_argument("--min-imgsz", type=int, default=MIN_IMGSZ,
+                        help="Smallest inference size --latency-budget may drop to")
@@ -1,8 +1,8 @@
-import cv2
-import numpy as np
 import argparse
 import sys
 
+# cv2 and numpy are imported inside the functions that use them, so `--help` starts without them
+
 # ----------------------------------------------------------------------
 # configurable defaults
 CENTER_FRACTION = 0.33        # size of the centre ROI, as before
@@ -17,6 +17,9 @@ COEFF_THRESH  = 0.05          # if coef > this → “pressed”
 
 def red_mask(roi, s_min, v_min):
     """binary mask of ‘red enough’ pixels in roi"""
+    import cv2
+    import numpy as np
+
     hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
 
     m1 = cv2.inRange(hsv, (HUE_LOW_1, s_min, v_min),
@@ -37,12 +40,8 @@ def red_mask(roi, s_min, v_min):
     return mask
 
 
-def calculate_red_coefficient(image_path, center_fraction=CENTER_FRACTION,
-                              s_min=SAT_MIN, v_min=VAL_MIN, display=False):
-    frame = cv2.imread(image_path)
-    if frame is None:
-        raise ValueError(f"could not read image: {image_path}")
-
+def red_coefficient(frame, center_fraction=CENTER_FRACTION, s_min=SAT_MIN, v_min=VAL_MIN):
+    """red coefficient of a BGR frame's centre ROI → (coef, (x0, y0, x1, y1), mask)"""
     h, w = frame.shape[:2]
 
     # same asymmetric ROI you used before
@@ -55,10 +54,22 @@ def calculate_red_coefficient(image_path, center_fraction=CENTER_FRACTION,
     roi = frame[y0:y0 + roi_h, x0:x0 + roi_w]
 
     mask = red_mask(roi, s_min, v_min)
-    red_coeff = mask.mean() / 255.0
+    return mask.mean() / 255.0, (x0, y0, x0 + roi_w, y0 + roi_h), mask
+
+
+def calculate_red_coefficient(image_path, center_fraction=CENTER_FRACTION,
+                              s_min=SAT_MIN, v_min=VAL_MIN, display=False):
+    import cv2
+
+    frame = cv2.imread(image_path)
+    if frame is None:
+        raise ValueError(f"could not read image: {image_path}")
+
+    h, w = frame.shape[:2]
+    red_coeff, (x0, y0, x1, y1), mask = red_coefficient(frame, center_fraction, s_min, v_min)
 
     if display:
-        cv2.rectangle(frame, (x0, y0), (x0 + roi_w, y0 + roi_h),
+        cv2.rectangle(frame, (x0, y0), (x1, y1),
                       (0, 255, 0) if red_coeff > COEFF_THRESH else (0, 0, 255), 2)
         cv2.putText(frame, f"coef={red_coeff:.3f}",
                     (10, h - 10), cv2.FONT_HERSHEY_SIMPLEX,
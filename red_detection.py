@@ -1,14 +1,26 @@
 import cv2
 import numpy as np
 import time
+import argparse
+
+from frame_bus import open_capture
+from metrics import add_metrics_args, metrics_from_args
 
 CAM_ID           = 0          # USB-camera index
 CENTER_FRACTION  = 0.33       # side length of the square ROI as a fraction of frame size
 MIN_RED_RATIO    = 0.10       # threshold for detecting a "press"
 COOLDOWN_SECONDS = 1.0        # debounce time after a detection
 
-def main():
-    cap = cv2.VideoCapture(CAM_ID)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live red button press detection")
+    parser.add_argument("--camera", type=int, default=CAM_ID, help="USB-camera index")
+    parser.add_argument("--bus", type=str, default=None,
+                        help="Read frames from this frame_bus.py capture daemon instead of the camera")
+    add_metrics_args(parser)
+    args = parser.parse_args(argv)
+    metrics = metrics_from_args(args, "red_detection")
+
+    cap = open_capture(args.camera, args.bus)
     if not cap.isOpened():
         raise RuntimeError("Camera not found")
 
@@ -20,9 +32,11 @@ def main():
     lo2 = np.array([170,120,70]);    hi2 = np.array([180,255,255])
 
     while True:
-        ret, frame = cap.read()
+        with metrics.stage("capture"):
+            ret, frame = cap.read()
         if not ret:
             break
+        mask_start = time.perf_counter()
 
         h, w = frame.shape[:2]
         
@@ -59,6 +73,7 @@ def main():
         red_mask &= (ratio > 0.5).astype(np.uint8) * 255
 
         red_ratio = red_mask.mean() / 255.0
+        metrics.record("mask", time.perf_counter() - mask_start)
 
         now = time.time()
         if red_ratio >= MIN_RED_RATIO and not pressed and now - last_event_t > COOLDOWN_SECONDS:
@@ -68,7 +83,10 @@ def main():
         elif red_ratio < MIN_RED_RATIO * 0.5:
             pressed = False
 
-        # draw the boundary (green if pressed, red otherwise)
+        render_start = time.perf_counter()
+        # draw the boundary (green if pressed, red otherwise); bus frames are read-only views
+        if not frame.flags.writeable:
+            frame = frame.copy()
         color = (0,255,0) if pressed else (0,0,255)
         cv2.rectangle(frame, (x0,y0), (x0+roi_width, y0+roi_height), color, 2)
 
@@ -80,10 +98,13 @@ def main():
         # show
         cv2.imshow("Live Feed", frame)
         cv2.imshow("Red Mask", red_mask)
+        metrics.record("render", time.perf_counter() - render_start)
+        metrics.frame_done(red=round(float(red_ratio), 4), pressed=pressed)
 
         if cv2.waitKey(1) & 0xFF == 27:  # ESC to quit
             break
 
+    metrics.close()
     cap.release()
     cv2.destroyAllWindows()
 
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the robodog-cv scripts.
+
+Only the module of the chosen subcommand is imported, so torch, ultralytics and
+DeepSORT are loaded by detect/track alone (and even there only after argument
+parsing). The coef and dataset tools import cv2/numpy only once they have work
+to do, so their `--help` costs 10-40 ms on top of the bare interpreter.
+Everything after the subcommand is passed to that script's own parser.
+
+Example:
+  ./robodog-cv detect --model runs/detect/train2/weights/best.pt
+  ./robodog-cv track --roi --display-scale 0.5
+  ./robodog-cv coef red photos/121.jpeg
+  ./robodog-cv stats --dataset datasets/final
+  ./robodog-cv merge --help
+"""
+import argparse
+import importlib
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# subcommand -> (module, summary); modules live in the repo root or scripts/
+COMMANDS = {
+    "detect": ("detection", "Real-time YOLO detection from a camera"),
+    "track": ("tracking", "Real-time detection + DeepSORT tracking"),
+    "button": ("red_detection", "Live red button press detection"),
+    "coef": (None, "Red/white coefficient of a still photo: coef {red,white} IMAGE"),
+    "merge": ("merge_4_datasets", "Merge four YOLO datasets into one class list"),
+    "relabel": ("changing_labels", "Remap class ids of a dataset"),
+    "resplit": ("dataset_resplit", "Re-split train+valid 80/10/10"),
+    "subsample": ("subsample_dataset", "Cap the number of images per class"),
+    "stats": ("dataset_stats", "Class frequencies, box statistics and label health checks"),
+}
+COEF_MODULES = {"red": "red_coefficient_photo", "white": "white_coefficient_photo"}
+
+
+def run_module(command, name, argv):
+    for path in (os.path.join(REPO_ROOT, "scripts"), REPO_ROOT):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    module = importlib.import_module(name)
+    # argparse error/usage messages show the subcommand instead of the module path
+    sys.argv = [f"robodog-cv {command}"] + argv
+    return module.main(argv) or 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(
+        prog="robodog-cv",
+        description="robodog-cv tools. Run 'robodog-cv <command> --help' for a command's options.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(f"  {name:<10} {summary}" for name, (_, summary) in COMMANDS.items()),
+    )
+    parser.add_argument("command", choices=list(COMMANDS), metavar="command")
+    args = parser.parse_args(argv[:1])
+    rest = argv[1:]
+
+    if args.command == "coef":
+        if not rest or rest[0] not in COEF_MODULES:
+            parser.error("coef needs red or white, e.g. robodog-cv coef red IMAGE")
+        return run_module(f"coef {rest[0]}", COEF_MODULES[rest[0]], rest[1:])
+    return run_module(args.command, COMMANDS[args.command][0], rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
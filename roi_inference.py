@@ -0,0 +1,121 @@
+"""
+Tracking-guided region-of-interest inference for the live loop.
+
+Every `discovery_interval` frames the whole frame goes through the model to
+find new objects. On the frames in between only crops around where the
+tracks (tentative ones included) are expected to be (the tracker's Kalman mean
+advanced by one step of its velocity) are run, batched in one predict call at a
+smaller imgsz, and the detections are shifted back into frame coordinates.
+Overlapping windows are merged first so no region is inferred twice.
+"""
+import numpy as np
+
+from detections import empty_detections, merge_detections, results_to_arrays
+
+DISCOVERY_INTERVAL = 5         # full-frame pass every N frames
+ROI_IMGSZ = 320                # inference size for the crops
+ROI_MARGIN = 0.5               # context added around each predicted box, as a fraction of its size
+MIN_ROI = 96                   # smallest crop side in pixels
+MAX_ROI_AREA = 0.6             # fall back to a full frame when crops cover more than this fraction
+
+
+def predicted_track_boxes(tracks, confirmed_only=True):
+    """
+    (tracks, next-frame ltrb boxes) from each track's Kalman state
+    (mean = [cx, cy, aspect, h, vcx, vcy, vaspect, vh]).
+    """
+    kept, boxes = [], []
+    for t in tracks:
+        if t.mean is None or t.is_deleted() or (confirmed_only and not t.is_confirmed()):
+            continue
+        cx, cy, a, h = t.mean[:4] + t.mean[4:8]
+        w = a * h
+        kept.append(t)
+        boxes.append((cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2))
+    return kept, np.array(boxes, np.float32).reshape(-1, 4)
+
+
+def predicted_boxes(tracks):
+    """
+    Next-frame ltrb boxes of confirmed and tentative tracks. Tentative tracks
+    need their crop too: DeepSORT deletes a tentative track on its first miss,
+    so without one a new object could never reach n_init between full passes.
+    """
+    return predicted_track_boxes(tracks, confirmed_only=False)[1]
+
+
+def roi_windows(boxes, frame_shape, margin=ROI_MARGIN, min_size=MIN_ROI):
+    """Expanded, clamped and merged integer crop windows (x0, y0, x1, y1)"""
+    fh, fw = frame_shape[:2]
+    if len(boxes) == 0:
+        return []
+    wh = boxes[:, 2:] - boxes[:, :2]
+    pad = np.maximum(wh * margin, (min_size - wh) / 2).clip(min=0)
+    windows = np.concatenate([boxes[:, :2] - pad, boxes[:, 2:] + pad], axis=1)
+    windows = np.clip(windows, 0, [fw, fh, fw, fh])
+
+    # Merge overlapping windows into their bounding box until nothing overlaps
+    windows = [list(w) for w in windows if w[2] > w[0] and w[3] > w[1]]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(windows)):
+            for j in range(i + 1, len(windows)):
+                a, b = windows[i], windows[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    windows[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del windows[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [tuple(int(round(v)) for v in w) for w in windows]
+
+
+class RoiDetector:
+    """Alternates full-frame discovery passes with batched crops around tracks"""
+
+    def __init__(self, model, conf=0.25, imgsz=None, discovery_interval=DISCOVERY_INTERVAL,
+                 roi_imgsz=ROI_IMGSZ, margin=ROI_MARGIN, max_roi_area=MAX_ROI_AREA, iou=0.5):
+        self.model = model
+        self.conf = conf
+        self.imgsz = imgsz
+        self.discovery_interval = max(1, discovery_interval)
+        self.roi_imgsz = roi_imgsz
+        self.margin = margin
+        self.max_roi_area = max_roi_area
+        self.iou = iou
+        self.frame_idx = 0
+        self.last_mode = "full"
+
+    def _full(self, frame):
+        kwargs = {"imgsz": self.imgsz} if self.imgsz else {}
+        result = self.model.predict(source=frame, conf=self.conf, verbose=False, **kwargs)[0]
+        return results_to_arrays(result)
+
+    def __call__(self, frame, tracks):
+        """Detections (boxes, scores, classes) in frame pixels for this frame"""
+        idx = self.frame_idx
+        self.frame_idx += 1
+        windows = [] if idx % self.discovery_interval == 0 else roi_windows(
+            predicted_boxes(tracks), frame.shape, self.margin)
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in windows)
+        if not windows or area > self.max_roi_area * frame.shape[0] * frame.shape[1]:
+            self.last_mode = "full"
+            return self._full(frame)
+
+        self.last_mode = f"roi x{len(windows)}"
+        crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in windows]
+        results = self.model.predict(source=crops, conf=self.conf, imgsz=self.roi_imgsz, verbose=False)
+        all_boxes, all_scores, all_classes = [], [], []
+        for result, (x0, y0, _, _) in zip(results, windows):
+            boxes, scores, classes = results_to_arrays(result)
+            boxes[:, [0, 2]] += x0
+            boxes[:, [1, 3]] += y0
+            all_boxes.append(boxes)
+            all_scores.append(scores)
+            all_classes.append(classes)
+        if not all_boxes:
+            return empty_detections()
+        return merge_detections(np.concatenate(all_boxes), np.concatenate(all_scores),
+                                np.concatenate(all_classes), self.iou)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Build a pre-resized (optionally pre-letterboxed) copy of a YOLO dataset for training.
+
+Ultralytics resizes every image so its longest side equals imgsz each time it is
+loaded, so with cache: false every epoch re-decodes the full-resolution JPEGs.
+This script does that work once: each image is decoded at reduced resolution
+where possible, resized to longest side = imgsz and written to
+<output>/<split>/images in a fast-decoding format. Labels are hard-linked
+(or rewritten for --letterbox), and <output>/data.yaml points at the copy so it
+can be passed straight to `yolo detect train data=...`.
+
+A manifest of source content hashes is kept in <output>/manifest.json; running
+the script again only rebuilds images whose source changed and removes outputs
+whose source disappeared.
+
+Example:
+  python scripts/build_image_cache.py --dataset datasets/final --imgsz 640
+  yolo detect train model=yolo11s.pt data=datasets/final_cache640/data.yaml imgsz=640
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from multiprocessing import Pool
+
+import cv2
+import yaml
+
+from yolo_dataset import image_size, list_images, list_splits
+
+MANIFEST_FILE = "manifest.json"
+LETTERBOX_COLOR = (114, 114, 114)   # same padding value Ultralytics uses
+FORMATS = {
+    "jpg": (".jpg", [cv2.IMWRITE_JPEG_QUALITY, 95]),
+    "png": (".png", [cv2.IMWRITE_PNG_COMPRESSION, 1]),
+    "bmp": (".bmp", []),            # uncompressed: fastest decode, largest files
+}
+
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def reduced_color_flag(size, imgsz):
+    """Strongest cv2 reduced decode that keeps the longest side >= imgsz"""
+    if size is None:
+        return cv2.IMREAD_COLOR
+    longest = max(size)
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                         (4, cv2.IMREAD_REDUCED_COLOR_4),
+                         (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if longest // factor >= imgsz:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def resize_longest_side(img, imgsz):
+    """Downscale so the longest side equals imgsz (never upscales)"""
+    h, w = img.shape[:2]
+    r = imgsz / max(h, w)
+    if r >= 1:
+        return img
+    return cv2.resize(img, (max(1, round(w * r)), max(1, round(h * r))), interpolation=cv2.INTER_AREA)
+
+
+def letterbox(img, imgsz):
+    """Pad a resized image to imgsz x imgsz; returns (image, pad_x, pad_y)"""
+    h, w = img.shape[:2]
+    pad_x, pad_y = (imgsz - w) // 2, (imgsz - h) // 2
+    out = cv2.copyMakeBorder(img, pad_y, imgsz - h - pad_y, pad_x, imgsz - w - pad_x,
+                             cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    return out, pad_x, pad_y
+
+
+def letterbox_label_lines(lines, w, h, pad_x, pad_y, imgsz):
+    """Map normalized boxes/polygons of a w x h image into the padded imgsz square"""
+    out = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) < 5:
+            continue
+        values = [float(v) for v in parts[1:]]
+        if len(values) == 4:
+            xc, yc, bw, bh = values
+            values = [(xc * w + pad_x) / imgsz, (yc * h + pad_y) / imgsz, bw * w / imgsz, bh * h / imgsz]
+        else:
+            values = [(v * w + pad_x) / imgsz if i % 2 == 0 else (v * h + pad_y) / imgsz
+                      for i, v in enumerate(values)]
+        out.append(" ".join([parts[0]] + [f"{v:.6f}" for v in values]))
+    return out
+
+
+def link_or_copy(src, dst):
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def build_one(task):
+    """Worker: resize one image and write its label; returns (key, entry) or (key, None)"""
+    key, src_image, src_label, dst_image, dst_label, digest, imgsz, fmt, do_letterbox = task
+    img = cv2.imread(src_image, reduced_color_flag(image_size(src_image), imgsz))
+    if img is None:
+        return key, None
+    img = resize_longest_side(img, imgsz)
+    h, w = img.shape[:2]
+
+    if do_letterbox:
+        img, pad_x, pad_y = letterbox(img, imgsz)
+        if src_label:
+            with open(src_label, "r") as f:
+                lines = letterbox_label_lines(f.read().splitlines(), w, h, pad_x, pad_y, imgsz)
+            with open(dst_label, "w") as f:
+                f.writelines(line + "\n" for line in lines)
+    elif src_label:
+        link_or_copy(src_label, dst_label)
+
+    ext, params = FORMATS[fmt]
+    tmp_image = dst_image + ".tmp" + ext
+    cv2.imwrite(tmp_image, img, params)
+    os.replace(tmp_image, dst_image)
+    return key, {"hash": digest, "label_hash": file_digest(src_label) if src_label else None,
+                 "image": os.path.basename(dst_image), "shape": [h, w] if not do_letterbox else [imgsz, imgsz]}
+
+
+def load_manifest(output_dir, settings):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("settings") == settings:
+            return manifest
+        print("Cache settings changed; rebuilding every image.")
+    return {"settings": settings, "files": {}}
+
+
+def write_data_yaml(dataset_dir, output_dir, splits):
+    """Copy the source data.yaml, pointing `path` at the cache directory"""
+    data = {}
+    for yaml_name in ("data.yaml", "dataset.yaml"):
+        src_yaml = os.path.join(dataset_dir, yaml_name)
+        if os.path.exists(src_yaml):
+            with open(src_yaml, "r") as f:
+                data = yaml.safe_load(f) or {}
+            break
+    data["path"] = os.path.abspath(output_dir)
+    if "train" in splits:
+        data["train"] = "train/images"
+    for split in ("valid", "val"):
+        if split in splits:
+            data["val"] = f"{split}/images"
+            break
+    if "test" in splits:
+        data["test"] = "test/images"
+    yaml_path = os.path.join(output_dir, "data.yaml")
+    with open(yaml_path, "w") as f:
+        yaml.dump(data, f, default_flow_style=False)
+    return yaml_path
+
+
+def build_cache(dataset_dir, output_dir, imgsz=640, fmt="jpg", do_letterbox=False, workers=None):
+    """Create or refresh the resized copy of dataset_dir in output_dir"""
+    start = time.perf_counter()
+    settings = {"imgsz": imgsz, "format": fmt, "letterbox": do_letterbox}
+    manifest = load_manifest(output_dir, settings)
+    old_files = manifest["files"]
+    new_files, tasks = {}, []
+    ext = FORMATS[fmt][0]
+    splits = list_splits(dataset_dir)
+
+    for split in splits:
+        src_images = os.path.join(dataset_dir, split, "images")
+        src_labels = os.path.join(dataset_dir, split, "labels")
+        dst_images = os.path.join(output_dir, split, "images")
+        dst_labels = os.path.join(output_dir, split, "labels")
+        os.makedirs(dst_images, exist_ok=True)
+        os.makedirs(dst_labels, exist_ok=True)
+
+        for filename in list_images(src_images):
+            stem = os.path.splitext(filename)[0]
+            key = f"{split}/{filename}"
+            src_image = os.path.join(src_images, filename)
+            src_label = os.path.join(src_labels, stem + ".txt")
+            src_label = src_label if os.path.exists(src_label) else None
+            dst_image = os.path.join(dst_images, stem + ext)
+            dst_label = os.path.join(dst_labels, stem + ".txt")
+
+            st = os.stat(src_image)
+            signature = [st.st_size, st.st_mtime_ns]
+            entry = old_files.get(key)
+            if entry and entry.get("signature") == signature and os.path.exists(dst_image):
+                digest = entry["hash"]
+            else:
+                digest = file_digest(src_image)
+            label_digest = file_digest(src_label) if src_label else None
+
+            if (entry and entry["hash"] == digest and entry.get("label_hash") == label_digest
+                    and os.path.exists(dst_image)):
+                new_files[key] = dict(entry, signature=signature)
+                continue
+            tasks.append((key, src_image, src_label, dst_image, dst_label, digest, imgsz, fmt, do_letterbox))
+            new_files[key] = {"signature": signature}
+
+    built = failed = 0
+    if tasks:
+        print(f"Resizing {len(tasks)} images to imgsz={imgsz} ({fmt})...")
+        with Pool(processes=workers) as pool:
+            for key, entry in pool.imap_unordered(build_one, tasks, chunksize=16):
+                if entry is None:
+                    print(f"Warning: could not decode {key}")
+                    del new_files[key]
+                    failed += 1
+                    continue
+                new_files[key].update(entry)
+                built += 1
+
+    # Remove outputs whose source image disappeared
+    removed = 0
+    for key in set(old_files) - set(new_files):
+        split = key.split("/", 1)[0]
+        stem = os.path.splitext(key.split("/", 1)[1])[0]
+        for path in (os.path.join(output_dir, split, "images", old_files[key].get("image", stem + ext)),
+                     os.path.join(output_dir, split, "labels", stem + ".txt")):
+            if os.path.exists(path):
+                os.remove(path)
+        removed += 1
+
+    manifest["files"] = new_files
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+    yaml_path = write_data_yaml(dataset_dir, output_dir, splits)
+
+    print(f"Cache ready in {time.perf_counter() - start:.1f}s: {built} built, "
+          f"{len(new_files) - built} unchanged, {removed} removed, {failed} unreadable")
+    print(f"Train with: data={yaml_path} imgsz={imgsz}")
+    return yaml_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Write a resized copy of a YOLO dataset (longest side = imgsz) for faster training."
+    )
+    parser.add_argument("--dataset", required=True,
+                        help="Path to dataset root (with train/valid/test folders and data.yaml)")
+    parser.add_argument("--output", default=None,
+                        help="Output directory (default: <dataset>_cache<imgsz>)")
+    parser.add_argument("--imgsz", type=int, default=640,
+                        help="Training image size; longest side of the cached images (default: 640)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="jpg",
+                        help="Output image format (default: jpg)")
+    parser.add_argument("--letterbox", action="store_true",
+                        help="Also pad to imgsz x imgsz and rewrite the labels accordingly")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.normpath(args.dataset) + f"_cache{args.imgsz}"
+    build_cache(args.dataset, output, args.imgsz, args.format, args.letterbox, args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Evaluate a YOLO model from cached predictions.
+
+Inference runs once over the validation images (at a low confidence so every
+operating point can be evaluated later) and the raw predictions - boxes, scores
+and classes per image - are stored with the ground truth in a compressed .npz
+keyed by the weights hash and a dataset hash. Every later run with the same
+weights and dataset loads the cache and only recomputes metrics, so changing
+the confidence, the confusion-matrix match IoU or the class subset takes well
+under a second instead of a full model.val() pass. NMS is fixed at cache time
+(Ultralytics' default IoU 0.7) and is not a parameter here.
+
+Metrics follow Ultralytics' definitions: per-class P/R at a confidence, AP50
+and AP50-95 from 101-point interpolated PR curves, and a (nc+1) x (nc+1)
+confusion matrix with a background row/column.
+
+Example:
+  python scripts/cached_eval.py --model runs/detect/train2/weights/best.pt \
+      --data datasets/final/data.yaml --conf 0.25 --match-iou 0.5 --classes crack moisture
+"""
+import argparse
+import csv
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import yaml
+
+from yolo_dataset import is_image_file, label_path_for_image
+
+CACHE_VERSION = 1
+BASE_CONF = 0.001                      # confidence used for the cached inference pass
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+CURVE_POINTS = np.linspace(0, 1, 1000)
+EPS = 1e-16
+
+
+# ----- Dataset / cache keys -----
+def resolve_split_images(data_yaml, split="val"):
+    """List the image paths of `split` as configured in a YOLO data.yaml"""
+    with open(data_yaml, "r") as f:
+        data = yaml.safe_load(f)
+    root = data.get("path") or os.path.dirname(os.path.abspath(data_yaml))
+    if not os.path.isabs(root):
+        root = os.path.join(os.path.dirname(os.path.abspath(data_yaml)), root)
+    # Fall back to the yaml's own folder when `path` points at another machine
+    if not os.path.isdir(root):
+        root = os.path.dirname(os.path.abspath(data_yaml))
+
+    entries = data.get(split)
+    if entries is None:
+        raise ValueError(f"split '{split}' not defined in {data_yaml}")
+    images = []
+    for entry in entries if isinstance(entries, list) else [entries]:
+        directory = entry if os.path.isabs(entry) else os.path.join(root, entry)
+        images += sorted(os.path.join(directory, f) for f in os.listdir(directory) if is_image_file(f))
+
+    names = data.get("names", [])
+    if isinstance(names, dict):
+        names = [names[k] for k in sorted(names)]
+    return images, list(names)
+
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def dataset_hash(image_paths):
+    """Hash image names/sizes/mtimes and the full content of every label file"""
+    h = hashlib.sha1()
+    for path in image_paths:
+        st = os.stat(path)
+        h.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+        label_path = label_path_for_image(path)
+        if os.path.exists(label_path):
+            with open(label_path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+# ----- Ground truth / predictions -----
+def load_ground_truth(image_paths):
+    """Labels of every image as normalized xyxy boxes, classes and per-image offsets"""
+    boxes, classes, counts = [], [], []
+    for path in image_paths:
+        rows = []
+        label_path = label_path_for_image(path)
+        if os.path.exists(label_path):
+            with open(label_path, "r") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 5:
+                        rows.append([float(v) for v in parts])
+        arr = np.array(rows, dtype=np.float32).reshape(-1, 5)
+        xc, yc, w, h = arr[:, 1], arr[:, 2], arr[:, 3], arr[:, 4]
+        boxes.append(np.stack([xc - w / 2, yc - h / 2, xc + w / 2, yc + h / 2], 1))
+        classes.append(arr[:, 0].astype(np.int32))
+        counts.append(len(arr))
+    return {
+        "boxes": np.concatenate(boxes) if boxes else np.zeros((0, 4), np.float32),
+        "classes": np.concatenate(classes) if classes else np.zeros(0, np.int32),
+        "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+    }
+
+
+def run_inference(model_path, image_paths, imgsz=640, batch=16, device=None):
+    """Predict every image once at BASE_CONF; returns predictions dict and model class names"""
+    from ultralytics import YOLO
+
+    model = YOLO(model_path)
+    boxes, scores, classes, counts = [], [], [], []
+    for start in range(0, len(image_paths), batch):
+        chunk = image_paths[start:start + batch]
+        for r in model.predict(source=chunk, conf=BASE_CONF, imgsz=imgsz, device=device,
+                               max_det=300, verbose=False, stream=True):
+            boxes.append(r.boxes.xyxyn.cpu().numpy().astype(np.float32))
+            scores.append(r.boxes.conf.cpu().numpy().astype(np.float32))
+            classes.append(r.boxes.cls.cpu().numpy().astype(np.int32))
+            counts.append(len(r.boxes))
+        print(f"  predicted {min(start + batch, len(image_paths))}/{len(image_paths)} images", end="\r")
+    print()
+    names = [model.names[k] for k in sorted(model.names)]
+    return {
+        "boxes": np.concatenate(boxes) if boxes else np.zeros((0, 4), np.float32),
+        "scores": np.concatenate(scores) if scores else np.zeros(0, np.float32),
+        "classes": np.concatenate(classes) if classes else np.zeros(0, np.int32),
+        "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+    }, names
+
+
+def load_or_predict(model_path, data_yaml, split="val", imgsz=640, cache_dir="runs/eval_cache",
+                    batch=16, device=None):
+    """
+    Return (predictions, ground truth, class names, image paths), running
+    inference only if no cache exists for this weights/dataset/imgsz.
+    """
+    image_paths, names = resolve_split_images(data_yaml, split)
+    key = f"{file_sha1(model_path)[:12]}_{dataset_hash(image_paths)[:12]}_{imgsz}"
+    cache_path = os.path.join(cache_dir, f"preds_{key}.npz")
+
+    if os.path.exists(cache_path):
+        cached = np.load(cache_path, allow_pickle=False)
+        if int(cached["version"]) == CACHE_VERSION:
+            preds = {k: cached[f"pred_{k}"] for k in ("boxes", "scores", "classes", "offsets")}
+            gt = {k: cached[f"gt_{k}"] for k in ("boxes", "classes", "offsets")}
+            print(f"Loaded cached predictions: {cache_path}")
+            return preds, gt, list(cached["names"]), image_paths
+
+    print(f"No cached predictions for {key}; running inference on {len(image_paths)} images...")
+    start = time.perf_counter()
+    preds, model_names = run_inference(model_path, image_paths, imgsz, batch, device)
+    gt = load_ground_truth(image_paths)
+    names = names or model_names
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez_compressed(
+        cache_path, version=CACHE_VERSION, names=np.array(names),
+        **{f"pred_{k}": v for k, v in preds.items()}, **{f"gt_{k}": v for k, v in gt.items()})
+    print(f"Inference took {time.perf_counter() - start:.1f}s; cached to {cache_path}")
+    return preds, gt, names, image_paths
+
+
+# ----- Matching -----
+def box_iou(a, b):
+    """IoU matrix between xyxy boxes a (N, 4) and b (M, 4)"""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + EPS)
+
+
+def _unique_matches(iou, thr, strict=False):
+    """Greedy one-to-one matching by descending IoU (Ultralytics' match_predictions); strict: IoU > thr"""
+    gt_idx, pred_idx = np.nonzero(iou > thr if strict else iou >= thr)
+    if len(gt_idx) == 0:
+        return gt_idx, pred_idx
+    order = np.argsort(-iou[gt_idx, pred_idx], kind="stable")
+    gt_idx, pred_idx = gt_idx[order], pred_idx[order]
+    _, first = np.unique(pred_idx, return_index=True)
+    keep = np.sort(first)
+    gt_idx, pred_idx = gt_idx[keep], pred_idx[keep]
+    _, first = np.unique(gt_idx, return_index=True)
+    keep = np.sort(first)
+    return gt_idx[keep], pred_idx[keep]
+
+
+def subset_mask(classes, class_subset):
+    if class_subset is None:
+        return np.ones(len(classes), bool)
+    return np.isin(classes, np.asarray(list(class_subset)))
+
+
+def true_positives(preds, gt, iou_thresholds=IOU_THRESHOLDS):
+    """
+    (n_preds, n_thresholds) bool matrix: is each cached prediction a TP at each
+    IoU threshold. Matching is class-aware, so the result is valid for any class
+    subset and is computed only once per cache.
+    """
+    tp = np.zeros((len(preds["scores"]), len(iou_thresholds)), bool)
+    for i in range(len(gt["offsets"]) - 1):
+        p0, p1 = preds["offsets"][i], preds["offsets"][i + 1]
+        g0, g1 = gt["offsets"][i], gt["offsets"][i + 1]
+        if p0 == p1 or g0 == g1:
+            continue
+        iou = box_iou(gt["boxes"][g0:g1], preds["boxes"][p0:p1])
+        iou = iou * (gt["classes"][g0:g1, None] == preds["classes"][None, p0:p1])
+        for j, thr in enumerate(iou_thresholds):
+            _, pred_idx = _unique_matches(iou, thr)
+            tp[p0 + pred_idx, j] = True
+    return tp
+
+
+# ----- Metrics -----
+def compute_ap(recall, precision):
+    """101-point interpolated AP from a recall/precision curve"""
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    trapezoid = getattr(np, "trapezoid", None) or np.trapz
+    return trapezoid(np.interp(x, mrec, mpre), x)
+
+
+def ap_per_class(tp, scores, pred_classes, gt_classes, class_ids):
+    """
+    Per-class AP at every IoU threshold plus P/R/F1 curves over confidence.
+    Returns dict of arrays indexed like class_ids.
+    """
+    order = np.argsort(-scores, kind="stable")
+    tp, scores, pred_classes = tp[order], scores[order], pred_classes[order]
+    n_cls = len(class_ids)
+    ap = np.zeros((n_cls, tp.shape[1]))
+    p_curve = np.zeros((n_cls, len(CURVE_POINTS)))
+    r_curve = np.zeros((n_cls, len(CURVE_POINTS)))
+    n_gt = np.array([(gt_classes == c).sum() for c in class_ids])
+
+    for ci, c in enumerate(class_ids):
+        mask = pred_classes == c
+        if mask.sum() == 0 or n_gt[ci] == 0:
+            continue
+        tpc = tp[mask].cumsum(0)
+        fpc = (1 - tp[mask]).cumsum(0)
+        recall = tpc / (n_gt[ci] + EPS)
+        precision = tpc / (tpc + fpc)
+        # Curves against confidence (scores are descending, np.interp needs ascending x)
+        r_curve[ci] = np.interp(-CURVE_POINTS, -scores[mask], recall[:, 0], left=0)
+        p_curve[ci] = np.interp(-CURVE_POINTS, -scores[mask], precision[:, 0], left=1)
+        for j in range(tp.shape[1]):
+            ap[ci, j] = compute_ap(recall[:, j], precision[:, j])
+
+    f1_curve = 2 * p_curve * r_curve / (p_curve + r_curve + EPS)
+    return {"ap": ap, "p_curve": p_curve, "r_curve": r_curve, "f1_curve": f1_curve, "n_gt": n_gt}
+
+
+def confusion_matrix(preds, gt, nc, conf=0.25, iou_thr=0.45, class_subset=None):
+    """
+    Ultralytics-style confusion matrix (rows = predicted, cols = true, last
+    row/col = background) at the given confidence and IoU.
+    """
+    matrix = np.zeros((nc + 1, nc + 1), dtype=np.int64)
+    keep_p = (preds["scores"] >= conf) & subset_mask(preds["classes"], class_subset)
+    keep_g = subset_mask(gt["classes"], class_subset)
+    for i in range(len(gt["offsets"]) - 1):
+        p0, p1 = preds["offsets"][i], preds["offsets"][i + 1]
+        g0, g1 = gt["offsets"][i], gt["offsets"][i + 1]
+        pm, gm = keep_p[p0:p1], keep_g[g0:g1]
+        det_boxes, det_cls = preds["boxes"][p0:p1][pm], preds["classes"][p0:p1][pm]
+        gt_boxes, gt_cls = gt["boxes"][g0:g1][gm], gt["classes"][g0:g1][gm]
+        if len(gt_cls) == 0:
+            np.add.at(matrix, (det_cls, nc), 1)
+            continue
+        if len(det_cls) == 0:
+            np.add.at(matrix, (nc, gt_cls), 1)
+            continue
+        # Ultralytics counts IoU > thr for the confusion matrix (>= for the TP matrix)
+        gi, di = _unique_matches(box_iou(gt_boxes, det_boxes), iou_thr, strict=True)
+        np.add.at(matrix, (det_cls[di], gt_cls[gi]), 1)
+        np.add.at(matrix, (nc, np.delete(gt_cls, gi)), 1)
+        np.add.at(matrix, (np.delete(det_cls, di), nc), 1)
+    return matrix
+
+
+class CachedEvaluator:
+    """
+    Holds cached predictions + ground truth and the TP matrix so that repeated
+    evaluate() calls with different conf / class subsets cost only array ops.
+    """
+
+    def __init__(self, preds, gt, names):
+        self.preds, self.gt = preds, gt
+        # Predicted / labelled ids outside the class list still get a row and column
+        n_ids = max([len(names)] + [int(a.max()) + 1 for a in (preds["classes"], gt["classes"]) if len(a)])
+        self.names = list(names) + [str(i) for i in range(len(names), n_ids)]
+        self.tp = true_positives(preds, gt)
+
+    def evaluate(self, conf=0.25, iou=0.5, class_subset=None):
+        """
+        Per-class P/R/F1 at `conf` and AP50 / AP50-95, with the confusion matrix
+        at `iou`. P/R/F1 always match at IoU 0.5 (as Ultralytics does), so `iou`
+        only affects the confusion matrix. mAP averages over the classes that
+        have labels.
+        """
+        class_ids = sorted(set(class_subset)) if class_subset is not None else list(range(len(self.names)))
+        pm = subset_mask(self.preds["classes"], class_ids)
+        gm = subset_mask(self.gt["classes"], class_ids)
+        stats = ap_per_class(self.tp[pm], self.preds["scores"][pm], self.preds["classes"][pm],
+                             self.gt["classes"][gm], class_ids)
+        conf_idx = min(int(round(conf * (len(CURVE_POINTS) - 1))), len(CURVE_POINTS) - 1)
+        best_idx = int(stats["f1_curve"].mean(0).argmax())
+        labelled = stats["n_gt"] > 0
+        per_class = []
+        for ci, c in enumerate(class_ids):
+            per_class.append({
+                "class_id": c,
+                "name": self.names[c] if c < len(self.names) else str(c),
+                "instances": int(stats["n_gt"][ci]),
+                "precision": float(stats["p_curve"][ci, conf_idx]),
+                "recall": float(stats["r_curve"][ci, conf_idx]),
+                "f1": float(stats["f1_curve"][ci, conf_idx]),
+                "ap50": float(stats["ap"][ci, 0]),
+                "ap50_95": float(stats["ap"][ci].mean()),
+            })
+        return {
+            "conf": conf,
+            "iou": iou,
+            "classes": per_class,
+            "map50": float(stats["ap"][labelled, 0].mean()) if labelled.any() else 0.0,
+            "map50_95": float(stats["ap"][labelled].mean()) if labelled.any() else 0.0,
+            "best_f1_conf": float(CURVE_POINTS[best_idx]),
+            "curves": stats,
+            "confusion_matrix": confusion_matrix(self.preds, self.gt, len(self.names), conf, iou, class_ids),
+        }
+
+
+# ----- Output -----
+def print_results(result):
+    print(f"{'class':<22}{'inst':>7}{'P':>8}{'R':>8}{'F1':>8}{'AP50':>8}{'AP50-95':>9}")
+    for c in result["classes"]:
+        print(f"{c['name']:<22}{c['instances']:>7}{c['precision']:>8.3f}{c['recall']:>8.3f}"
+              f"{c['f1']:>8.3f}{c['ap50']:>8.3f}{c['ap50_95']:>9.3f}")
+    print(f"mAP50={result['map50']:.4f}  mAP50-95={result['map50_95']:.4f}  "
+          f"(conf={result['conf']}, best-F1 conf={result['best_f1_conf']:.3f})")
+
+
+def save_results(result, names, output_dir, plots=False):
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "metrics.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["class_id", "name", "instances", "precision", "recall", "f1", "ap50", "ap50_95"])
+        for c in result["classes"]:
+            writer.writerow([c["class_id"], c["name"], c["instances"], c["precision"], c["recall"],
+                             c["f1"], c["ap50"], c["ap50_95"]])
+    labels = list(names) + ["background"]
+    with open(os.path.join(output_dir, "confusion_matrix.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["predicted \\ true"] + labels)
+        for label, row in zip(labels, result["confusion_matrix"]):
+            writer.writerow([label] + row.tolist())
+
+    if plots:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots(figsize=(10, 8))
+        m = result["confusion_matrix"].astype(float)
+        ax.imshow(m / (m.sum(0, keepdims=True) + EPS), cmap="Blues")
+        ax.set_xticks(range(len(labels)))
+        ax.set_xticklabels(labels, rotation=90)
+        ax.set_yticks(range(len(labels)))
+        ax.set_yticklabels(labels)
+        ax.set_xlabel("True")
+        ax.set_ylabel("Predicted")
+        fig.tight_layout()
+        fig.savefig(os.path.join(output_dir, "confusion_matrix_normalized.png"), dpi=120)
+        plt.close(fig)
+
+        curves = result["curves"]
+        fig, ax = plt.subplots(figsize=(8, 6))
+        for c, r, p in zip(result["classes"], curves["r_curve"], curves["p_curve"]):
+            ax.plot(r, p, label=f"{c['name']} {c['ap50']:.3f}")
+        ax.set_xlabel("Recall")
+        ax.set_ylabel("Precision")
+        ax.legend(fontsize=7)
+        fig.savefig(os.path.join(output_dir, "PR_curve.png"), dpi=120)
+        plt.close(fig)
+    print(f"Results written to: {output_dir}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Evaluate a YOLO model from cached predictions (inference runs once per weights/dataset)."
+    )
+    parser.add_argument("--model", required=True, help="Path to the YOLO weights")
+    parser.add_argument("--data", required=True, help="Path to the dataset data.yaml")
+    parser.add_argument("--split", default="val", help="data.yaml split to evaluate (default: val)")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size (default: 640)")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold (default: 0.25)")
+    parser.add_argument("--match-iou", type=float, default=0.5,
+                        help="IoU a detection must exceed to match a box in the confusion matrix (default: 0.5)")
+    parser.add_argument("--classes", nargs="+", default=None,
+                        help="Class names or ids to evaluate (default: all)")
+    parser.add_argument("--cache-dir", default="runs/eval_cache", help="Prediction cache directory")
+    parser.add_argument("--batch", type=int, default=16, help="Inference batch size")
+    parser.add_argument("--device", default=None, help="Inference device, e.g. 0 or cpu")
+    parser.add_argument("--output", default=None, help="Write metrics/confusion matrix CSVs here")
+    parser.add_argument("--plots", action="store_true", help="Also write PNG plots to --output")
+    args = parser.parse_args(argv)
+
+    preds, gt, names, _ = load_or_predict(args.model, args.data, args.split, args.imgsz,
+                                          args.cache_dir, args.batch, args.device)
+    class_subset = None
+    if args.classes:
+        class_subset = [int(c) if c.isdigit() else names.index(c) for c in args.classes]
+
+    start = time.perf_counter()
+    evaluator = CachedEvaluator(preds, gt, names)
+    result = evaluator.evaluate(args.conf, args.match_iou, class_subset)
+    print_results(result)
+    print(f"Metrics computed in {time.perf_counter() - start:.3f}s")
+    if args.output:
+        save_results(result, evaluator.names, args.output, args.plots)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Escalation rate versus accuracy of the small/large model cascade (cascade.py).
+
+The small and large models alone are evaluated from cached predictions (see
+cached_eval.py). Each cascade configuration, i.e. each uncertainty band given
+with --bands, is then run over the validation images. Its detections are scored
+with the same matching at the same confidence. Every configuration is reported
+with:
+  escalation  fraction of images that needed the large model (and how many of
+              those went to the full frame)
+  ms/img      mean wall time per image, small + large
+  P, R, F1    at --conf, and mAP50 / mAP50-95 of the detections kept at --conf
+
+Example:
+  python scripts/cascade_eval.py --small runs/detect/midterm/weights/best.pt \
+      --large runs/detect/train2/weights/best.pt --data datasets/final/data.yaml \
+      --bands 0.1:0.5 0.2:0.5 0.1:0.7 --precise-classes fire_extinguisher --output runs/cascade
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from cached_eval import CachedEvaluator, load_ground_truth, load_or_predict, resolve_split_images
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cascade import ESCALATION_MODES, CascadeDetector, class_ids
+
+
+def keep_above(preds, conf):
+    """Cached predictions restricted to scores >= conf (offsets recomputed)"""
+    keep = preds["scores"] >= conf
+    offsets = preds["offsets"]
+    counts = [int(keep[a:b].sum()) for a, b in zip(offsets[:-1], offsets[1:])]
+    return {"boxes": preds["boxes"][keep], "scores": preds["scores"][keep], "classes": preds["classes"][keep],
+            "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)}
+
+
+def score(preds, gt, names, conf):
+    result = CachedEvaluator(preds, gt, names).evaluate(conf)
+    p = float(np.mean([c["precision"] for c in result["classes"] if c["instances"]] or [0.0]))
+    r = float(np.mean([c["recall"] for c in result["classes"] if c["instances"]] or [0.0]))
+    return {"precision": p, "recall": r, "f1": 2 * p * r / (p + r) if p + r else 0.0,
+            "map50": result["map50"], "map50_95": result["map50_95"]}
+
+
+def run_cascade(cascade, image_paths):
+    """Cascade detections over every image in cached_eval's layout (normalized xyxy, per-image offsets)"""
+    boxes, scores, classes, counts = [], [], [], []
+    start = time.perf_counter()
+    for i, path in enumerate(image_paths):
+        image = cv2.imread(path)
+        b, s, c = cascade(image)
+        h, w = image.shape[:2]
+        boxes.append(b / np.float32([w, h, w, h]))
+        scores.append(s)
+        classes.append(c.astype(np.int32))
+        counts.append(len(b))
+        print(f"  {i + 1}/{len(image_paths)} images, escalated {cascade.escalation_rate:.0%}", end="\r")
+    print()
+    seconds = time.perf_counter() - start
+    preds = {"boxes": np.concatenate(boxes).astype(np.float32), "scores": np.concatenate(scores),
+             "classes": np.concatenate(classes), "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)}
+    return preds, seconds * 1000 / max(len(image_paths), 1)
+
+
+def parse_band(text):
+    low, high = (float(v) for v in text.split(":"))
+    if not 0 <= low <= high <= 1:
+        raise argparse.ArgumentTypeError(f"band must be LOW:HIGH with 0 <= LOW <= HIGH <= 1, got {text}")
+    return low, high
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Escalation rate vs accuracy of the small/large model cascade")
+    parser.add_argument("--small", required=True, help="Small (every-frame) model weights")
+    parser.add_argument("--large", required=True, help="Large (escalation) model weights")
+    parser.add_argument("--data", required=True, help="Path to the dataset data.yaml")
+    parser.add_argument("--split", default="val", help="data.yaml split to evaluate (default: val)")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size (default: 640)")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence of the final detections")
+    parser.add_argument("--bands", type=parse_band, nargs="+", default=[(0.1, 0.5)],
+                        help="Uncertainty bands LOW:HIGH to compare")
+    parser.add_argument("--precise-classes", nargs="+", default=[],
+                        help="Class names always confirmed by the large model")
+    parser.add_argument("--escalation", choices=ESCALATION_MODES, default="auto",
+                        help="Run the large model on crops, the full frame, or crops unless they cover most of it")
+    parser.add_argument("--cache-dir", default="runs/eval_cache", help="Prediction cache directory")
+    parser.add_argument("--output", default=None, help="Write the table to <output>/cascade.csv")
+    args = parser.parse_args(argv)
+
+    from ultralytics import YOLO
+
+    image_paths, _ = resolve_split_images(args.data, args.split)
+    rows, names = [], None
+    for label, weights in (("small only", args.small), ("large only", args.large)):
+        preds, gt, model_names, _ = load_or_predict(weights, args.data, args.split, args.imgsz, args.cache_dir)
+        names = names or model_names
+        rows.append({"config": label, "escalation": 0.0 if label == "small only" else 1.0, "full_frame": None,
+                     "ms_per_image": None, **score(keep_above(preds, args.conf), gt, model_names, args.conf)})
+    gt = load_ground_truth(image_paths)
+
+    small, large = YOLO(args.small), YOLO(args.large)
+    precise = class_ids(small.names, args.precise_classes)
+    # Warm both models up so the first configuration isn't charged for it
+    warm = cv2.imread(image_paths[0])
+    small.predict(warm, verbose=False)
+    large.predict(warm, verbose=False)
+    for low, high in args.bands:
+        cascade = CascadeDetector(small, large, conf=args.conf, band=(low, high), precise_classes=precise,
+                                  imgsz=args.imgsz, escalation=args.escalation)
+        print(f"Cascade band {low}:{high} on {len(image_paths)} images...")
+        preds, ms = run_cascade(cascade, image_paths)
+        rows.append({"config": f"cascade {low}:{high}", "escalation": cascade.escalation_rate,
+                     "full_frame": cascade.full_escalations / max(cascade.escalations, 1),
+                     "ms_per_image": ms, **score(preds, gt, names, args.conf)})
+
+    print(f"{'config':<20}{'escalated':>10}{'full':>7}{'ms/img':>8}{'P':>8}{'R':>8}{'F1':>8}{'mAP50':>8}{'mAP50-95':>10}")
+    for r in rows:
+        full = f"{r['full_frame']:.0%}" if r["full_frame"] is not None else "-"
+        ms = f"{r['ms_per_image']:.1f}" if r["ms_per_image"] is not None else "-"
+        print(f"{r['config']:<20}{r['escalation']:>10.0%}{full:>7}{ms:>8}{r['precision']:>8.3f}{r['recall']:>8.3f}"
+              f"{r['f1']:>8.3f}{r['map50']:>8.3f}{r['map50_95']:>10.3f}")
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        path = os.path.join(args.output, "cascade.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Results written to: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
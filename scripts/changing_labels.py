@@ -122,7 +122,7 @@ def process_split(split_dir, output_split_dir):
             print(f"Warning: No image found for label file {label_file}")
 
 # ----- Main Function -----
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Change YOLOv11 dataset class names in a single dataset with train, val, and test splits."
     )
@@ -130,7 +130,7 @@ def main():
                         help="Path to the input dataset directory (with train, val, test folders).")
     parser.add_argument("--output", type=str, required=True,
                         help="Path to the output dataset directory with updated labels.")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     splits = ["train", "valid", "test"]
     for split in splits:
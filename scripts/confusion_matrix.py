@@ -1,27 +1,39 @@
 # scripts/confusion_matrix.py
 
-from ultralytics import YOLO
-import yaml
+import argparse
 from multiprocessing import freeze_support
 
-def main():
-    with open(r'C:\Users\ruhalis\Documents\yolo-detection-tracking\datasets\final\data.yaml') as f:
-        data = yaml.safe_load(f)
-    print(data['names'])
-    selected = [ data['names'].index(c) for c in [
-        'crack','fire_extinguisher','light_off','light_on',
-        'half_working_light','algae','peeling','stain','moisture'
-    ] ]
-    model = YOLO('runs/detect/train2/weights/best.pt')
-    results = model.val(
-        data=r'C:\Users\ruhalis\Documents\yolo-detection-tracking\datasets\final\data.yaml',
-        conf=0.25,
-        iou=0.5,
-        plots=True,
-        classes=selected
+from cached_eval import CachedEvaluator, load_or_predict, print_results, save_results
+
+SELECTED_CLASSES = [
+    'crack','fire_extinguisher','light_off','light_on',
+    'half_working_light','algae','peeling','stain','moisture'
+]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Confusion matrix and per-class metrics from cached predictions (see cached_eval.py)."
     )
-    print("Done – see runs/val/exp*/plots/confusion_matrix.png")
+    parser.add_argument("--data", default="datasets/final/data.yaml", help="Path to the dataset data.yaml")
+    parser.add_argument("--model", default="runs/detect/train2/weights/best.pt", help="Path to the YOLO weights")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    # Was model.val()'s NMS IoU; NMS now happens once when the predictions are cached
+    parser.add_argument("--match-iou", type=float, default=0.5,
+                        help="IoU a detection must exceed to match a box in the confusion matrix")
+    parser.add_argument("--classes", nargs="+", default=SELECTED_CLASSES, help="Class names to evaluate")
+    parser.add_argument("--output", default="runs/val/confusion_matrix", help="Output directory")
+    args = parser.parse_args(argv)
+
+    # Inference runs only the first time for these weights/dataset; later runs reuse the cache
+    preds, gt, names, _ = load_or_predict(args.model, args.data)
+    print(names)
+    selected = [names.index(c) for c in args.classes]
+    evaluator = CachedEvaluator(preds, gt, names)
+    results = evaluator.evaluate(conf=args.conf, iou=args.match_iou, class_subset=selected)
+    print_results(results)
+    save_results(results, evaluator.names, args.output, plots=True)
+    print(f"Done – see {args.output}/confusion_matrix_normalized.png")
 
 if __name__ == "__main__":
     freeze_support()
-    main()
\ No newline at end of file
+    main()
@@ -2,20 +2,16 @@
 import os
 import yaml
 
-def create_dataset_yaml():
+def create_dataset_yaml(dest_base_dir='train-curat-dataset-yolo', class_names=None):
     """Create a YAML file for the dataset configuration"""
     # Define paths
-    dest_base_dir = 'train-curat-dataset-yolo'
     yaml_path = os.path.join(dest_base_dir, 'dataset.yaml')
     
     # Define class names
-    class_names = ['algae', 'peeling', 'stain']
+    class_names = list(class_names or ['algae', 'peeling', 'stain'])
     
     # Get absolute paths
     current_dir = os.getcwd()
-    train_path = os.path.join(current_dir, dest_base_dir, 'train')
-    val_path = os.path.join(current_dir, dest_base_dir, 'valid')
-    test_path = os.path.join(current_dir, dest_base_dir, 'test')
     
     # Create YAML content
     yaml_content = {
@@ -32,6 +28,7 @@ def create_dataset_yaml():
         yaml.dump(yaml_content, file, default_flow_style=False)
     
     print(f"Created dataset YAML file: {yaml_path}")
+    return yaml_path
 
 if __name__ == "__main__":
-    create_dataset_yaml() 
\ No newline at end of file
+    create_dataset_yaml() 
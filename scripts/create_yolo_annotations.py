@@ -1,9 +1,22 @@
 #!/usr/bin/env python3
+"""
+Convert a classification-style dataset (<source>/<split>/<class_name>/*.jpg)
+into YOLO format (<dest>/<split>/images + labels), treating each image as one
+object that fills the frame.
+
+Image dimensions are read from the file header only (no pixel decode), work is
+spread over a process pool, images are hard-linked instead of copied, and
+byte-identical images found in several class folders are written once with one
+label line per class.
+"""
+import argparse
+import hashlib
 import os
 import shutil
-from PIL import Image
-import cv2
-import numpy as np
+import sys
+from multiprocessing import Pool
+
+from yolo_dataset import image_size, is_image_file
 
 # Define the class mapping
 class_mapping = {
@@ -16,99 +29,204 @@ class_mapping = {
 source_base_dir = 'train-curat-dataset'
 dest_base_dir = 'train-curat-dataset-yolo'
 
-# Create required directories if they don't exist
-os.makedirs(dest_base_dir, exist_ok=True)
+SPLITS = ['train', 'test', 'valid']
+LINK_MODES = ['hardlink', 'symlink', 'copy']
 
-def process_image(image_path, class_name, dest_images_dir, dest_labels_dir):
-    """Process an individual image and create YOLO annotation"""
-    try:
-        # Get image filename (without extension)
-        image_filename = os.path.basename(image_path)
-        image_basename = os.path.splitext(image_filename)[0]
-        
-        # Read the image
-        img = cv2.imread(image_path)
-        if img is None:
-            print(f"Warning: Could not read image {image_path}")
+
+def link_image(src, dst, link_mode='hardlink'):
+    """Place src at dst by hard link, symlink or copy (hard links fall back to copy across devices)"""
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if link_mode == 'hardlink':
+        try:
+            os.link(src, dst)
             return
-        
-        height, width, _ = img.shape
-        
-        # Copy the image to the destination directory
-        shutil.copy2(image_path, os.path.join(dest_images_dir, image_filename))
-        
-        # Create the YOLO annotation
-        # For this script, we're treating each image as if the object fills the entire image
-        # YOLO format: class_id center_x center_y width height (normalized 0-1)
-        class_id = class_mapping[class_name]
-        
-        # Assume object fills the entire image for simplicity
-        # You may need to adjust this based on your specific requirements
-        center_x = 0.5  # center x coordinate (normalized)
-        center_y = 0.5  # center y coordinate (normalized)
-        bbox_width = 1.0  # width of bounding box (normalized)
-        bbox_height = 1.0  # height of bounding box (normalized)
-        
-        # Create a label file for the image
-        label_path = os.path.join(dest_labels_dir, f"{image_basename}.txt")
+        except OSError:
+            pass
+    elif link_mode == 'symlink':
+        os.symlink(os.path.abspath(src), dst)
+        return
+    shutil.copy2(src, dst)
+
+
+def inspect_image(image_path):
+    """Worker: (path) -> (path, content sha1, (width, height) or None) without decoding pixels"""
+    h = hashlib.sha1()
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return image_path, h.hexdigest(), image_size(image_path)
+
+
+def yolo_label_lines(class_ids, width, height, margin_px=0):
+    """
+    One full-frame box per class id. margin_px insets the box by that many
+    pixels on every side, converted to normalized units with the real image size.
+    """
+    mx = min(margin_px / width, 0.49) if width else 0.0
+    my = min(margin_px / height, 0.49) if height else 0.0
+    bbox_width, bbox_height = round(1.0 - 2 * mx, 6), round(1.0 - 2 * my, 6)
+    return [f"{class_id} 0.5 0.5 {bbox_width} {bbox_height}" for class_id in class_ids]
+
+
+def write_annotation(task):
+    """Worker: link one image into the YOLO dataset and write its label file"""
+    src, dest_images_dir, dest_labels_dir, dest_name, class_ids, size, link_mode, margin_px = task
+    try:
+        link_image(src, os.path.join(dest_images_dir, dest_name), link_mode)
+        label_path = os.path.join(dest_labels_dir, os.path.splitext(dest_name)[0] + '.txt')
         with open(label_path, 'w') as f:
-            f.write(f"{class_id} {center_x} {center_y} {bbox_width} {bbox_height}\n")
-        
+            f.writelines(line + '\n' for line in yolo_label_lines(class_ids, size[0], size[1], margin_px))
         return True
     except Exception as e:
-        print(f"Error processing {image_path}: {e}")
+        print(f"Error processing {src}: {e}")
         return False
 
-def process_dataset():
-    """Process the entire dataset structure"""
-    for split in ['train', 'test', 'valid']:
-        print(f"Processing {split} split...")
-        
-        # Define the paths
-        source_split_path = os.path.join(source_base_dir, split)
-        dest_split_path = os.path.join(dest_base_dir, split)
-        
-        # Create images and labels directories
-        images_dir = os.path.join(dest_split_path, 'images')
-        labels_dir = os.path.join(dest_split_path, 'labels')
-        
-        os.makedirs(images_dir, exist_ok=True)
-        os.makedirs(labels_dir, exist_ok=True)
-        
-        # Process each class directory
-        for class_name in class_mapping.keys():
-            class_dir = os.path.join(source_split_path, class_name)
-            
-            # Check if the class directory exists
-            if not os.path.exists(class_dir):
-                print(f"Warning: Class directory {class_dir} does not exist. Skipping.")
+
+def unique_name(name, prefix, used_stems):
+    """
+    name, with `prefix_` prepended until its stem is not in used_stems (labels are
+    written per stem, so x.jpg and x.png would share x.txt); records the stem.
+    """
+    while os.path.splitext(name)[0] in used_stems:
+        name = f"{prefix}_{name}"
+    used_stems.add(os.path.splitext(name)[0])
+    return name
+
+
+def collect_entries(source_split_path, class_map, inspected):
+    """
+    Group the images of one split by content hash. Byte-identical files become
+    a single entry with one class id per folder they appear in; different files
+    that share a file stem (and so a label file) get the class name as a prefix.
+    Returns (entries, per-class counts, unreadable, duplicates).
+    """
+    by_hash = {}
+    counts = {}
+    unreadable = duplicates = 0
+    for class_name, class_id in class_map.items():
+        class_dir = os.path.join(source_split_path, class_name)
+        if not os.path.isdir(class_dir):
+            print(f"Warning: Class directory {class_dir} does not exist. Skipping.")
+            continue
+        for image_filename in sorted(os.listdir(class_dir)):
+            if not is_image_file(image_filename):
                 continue
-            
-            print(f"  Processing class: {class_name}")
-            
-            # Process each image in the class directory
-            processed_count = 0
-            for image_filename in os.listdir(class_dir):
-                if image_filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-                    image_path = os.path.join(class_dir, image_filename)
-                    success = process_image(image_path, class_name, images_dir, labels_dir)
-                    if success:
-                        processed_count += 1
-            
-            print(f"  Processed {processed_count} images for class {class_name}")
+            path = os.path.join(class_dir, image_filename)
+            digest, size = inspected[path]
+            if size is None:
+                print(f"Warning: Could not read image {path}")
+                unreadable += 1
+                continue
+            entry = by_hash.get(digest)
+            if entry is None:
+                by_hash[digest] = {'src': path, 'name': image_filename, 'class_name': class_name,
+                                   'class_ids': [class_id], 'size': size}
+            else:
+                duplicates += 1
+                if class_id not in entry['class_ids']:
+                    entry['class_ids'].append(class_id)
+            counts[class_name] = counts.get(class_name, 0) + 1
+
+    entries, used_stems = [], set()
+    for entry in by_hash.values():
+        entry['name'] = unique_name(entry['name'], entry['class_name'], used_stems)
+        entries.append(entry)
+    return entries, counts, unreadable, duplicates
+
+
+def plan_split(source_split_path, dest_split_path, class_map, inspected, link_mode, margin_px):
+    """Build the write tasks for one split"""
+    images_dir = os.path.join(dest_split_path, 'images')
+    labels_dir = os.path.join(dest_split_path, 'labels')
+    os.makedirs(images_dir, exist_ok=True)
+    os.makedirs(labels_dir, exist_ok=True)
+
+    entries, counts, unreadable, duplicates = collect_entries(source_split_path, class_map, inspected)
+    tasks = [(entry['src'], images_dir, labels_dir, entry['name'], entry['class_ids'],
+              entry['size'], link_mode, margin_px) for entry in entries]
+    return tasks, counts, unreadable, duplicates
+
+
+def convert(source_dir=source_base_dir, dest_dir=dest_base_dir, class_map=None, splits=SPLITS,
+            workers=None, link_mode='hardlink', margin_px=0):
+    """
+    Convert source_dir into a YOLO dataset at dest_dir.
+    Returns a summary dict {split: {"images", "per_class", "duplicates", "unreadable", "failed"}}.
+    """
+    class_map = class_map or class_mapping
+    os.makedirs(dest_dir, exist_ok=True)
+
+    all_images = []
+    for split in splits:
+        for class_name in class_map:
+            class_dir = os.path.join(source_dir, split, class_name)
+            if os.path.isdir(class_dir):
+                all_images += [os.path.join(class_dir, f) for f in os.listdir(class_dir) if is_image_file(f)]
+
+    summary = {}
+    with Pool(processes=workers) as pool:
+        inspected = {path: (digest, size) for path, digest, size
+                     in pool.imap_unordered(inspect_image, all_images, chunksize=64)}
+        for split in splits:
+            print(f"Processing {split} split...")
+            tasks, counts, unreadable, duplicates = plan_split(
+                os.path.join(source_dir, split), os.path.join(dest_dir, split),
+                class_map, inspected, link_mode, margin_px)
+            written = sum(pool.imap_unordered(write_annotation, tasks, chunksize=64))
+            for class_name, n in counts.items():
+                print(f"  Processed {n} images for class {class_name}")
+            if duplicates:
+                print(f"  Merged {duplicates} duplicate images found in several class folders")
+            summary[split] = {'images': written, 'per_class': counts, 'duplicates': duplicates,
+                              'unreadable': unreadable, 'failed': len(tasks) - written}
+    return summary
+
+
+def process_dataset():
+    """Process the entire dataset structure with the default paths"""
+    return convert()
+
+
+def print_dataset_summary(dest_dir=dest_base_dir, splits=SPLITS):
+    """Print image/label counts of the created dataset"""
+    for split in splits:
+        images_dir = os.path.join(dest_dir, split, 'images')
+        labels_dir = os.path.join(dest_dir, split, 'labels')
 
-if __name__ == "__main__":
-    print("Starting YOLO annotation creation...")
-    process_dataset()
-    print("Finished creating YOLO annotations!")
-    
-    # Print summary of the created dataset
-    for split in ['train', 'test', 'valid']:
-        dest_split_path = os.path.join(dest_base_dir, split)
-        images_dir = os.path.join(dest_split_path, 'images')
-        labels_dir = os.path.join(dest_split_path, 'labels')
-        
         if os.path.exists(images_dir) and os.path.exists(labels_dir):
-            image_count = len([f for f in os.listdir(images_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
+            image_count = len([f for f in os.listdir(images_dir) if is_image_file(f)])
             label_count = len([f for f in os.listdir(labels_dir) if f.endswith('.txt')])
-            print(f"{split}: {image_count} images, {label_count} labels") 
\ No newline at end of file
+            print(f"{split}: {image_count} images, {label_count} labels")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert a classification folder dataset (<split>/<class>/*.jpg) to YOLO format."
+    )
+    parser.add_argument("--source", default=source_base_dir,
+                        help=f"Classification dataset root (default: {source_base_dir})")
+    parser.add_argument("--dest", default=dest_base_dir,
+                        help=f"Output YOLO dataset root (default: {dest_base_dir})")
+    parser.add_argument("--classes", nargs='+', default=list(class_mapping),
+                        help="Class folder names, in class-id order (default: algae peeling stain)")
+    parser.add_argument("--splits", nargs='+', default=SPLITS,
+                        help="Splits to convert (default: train test valid)")
+    parser.add_argument("--link-mode", choices=LINK_MODES, default='hardlink',
+                        help="How to place images in the output (default: hardlink)")
+    parser.add_argument("--margin-px", type=int, default=0,
+                        help="Inset the full-frame box by this many pixels per side")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    print("Starting YOLO annotation creation...")
+    summary = convert(args.source, args.dest, {name: i for i, name in enumerate(args.classes)},
+                      args.splits, args.workers, args.link_mode, args.margin_px)
+    print("Finished creating YOLO annotations!")
+    print_dataset_summary(args.dest, args.splits)
+    return 1 if any(s['failed'] for s in summary.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
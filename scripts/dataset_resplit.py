@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import argparse
 import os
 import shutil
 import random
@@ -66,15 +67,15 @@ def get_image_label_pairs():
     
     return image_label_pairs
 
-def split_dataset(image_label_pairs):
+def split_dataset(image_label_pairs, train_ratio=TRAIN_RATIO, val_ratio=VAL_RATIO, rng=random):
     """Split the dataset according to the defined ratios"""
     # Shuffle the dataset
-    random.shuffle(image_label_pairs)
+    rng.shuffle(image_label_pairs)
     
     # Calculate split indices
     total_samples = len(image_label_pairs)
-    train_end = int(total_samples * TRAIN_RATIO)
-    val_end = train_end + int(total_samples * VAL_RATIO)
+    train_end = int(total_samples * train_ratio)
+    val_end = train_end + int(total_samples * val_ratio)
     
     # Split the dataset
     train_set = image_label_pairs[:train_end]
@@ -140,8 +141,15 @@ def create_yaml_file(counts):
     
     print(f"Created YAML configuration file: {yaml_path}")
 
-def main():
+def main(argv=None):
     """Main function to execute the dataset splitting process"""
+    global SOURCE_DIR, DEST_DIR
+    parser = argparse.ArgumentParser(description="Re-split a dataset's train+valid images 80/10/10.")
+    parser.add_argument("--source", default=SOURCE_DIR, help="Dataset with train/ and valid/ folders")
+    parser.add_argument("--dest", default=DEST_DIR, help="Output dataset directory")
+    args = parser.parse_args(argv)
+    SOURCE_DIR, DEST_DIR = args.source, args.dest
+
     print(f"Starting dataset split process (80/10/10) from {SOURCE_DIR} to {DEST_DIR}")
     
     # Create directory structure
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Statistics and health report for a YOLO-formatted dataset.
+
+Label files are parsed on a process pool into (N, 5) arrays and aggregated with
+NumPy: class frequencies, images per class, boxes per image, box size
+distributions, empty / malformed label files, out-of-range coordinates and
+orphaned images or labels. Parsed labels are cached per label-file content hash
+in <dataset>/.stats_cache.pkl, so repeated reports only re-read changed files.
+
+NumPy and multiprocessing are imported by the functions that use them, so `--help` starts without them.
+
+Example:
+  python scripts/dataset_stats.py --dataset datasets/final --output reports/final --plots
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+
+from yolo_dataset import is_image_file, list_splits, load_class_names
+
+CACHE_FILE = ".stats_cache.pkl"
+CACHE_VERSION = 1
+SIZE_BINS = 20                                  # normalized box width/height histogram bins over [0, 1]
+SMALL_AREA, MEDIUM_AREA = 32 ** 2 / 640 ** 2, 96 ** 2 / 640 ** 2   # COCO size buckets at imgsz 640
+
+
+# ----- Label parsing -----
+def parse_label_bytes(data):
+    """
+    Parse the content of one label file.
+    Returns (boxes, n_malformed, n_polygons, n_out_of_range) where boxes is a
+    float32 (N, 5) array of class, x_center, y_center, width, height.
+    Polygon rows are reduced to their enclosing box.
+    """
+    import numpy as np
+
+    rows = []
+    n_malformed = n_polygons = 0
+    for line in data.decode("utf-8", errors="replace").splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        try:
+            values = [float(v) for v in parts]
+        except ValueError:
+            n_malformed += 1
+            continue
+        if len(values) == 5 and values[0].is_integer() and values[0] >= 0:
+            rows.append(values)
+        elif len(values) > 5 and len(values) % 2 == 1 and values[0].is_integer() and values[0] >= 0:
+            xs, ys = values[1::2], values[2::2]
+            x_min, x_max, y_min, y_max = min(xs), max(xs), min(ys), max(ys)
+            rows.append([values[0], (x_min + x_max) / 2, (y_min + y_max) / 2,
+                         x_max - x_min, y_max - y_min])
+            n_polygons += 1
+        else:
+            n_malformed += 1
+
+    boxes = np.array(rows, dtype=np.float32).reshape(-1, 5)
+    xy, wh = boxes[:, 1:3], boxes[:, 3:5]
+    out_of_range = ((xy < 0) | (xy > 1)).any(1) | (wh <= 0).any(1) | (wh > 1).any(1)
+    return boxes, n_malformed, n_polygons, int(out_of_range.sum())
+
+
+def parse_label_file(path):
+    """Worker: path -> (path, sha1, parsed)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    return path, hashlib.sha1(data).hexdigest(), parse_label_bytes(data)
+
+
+# ----- Cache -----
+def load_cache(dataset_dir):
+    path = os.path.join(dataset_dir, CACHE_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                cache = pickle.load(f)
+            if cache.get("version") == CACHE_VERSION:
+                return cache
+        except Exception as e:
+            print(f"Ignoring unreadable stats cache {path}: {e}")
+    return {"version": CACHE_VERSION, "files": {}, "parsed": {}}
+
+
+def save_cache(dataset_dir, cache):
+    path = os.path.join(dataset_dir, CACHE_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def parse_labels_cached(dataset_dir, label_paths, workers=None):
+    """
+    Return {label_path: parsed} for all label_paths. Files whose size and mtime
+    are unchanged are served from the cache without being opened; the rest are
+    re-read in parallel and reused by content hash when the bytes are unchanged.
+    """
+    cache = load_cache(dataset_dir)
+    files, parsed_by_hash = cache["files"], cache["parsed"]
+    result, to_parse = {}, []
+
+    for path in label_paths:
+        st = os.stat(path)
+        key = os.path.relpath(path, dataset_dir)
+        entry = files.get(key)
+        if entry and entry[0] == (st.st_size, st.st_mtime_ns) and entry[1] in parsed_by_hash:
+            result[path] = parsed_by_hash[entry[1]]
+        else:
+            to_parse.append(path)
+
+    if to_parse:
+        from multiprocessing import Pool
+
+        with Pool(processes=workers) as pool:
+            for path, digest, parsed in pool.imap_unordered(parse_label_file, to_parse, chunksize=256):
+                st = os.stat(path)
+                files[os.path.relpath(path, dataset_dir)] = ((st.st_size, st.st_mtime_ns), digest)
+                parsed_by_hash.setdefault(digest, parsed)
+                result[path] = parsed_by_hash[digest]
+
+    # Drop cache entries for files that no longer exist
+    live = {os.path.relpath(p, dataset_dir) for p in label_paths}
+    for key in [k for k in files if k not in live]:
+        del files[key]
+    live_hashes = {entry[1] for entry in files.values()}
+    for digest in [d for d in parsed_by_hash if d not in live_hashes]:
+        del parsed_by_hash[digest]
+
+    if to_parse:
+        save_cache(dataset_dir, cache)
+    return result, len(to_parse)
+
+
+# ----- Aggregation -----
+def _distribution(values):
+    import numpy as np
+
+    if len(values) == 0:
+        return {}
+    p = np.percentile(values, [5, 25, 50, 75, 95])
+    return {
+        "mean": float(values.mean()), "min": float(values.min()), "max": float(values.max()),
+        "p5": float(p[0]), "p25": float(p[1]), "p50": float(p[2]), "p75": float(p[3]), "p95": float(p[4]),
+    }
+
+
+def split_stats(dataset_dir, split, parsed, class_names, max_examples=20):
+    """Aggregate the parsed labels of one split into a report dict"""
+    import numpy as np
+
+    images_dir = os.path.join(dataset_dir, split, "images")
+    labels_dir = os.path.join(dataset_dir, split, "labels")
+    image_stems = {os.path.splitext(f)[0] for f in os.listdir(images_dir) if is_image_file(f)}
+    label_files = {os.path.splitext(f)[0]: os.path.join(labels_dir, f)
+                   for f in (os.listdir(labels_dir) if os.path.isdir(labels_dir) else [])
+                   if f.endswith(".txt")}
+
+    orphan_images = sorted(image_stems - label_files.keys())
+    orphan_labels = sorted(label_files.keys() - image_stems)
+    paired = sorted(image_stems & label_files.keys())
+
+    arrays = [parsed[label_files[stem]][0] for stem in paired]
+    boxes_per_image = np.array([len(a) for a in arrays], dtype=np.int64)
+    boxes = np.concatenate(arrays) if arrays else np.zeros((0, 5), np.float32)
+    classes = boxes[:, 0].astype(np.int64)
+    image_index = np.repeat(np.arange(len(arrays)), boxes_per_image)
+
+    nc = max(len(class_names), int(classes.max()) + 1 if len(classes) else 0)
+    instances = np.bincount(classes, minlength=nc)
+    # Count each (image, class) pair once for "images containing class"
+    unique_pairs = np.unique(image_index * nc + classes) if len(classes) else np.zeros(0, np.int64)
+    images_per_class = np.bincount(unique_pairs % nc, minlength=nc) if nc else np.zeros(0, np.int64)
+
+    widths, heights = boxes[:, 3], boxes[:, 4]
+    areas = widths * heights
+    empty = [stem for stem, a in zip(paired, arrays) if len(a) == 0]
+    malformed = [(stem, parsed[label_files[stem]][1]) for stem in label_files
+                 if parsed[label_files[stem]][1]]
+    out_of_range = [(stem, parsed[label_files[stem]][3]) for stem in label_files
+                    if parsed[label_files[stem]][3]]
+    unknown_classes = sorted(int(c) for c in np.unique(classes) if c >= len(class_names)) if class_names else []
+
+    per_class = []
+    for c in range(nc):
+        mask = classes == c
+        per_class.append({
+            "class_id": c,
+            "name": class_names[c] if c < len(class_names) else f"<unknown {c}>",
+            "instances": int(instances[c]),
+            "images": int(images_per_class[c]),
+            "median_width": float(np.median(widths[mask])) if mask.any() else None,
+            "median_height": float(np.median(heights[mask])) if mask.any() else None,
+        })
+
+    return {
+        "split": split,
+        "images": len(image_stems),
+        "label_files": len(label_files),
+        "instances": int(len(boxes)),
+        "polygon_rows": int(sum(parsed[p][2] for p in label_files.values())),
+        "boxes_per_image": {**_distribution(boxes_per_image),
+                            "histogram": np.bincount(boxes_per_image).tolist() if len(boxes_per_image) else []},
+        "box_width": {**_distribution(widths), "histogram": np.histogram(widths, SIZE_BINS, range=(0.0, 1.0))[0].tolist()},
+        "box_height": {**_distribution(heights), "histogram": np.histogram(heights, SIZE_BINS, range=(0.0, 1.0))[0].tolist()},
+        "box_size_buckets": {
+            "small": int((areas < SMALL_AREA).sum()),
+            "medium": int(((areas >= SMALL_AREA) & (areas < MEDIUM_AREA)).sum()),
+            "large": int((areas >= MEDIUM_AREA).sum()),
+        },
+        "classes": per_class,
+        "health": {
+            "orphan_images": len(orphan_images),
+            "orphan_labels": len(orphan_labels),
+            "empty_label_files": len(empty),
+            "files_with_malformed_lines": len(malformed),
+            "malformed_lines": int(sum(n for _, n in malformed)),
+            "files_with_out_of_range_boxes": len(out_of_range),
+            "unknown_class_ids": unknown_classes,
+            "examples": {
+                "orphan_images": orphan_images[:max_examples],
+                "orphan_labels": orphan_labels[:max_examples],
+                "empty_label_files": empty[:max_examples],
+                "malformed": [stem for stem, _ in malformed[:max_examples]],
+                "out_of_range": [stem for stem, _ in out_of_range[:max_examples]],
+            },
+        },
+        # Raw arrays for plotting; stripped before the report is written
+        "_boxes": boxes,
+        "_boxes_per_image": boxes_per_image,
+    }
+
+
+def dataset_stats(dataset_dir, workers=None):
+    """Compute the full report for dataset_dir"""
+    start = time.perf_counter()
+    class_names = load_class_names(dataset_dir)
+    splits = list_splits(dataset_dir)
+
+    label_paths = []
+    for split in splits:
+        labels_dir = os.path.join(dataset_dir, split, "labels")
+        if os.path.isdir(labels_dir):
+            label_paths += [os.path.join(labels_dir, f) for f in os.listdir(labels_dir) if f.endswith(".txt")]
+
+    parsed, n_parsed = parse_labels_cached(dataset_dir, label_paths, workers)
+    report = {
+        "dataset": os.path.abspath(dataset_dir),
+        "class_names": class_names,
+        "splits": [split_stats(dataset_dir, split, parsed, class_names) for split in splits],
+    }
+    report["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    report["label_files_parsed"] = n_parsed
+    report["label_files_cached"] = len(label_paths) - n_parsed
+    return report
+
+
+# ----- Output -----
+def write_report(report, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    clean = dict(report)
+    clean["splits"] = [{k: v for k, v in s.items() if not k.startswith("_")} for s in report["splits"]]
+    json_path = os.path.join(output_dir, "stats.json")
+    with open(json_path, "w") as f:
+        json.dump(clean, f, indent=2)
+
+    csv_path = os.path.join(output_dir, "class_stats.csv")
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["split", "class_id", "name", "instances", "images", "median_width", "median_height"])
+        for s in report["splits"]:
+            for c in s["classes"]:
+                writer.writerow([s["split"], c["class_id"], c["name"], c["instances"], c["images"],
+                                 c["median_width"], c["median_height"]])
+    print(f"Report written to: {json_path} and {csv_path}")
+
+
+def write_plots(report, output_dir):
+    import matplotlib
+    import numpy as np
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    for s in report["splits"]:
+        boxes = s["_boxes"]
+        fig, axes = plt.subplots(1, 3, figsize=(18, 5))
+        names = [c["name"] for c in s["classes"]]
+        axes[0].bar(range(len(names)), [c["instances"] for c in s["classes"]])
+        axes[0].set_xticks(range(len(names)))
+        axes[0].set_xticklabels(names, rotation=45, ha="right")
+        axes[0].set_title(f"{s['split']}: instances per class")
+        axes[1].hist(s["_boxes_per_image"], bins=np.arange(s["_boxes_per_image"].max(initial=0) + 2) - 0.5)
+        axes[1].set_title("boxes per image")
+        axes[2].hist2d(boxes[:, 3], boxes[:, 4], bins=50, range=[[0, 1], [0, 1]], cmap="Blues")
+        axes[2].set_xlabel("width")
+        axes[2].set_ylabel("height")
+        axes[2].set_title("box size")
+        fig.tight_layout()
+        path = os.path.join(output_dir, f"stats_{s['split']}.png")
+        fig.savefig(path, dpi=100)
+        plt.close(fig)
+        print(f"Plot written to: {path}")
+
+
+def print_summary(report):
+    for s in report["splits"]:
+        h = s["health"]
+        print(f"[{s['split']}] {s['images']} images, {s['instances']} boxes, "
+              f"{s['boxes_per_image'].get('mean', 0):.2f} boxes/image")
+        for c in s["classes"]:
+            print(f"    {c['class_id']:>3} {c['name']:<22} {c['instances']:>7} boxes  {c['images']:>6} images")
+        print(f"    orphan images: {h['orphan_images']}, orphan labels: {h['orphan_labels']}, "
+              f"empty: {h['empty_label_files']}, malformed lines: {h['malformed_lines']}, "
+              f"out-of-range boxes: {h['files_with_out_of_range_boxes']} files, "
+              f"unknown class ids: {h['unknown_class_ids']}")
+    print(f"Done in {report['elapsed_seconds']}s "
+          f"({report['label_files_parsed']} label files parsed, {report['label_files_cached']} from cache)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Class/box statistics and health checks for a YOLO dataset."
+    )
+    parser.add_argument("--dataset", required=True,
+                        help="Path to dataset root (with train/valid/test folders)")
+    parser.add_argument("--output", default=None,
+                        help="Directory for stats.json / class_stats.csv (default: print only)")
+    parser.add_argument("--plots", action="store_true",
+                        help="Also write per-split PNG plots to --output")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parsing processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    report = dataset_stats(args.dataset, args.workers)
+    print_summary(report)
+    if args.output:
+        write_report(report, args.output)
+        if args.plots:
+            write_plots(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
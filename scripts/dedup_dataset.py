@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Find (and optionally drop) near-duplicate images across one or more YOLO datasets.
+
+Every image is decoded at reduced resolution (JPEG DCT scaling via
+cv2.IMREAD_REDUCED_GRAYSCALE_*) on a process pool and reduced to a 64-bit
+perceptual hash (dHash or pHash). Hashes are indexed in a multi-index hash
+table: the 64 bits are cut into threshold+1 segments, and by the pigeonhole
+principle two hashes within `threshold` bits of each other agree exactly on at
+least one segment. Only images sharing a segment value are compared, so the
+search is close to linear instead of O(n^2).
+
+Examples:
+  python scripts/dedup_dataset.py datasets/general datasets/light5_split \
+      datasets/train-curat-dataset-yolo datasets/moisture --report dups.json
+  python scripts/dedup_dataset.py datasets/final --action drop --prefer ds2 ds1
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+from yolo_dataset import MERGE_PREFIX, image_size, label_path_for_image, list_images, list_splits
+
+HASH_SIZE = 8                 # 8x8 = 64-bit hashes
+DEFAULT_THRESHOLD = 4         # max Hamming distance to call two images duplicates
+BUCKET_BLOCK = 2048           # rows compared at once inside one hash bucket
+# Splits earlier in this list win, so a copy leaking into train is the one dropped.
+DEFAULT_SPLIT_PRIORITY = ["test", "valid", "val", "train"]
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+# ----- Hashing -----
+def _reduced_read_flag(path):
+    """Pick the strongest reduced-resolution decode that still leaves >= 64 px"""
+    size = image_size(path)
+    if size is None:
+        return cv2.IMREAD_GRAYSCALE
+    short_side = min(size)
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+                         (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                         (2, cv2.IMREAD_REDUCED_GRAYSCALE_2)):
+        if short_side // factor >= 64:
+            return flag
+    return cv2.IMREAD_GRAYSCALE
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def dhash(gray):
+    """Difference hash: sign of horizontal gradients on a 9x8 thumbnail"""
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def phash(gray):
+    """DCT hash: low-frequency 8x8 DCT coefficients compared to their median"""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:HASH_SIZE, :HASH_SIZE]
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+
+HASH_FUNCTIONS = {"dhash": dhash, "phash": phash}
+
+
+def hash_image(task):
+    """Worker: (path, method) -> (path, hash or None)"""
+    path, method = task
+    gray = cv2.imread(path, _reduced_read_flag(path))
+    if gray is None:
+        return path, None
+    return path, HASH_FUNCTIONS[method](gray)
+
+
+# ----- Indexing -----
+def popcount64(values):
+    """Number of set bits for every element of a uint64 array"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT8[values.view(np.uint8)].reshape(values.shape + (8,)).sum(-1)
+
+
+def find_near_duplicate_pairs(hashes, threshold=DEFAULT_THRESHOLD):
+    """
+    Return the set of index pairs (i, j), i < j, whose hashes differ in at most
+    `threshold` bits, using a multi-index hash table over threshold+1 segments.
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    n_segments = threshold + 1
+    bounds = np.linspace(0, 64, n_segments + 1).astype(int)
+    pairs = set()
+
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        mask = np.uint64((1 << (hi - lo)) - 1)
+        keys = (hashes >> np.uint64(lo)) & mask
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        # Start/end of each run of equal segment values
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)]
+        for start, end in zip(starts, ends):
+            if end - start < 2:
+                continue
+            bucket = order[start:end]
+            bucket_hashes = hashes[bucket]
+            # Compare in row blocks so a huge bucket (e.g. blank frames) stays bounded in memory
+            for row0 in range(0, len(bucket) - 1, BUCKET_BLOCK):
+                block = bucket_hashes[row0:row0 + BUCKET_BLOCK]
+                distances = popcount64(block[:, None] ^ bucket_hashes[None, :])
+                rows, cols = np.nonzero(distances <= threshold)
+                upper = cols > rows + row0
+                for a, b in zip(bucket[rows[upper] + row0], bucket[cols[upper]]):
+                    pairs.add((int(min(a, b)), int(max(a, b))))
+    return pairs
+
+
+def cluster_pairs(n, pairs):
+    """Union-find over index pairs; returns clusters with more than one member"""
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[rb] = ra
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+# ----- Dataset scanning -----
+def collect_images(dataset_dirs):
+    """
+    List every image in the given datasets as dicts with path, split and source.
+    With several datasets the source is the dataset folder name; for a single
+    merged dataset it is the "dsN" filename prefix written by the merge scripts.
+    """
+    records = []
+    multi = len(dataset_dirs) > 1
+    for dataset_dir in dataset_dirs:
+        dataset_name = os.path.basename(os.path.normpath(dataset_dir))
+        for split in list_splits(dataset_dir):
+            images_dir = os.path.join(dataset_dir, split, "images")
+            for filename in list_images(images_dir):
+                source = dataset_name
+                if not multi:
+                    match = MERGE_PREFIX.match(filename)
+                    if match:
+                        source = match.group(1)
+                path = os.path.join(images_dir, filename)
+                records.append({
+                    "path": path,
+                    "split": split,
+                    "source": source,
+                    "size": os.path.getsize(path),
+                })
+    return records
+
+
+def compute_hashes(records, method="dhash", workers=None):
+    """Hash all records in parallel; records that fail to decode get hash None"""
+    tasks = [(r["path"], method) for r in records]
+    with Pool(processes=workers) as pool:
+        results = dict(pool.imap_unordered(hash_image, tasks, chunksize=64))
+    for r in records:
+        r["hash"] = results.get(r["path"])
+    return records
+
+
+def find_duplicate_clusters(records, threshold=DEFAULT_THRESHOLD,
+                            prefer=None, split_priority=DEFAULT_SPLIT_PRIORITY):
+    """
+    Group hashed records into near-duplicate clusters and pick a winner for each.
+    Winner order: split priority, then source priority (`prefer`), then the
+    larger file, then path.
+    """
+    hashed = [r for r in records if r.get("hash") is not None]
+    hashes = np.array([r["hash"] for r in hashed], dtype=np.uint64)
+    pairs = find_near_duplicate_pairs(hashes, threshold)
+    prefer = list(prefer or [])
+
+    def rank(r):
+        split_rank = split_priority.index(r["split"]) if r["split"] in split_priority else len(split_priority)
+        source_rank = prefer.index(r["source"]) if r["source"] in prefer else len(prefer)
+        return (split_rank, source_rank, -r["size"], r["path"])
+
+    clusters = []
+    for members in cluster_pairs(len(hashed), pairs):
+        members = sorted((hashed[i] for i in members), key=rank)
+        keep, drop = members[0], members[1:]
+        member_hashes = np.array([m["hash"] for m in members], dtype=np.uint64)
+        max_distance = int(popcount64(member_hashes[:, None] ^ member_hashes[None, :]).max())
+        clusters.append({
+            "keep": keep["path"],
+            "drop": [m["path"] for m in drop],
+            "splits": sorted({m["split"] for m in members}),
+            "sources": sorted({m["source"] for m in members}),
+            "max_distance": max_distance,
+        })
+    return clusters
+
+
+def remove_images(paths, move_dir=None):
+    """Delete (or move to move_dir) each image together with its label file"""
+    for image_path in paths:
+        label_path = label_path_for_image(image_path)
+        for path in (image_path, label_path):
+            if not os.path.exists(path):
+                continue
+            if move_dir:
+                split_dir = os.path.dirname(os.path.dirname(path))
+                dest_dir = os.path.join(move_dir, os.path.basename(split_dir),
+                                        os.path.basename(os.path.dirname(path)))
+                os.makedirs(dest_dir, exist_ok=True)
+                shutil.move(path, os.path.join(dest_dir, os.path.basename(path)))
+            else:
+                os.remove(path)
+
+
+def dedup(dataset_dirs, method="dhash", threshold=DEFAULT_THRESHOLD, prefer=None,
+          split_priority=DEFAULT_SPLIT_PRIORITY, action="report", move_dir=None,
+          workers=None):
+    """Hash, cluster and apply `action` (report / drop / move); returns the clusters"""
+    start = time.perf_counter()
+    records = collect_images(dataset_dirs)
+    print(f"Hashing {len(records)} images with {method}...")
+    compute_hashes(records, method, workers)
+    unreadable = [r["path"] for r in records if r["hash"] is None]
+    for path in unreadable:
+        print(f"Warning: could not decode {path}")
+
+    clusters = find_duplicate_clusters(records, threshold, prefer, split_priority)
+    n_dropped = sum(len(c["drop"]) for c in clusters)
+    n_leaks = sum(1 for c in clusters if len(c["splits"]) > 1)
+    print(f"Found {len(clusters)} near-duplicate clusters ({n_dropped} redundant images, "
+          f"{n_leaks} clusters spanning several splits) in {time.perf_counter() - start:.1f}s")
+
+    if action in ("drop", "move"):
+        remove_images([p for c in clusters for p in c["drop"]],
+                      move_dir if action == "move" else None)
+        print(f"{'Moved' if action == 'move' else 'Deleted'} {n_dropped} duplicate images and their labels.")
+    return clusters
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Detect near-duplicate images across YOLO datasets with perceptual hashes."
+    )
+    parser.add_argument("datasets", nargs="+",
+                        help="Dataset roots (with train/valid/test folders)")
+    parser.add_argument("--method", choices=sorted(HASH_FUNCTIONS), default="dhash",
+                        help="Perceptual hash to use (default: dhash)")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help=f"Max Hamming distance between duplicates (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--prefer", nargs="+", default=[],
+                        help="Source priority for the winning copy (dataset folder names or dsN prefixes)")
+    parser.add_argument("--split-priority", nargs="+", default=DEFAULT_SPLIT_PRIORITY,
+                        help="Split priority for the winning copy (default: test valid val train)")
+    parser.add_argument("--action", choices=["report", "drop", "move"], default="report",
+                        help="Only report, delete, or move the losing copies (default: report)")
+    parser.add_argument("--move-dir", type=str, default=None,
+                        help="Destination for --action move")
+    parser.add_argument("--report", type=str, default=None,
+                        help="Write the clusters to this JSON file")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Hashing processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    if args.action == "move" and not args.move_dir:
+        parser.error("--action move requires --move-dir")
+
+    clusters = dedup(args.datasets, args.method, args.threshold, args.prefer,
+                     args.split_priority, args.action, args.move_dir, args.workers)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(clusters, f, indent=2)
+        print(f"Report written to: {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
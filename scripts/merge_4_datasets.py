@@ -58,41 +58,51 @@ new_class_dict = {
 }
 
 # ----- Function to process a single label file -----
-def convert_label_file(input_path, output_path, dataset_mapping):
+def convert_label_lines(lines, dataset_mapping, source="", class_dict=None):
     """
-    Reads a YOLO label file from input_path, converts the original class indices
-    to unified indices using the provided dataset_mapping and new_class_dict,
-    and writes the new content to output_path.
+    Converts YOLO label lines from the original class indices to unified indices
+    using the provided dataset_mapping and class_dict (default: new_class_dict).
+    Lines that cannot be mapped are reported and dropped.
     """
-    with open(input_path, "r") as f:
-        lines = f.readlines()
-    
+    class_dict = new_class_dict if class_dict is None else class_dict
     new_lines = []
     for line in lines:
         parts = line.strip().split()
         if len(parts) < 5:
-            print(f"Skipping malformed line in {input_path}: {line}")
+            print(f"Skipping malformed line in {source}: {line}")
             continue
         try:
             orig_index = int(parts[0])
         except ValueError:
-            print(f"Skipping non-integer class index in {input_path}: {line}")
+            print(f"Skipping non-integer class index in {source}: {line}")
             continue
 
         # Get the class name from the dataset-specific mapping.
         orig_class = dataset_mapping.get(orig_index)
         if orig_class is None:
-            print(f"No mapping defined for index {orig_index} in {input_path}")
+            print(f"No mapping defined for index {orig_index} in {source}")
             continue
 
         # Map to the new unified index.
-        new_index = new_class_dict.get(orig_class)
+        new_index = class_dict.get(orig_class)
         if new_index is None:
-            print(f"No new index defined for unified class {orig_class} in {input_path}")
+            print(f"No new index defined for unified class {orig_class} in {source}")
             continue
 
         new_line = " ".join([str(new_index)] + parts[1:])
         new_lines.append(new_line)
+    return new_lines
+
+def convert_label_file(input_path, output_path, dataset_mapping):
+    """
+    Reads a YOLO label file from input_path, converts the original class indices
+    to unified indices using the provided dataset_mapping and new_class_dict,
+    and writes the new content to output_path.
+    """
+    with open(input_path, "r") as f:
+        lines = f.readlines()
+    
+    new_lines = convert_label_lines(lines, dataset_mapping, input_path)
     
     with open(output_path, "w") as f:
         for nl in new_lines:
@@ -145,7 +155,7 @@ def process_split(dataset_path, split, output_dir, prefix, dataset_mapping):
             print(f"Warning: No image found for label file {label_file}")
 
 # ----- Main function to process four datasets -----
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Merge four YOLO datasets with different class mappings into one unified dataset."
     )
@@ -159,7 +169,13 @@ def main():
                         help="Path to the fourth dataset (with train, valid, test folders).")
     parser.add_argument("--output", type=str, required=True,
                         help="Path to the output merged dataset directory.")
-    args = parser.parse_args()
+    parser.add_argument("--dedup", action="store_true",
+                        help="Drop near-duplicate images from the merged dataset (see dedup_dataset.py).")
+    parser.add_argument("--dedup_threshold", type=int, default=4,
+                        help="Max perceptual-hash Hamming distance for --dedup (default 4).")
+    parser.add_argument("--dedup_prefer", type=str, nargs="+", default=["ds1", "ds2", "ds3", "ds4"],
+                        help="Source priority for the copy kept by --dedup (default: ds1 ds2 ds3 ds4).")
+    args = parser.parse_args(argv)
 
     # Define the splits you want to process.
     splits = ["train", "valid", "test"]
@@ -189,6 +205,10 @@ def main():
         for class_name, _ in sorted_classes:
             f.write(class_name + "\n")
     print(f"Unified classes file written to: {classes_file}")
+
+    if args.dedup:
+        from dedup_dataset import dedup
+        dedup([args.output], threshold=args.dedup_threshold, prefer=args.dedup_prefer, action="drop")
     print("Merge complete.")
 
 if __name__ == "__main__":
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Tracking accuracy and speed on recorded videos (MOTChallenge format).
+
+Detection runs once per video/weights at a low confidence, and the boxes,
+scores, classes and DeepSORT appearance embeddings of every frame are cached in
+a compressed .npz (same layout as cached_eval.py: flat arrays + per-frame
+offsets). The tracker then replays the cached detections with the given
+settings, writes <video>.txt in MOTChallenge format
+(frame, id, x, y, w, h, conf, -1, -1, -1) and, when a ground-truth file is
+found, scores it:
+  CLEAR-MOT  MOTA, MOTP, FP, FN, ID switches (IoU >= 0.5, previous matches kept)
+  Identity   IDF1, IDP, IDR (global Hungarian assignment of GT to tracker ids)
+  HOTA       HOTA, DetA, AssA, LocA averaged over alpha = 0.05 .. 0.95
+Per-frame IoU matrices are computed once per sequence and shared by all three.
+
+Ground truth is looked up in --gt-dir as <video stem>.txt or
+<video stem>/gt/gt.txt (MOTChallenge gt rows with mark 0 are ignored).
+
+--sweep re-runs only the tracker for every combination of the given values,
+so a grid over tracking.py's settings takes seconds per point:
+  python scripts/mot_eval.py --model runs/detect/train2/weights/best.pt --videos recordings/*.mp4 \
+      --gt-dir recordings/gt --output runs/mot
+  python scripts/mot_eval.py ... --sweep conf=0.25,0.324,0.4 max_age=15,30,60 n_init=1,3 \
+      max_cosine_distance=0.1,0.2,0.3
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from cached_eval import box_iou, file_sha1
+
+CACHE_VERSION = 1
+BASE_CONF = 0.05               # detections are cached at this confidence; sweeps can only go above it
+MATCH_IOU = 0.5                # CLEAR-MOT / identity match threshold
+HOTA_ALPHAS = np.arange(0.05, 0.96, 0.05)
+HIST_BINS = (16, 4, 4)         # HSV bins of the histogram embedder
+EPS = 1e-10
+
+# tracking.py's current settings
+DEFAULTS = {"conf": 0.324, "max_age": 30, "n_init": 3, "max_cosine_distance": 0.2}
+INT_PARAMS = ("max_age", "n_init")
+
+
+# ----- Detection cache -----
+def histogram_embeds(frame, boxes):
+    """L2-normalized HSV color histograms of the crops; a torch-free stand-in for the mobilenet embedder"""
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    h, w = frame.shape[:2]
+    embeds = np.zeros((len(boxes), int(np.prod(HIST_BINS))), np.float32)
+    for i, (x1, y1, x2, y2) in enumerate(boxes.astype(int)):
+        crop = hsv[max(y1, 0):min(y2, h), max(x1, 0):min(x2, w)]
+        if crop.size:
+            hist = cv2.calcHist([crop], [0, 1, 2], None, HIST_BINS, [0, 180, 0, 256, 0, 256]).ravel()
+            embeds[i] = hist / (np.linalg.norm(hist) + EPS)
+    return embeds
+
+
+def make_embedder(kind):
+    """(frame, xyxy boxes) -> (N, D) embeddings"""
+    if kind == "histogram":
+        return histogram_embeds
+    from deep_sort_realtime.deepsort_tracker import DeepSort
+    tracker = DeepSort(embedder=kind)
+
+    def embed(frame, boxes):
+        if not len(boxes):
+            return np.zeros((0, 0), np.float32)
+        raw = [([x1, y1, x2 - x1, y2 - y1], 1.0, 0) for x1, y1, x2, y2 in boxes]
+        return np.asarray(tracker.generate_embeds(frame, raw), np.float32)
+    return embed
+
+
+def video_key(path):
+    """Videos are large; hash name, size and mtime instead of the content"""
+    st = os.stat(path)
+    return hashlib.sha1(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()
+
+
+def detect_video(model_path, video, imgsz=640, embedder="mobilenet", device=None):
+    """Detections and embeddings for every frame of a video"""
+    from ultralytics import YOLO
+
+    model = YOLO(model_path)
+    embed = make_embedder(embedder)
+    cap = cv2.VideoCapture(video)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    boxes, scores, classes, embeds, counts = [], [], [], [], []
+    det_time = 0.0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        start = time.perf_counter()
+        r = model.predict(source=frame, conf=BASE_CONF, imgsz=imgsz, device=device, verbose=False)[0]
+        b = r.boxes.xyxy.cpu().numpy().astype(np.float32)
+        e = embed(frame, b)
+        det_time += time.perf_counter() - start
+        boxes.append(b)
+        scores.append(r.boxes.conf.cpu().numpy().astype(np.float32))
+        classes.append(r.boxes.cls.cpu().numpy().astype(np.int32))
+        embeds.append(e)
+        counts.append(len(b))
+        print(f"  {os.path.basename(video)}: {len(counts)} frames", end="\r")
+    cap.release()
+    print()
+    embeds = [e for e in embeds if len(e)]
+    return {
+        "boxes": np.concatenate(boxes) if boxes else np.zeros((0, 4), np.float32),
+        "scores": np.concatenate(scores) if scores else np.zeros(0, np.float32),
+        "classes": np.concatenate(classes) if classes else np.zeros(0, np.int32),
+        "embeds": np.concatenate(embeds) if embeds else np.zeros((0, 1), np.float32),
+        "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        "fps": np.float64(fps),
+        "det_seconds": np.float64(det_time),
+    }
+
+
+def load_or_detect(model_path, video, imgsz=640, embedder="mobilenet", cache_dir="runs/mot_cache", device=None):
+    key = f"{file_sha1(model_path)[:12]}_{video_key(video)[:12]}_{imgsz}_{embedder.replace('/', '-')}"
+    cache_path = os.path.join(cache_dir, f"dets_{key}.npz")
+    if os.path.exists(cache_path):
+        cached = np.load(cache_path, allow_pickle=False)
+        if int(cached["version"]) == CACHE_VERSION:
+            print(f"Loaded cached detections: {cache_path}")
+            return {k: cached[k] for k in cached.files if k != "version"}
+
+    print(f"No cached detections for {os.path.basename(video)}; running detection...")
+    dets = detect_video(model_path, video, imgsz, embedder, device)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez_compressed(cache_path, version=CACHE_VERSION, **dets)
+    n = len(dets["offsets"]) - 1
+    print(f"Detection took {float(dets['det_seconds']):.1f}s ({n / max(float(dets['det_seconds']), EPS):.1f} fps); "
+          f"cached to {cache_path}")
+    return dets
+
+
+# ----- Tracking -----
+def run_tracker(dets, params, class_subset=None):
+    """
+    Replay cached detections through DeepSORT. Returns (rows, seconds) with
+    rows = (N, 7) [frame (1-based), id, x1, y1, x2, y2, conf] of the confirmed
+    tracks matched on each frame.
+    """
+    from deep_sort_realtime.deepsort_tracker import DeepSort
+
+    tracker = DeepSort(max_age=int(params["max_age"]), n_init=int(params["n_init"]),
+                       max_cosine_distance=float(params["max_cosine_distance"]), embedder=None)
+    boxes, scores, classes, embeds, offsets = (dets[k] for k in ("boxes", "scores", "classes", "embeds", "offsets"))
+    # Empty boxes are dropped like update_tracks does, so the embeds stay aligned
+    keep_all = (scores >= params["conf"]) & (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+    if class_subset is not None:
+        keep_all &= np.isin(classes, class_subset)
+
+    rows = []
+    start = time.perf_counter()
+    for f in range(len(offsets) - 1):
+        sl = slice(offsets[f], offsets[f + 1])
+        keep = keep_all[sl]
+        raw = [([float(x1), float(y1), float(x2 - x1), float(y2 - y1)], float(s), int(c))
+               for (x1, y1, x2, y2), s, c in zip(boxes[sl][keep], scores[sl][keep], classes[sl][keep])]
+        tracks = tracker.update_tracks(raw, embeds=list(embeds[sl][keep]))
+        for t in tracks:
+            if t.is_confirmed() and t.time_since_update == 0:
+                x1, y1, x2, y2 = t.to_ltrb(orig=True)
+                rows.append((f + 1, int(t.track_id), x1, y1, x2, y2, t.det_conf or 0.0))
+    seconds = time.perf_counter() - start
+    return np.array(rows, np.float64).reshape(-1, 7), seconds
+
+
+def write_mot(path, rows):
+    """MOTChallenge: frame, id, left, top, width, height, conf, -1, -1, -1"""
+    with open(path, "w") as f:
+        for frame, tid, x1, y1, x2, y2, conf in rows:
+            f.write(f"{int(frame)},{int(tid)},{x1:.2f},{y1:.2f},{x2 - x1:.2f},{y2 - y1:.2f},{conf:.4f},-1,-1,-1\n")
+
+
+def load_mot(path, gt=False):
+    """(N, 6) [frame, id, x1, y1, x2, y2]; ground-truth rows with mark 0 are dropped"""
+    data = np.loadtxt(path, delimiter=",", ndmin=2)
+    if not len(data):
+        return np.zeros((0, 6))
+    if gt and data.shape[1] >= 7:
+        data = data[data[:, 6] != 0]
+    out = data[:, :6].copy()
+    out[:, 4:6] += out[:, 2:4]
+    return out
+
+
+def find_gt(gt_dir, video):
+    stem = os.path.splitext(os.path.basename(video))[0]
+    for path in (os.path.join(gt_dir, f"{stem}.txt"), os.path.join(gt_dir, stem, "gt", "gt.txt")):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# ----- Metrics -----
+def _frames(rows, n_frames):
+    """Row ranges per frame (rows sorted by frame)"""
+    rows = rows[np.argsort(rows[:, 0], kind="stable")]
+    edges = np.searchsorted(rows[:, 0], np.arange(1, n_frames + 2))
+    return rows, edges
+
+
+def evaluate_sequence(gt, tr):
+    """Raw counts for CLEAR-MOT, identity and HOTA metrics of one sequence (see summarize())"""
+    n_frames = int(max(gt[:, 0].max(initial=0), tr[:, 0].max(initial=0)))
+    gt, gt_edges = _frames(gt, n_frames)
+    tr, tr_edges = _frames(tr, n_frames)
+    gt_ids, gt_idx = np.unique(gt[:, 1], return_inverse=True)
+    tr_ids, tr_idx = np.unique(tr[:, 1], return_inverse=True)
+    G, T, A = len(gt_ids), len(tr_ids), len(HOTA_ALPHAS)
+
+    per_frame = []
+    id_matches = np.zeros((G, T))      # frames with IoU >= MATCH_IOU, for IDF1
+    potential = np.zeros((G, T))       # HOTA's global alignment accumulator
+    gt_count = np.bincount(gt_idx, minlength=G).astype(np.float64)
+    tr_count = np.bincount(tr_idx, minlength=T).astype(np.float64)
+    for f in range(n_frames):
+        g = gt_idx[gt_edges[f]:gt_edges[f + 1]]
+        t = tr_idx[tr_edges[f]:tr_edges[f + 1]]
+        iou = box_iou(gt[gt_edges[f]:gt_edges[f + 1], 2:6], tr[tr_edges[f]:tr_edges[f + 1], 2:6])
+        per_frame.append((g, t, iou))
+        if len(g) and len(t):
+            gi, ti = np.nonzero(iou >= MATCH_IOU)
+            np.add.at(id_matches, (g[gi], t[ti]), 1)
+            denom = iou.sum(0)[None, :] + iou.sum(1)[:, None] - iou
+            potential[np.ix_(g, t)] += np.where(denom > EPS, iou / np.maximum(denom, EPS), 0)
+
+    # CLEAR-MOT: keep last frame's pairs while they still overlap, Hungarian for the rest
+    tp = fp = fn = idsw = 0
+    iou_sum = 0.0
+    last_match = {}                    # gt index -> tracker index
+    for g, t, iou in per_frame:
+        matched = []
+        if len(g) and len(t):
+            valid = iou >= MATCH_IOU
+            col = {tt: j for j, tt in enumerate(t)}
+            free_g, free_t = np.ones(len(g), bool), np.ones(len(t), bool)
+            for i, gg in enumerate(g):
+                j = col.get(last_match.get(gg))
+                if j is not None and valid[i, j] and free_t[j]:
+                    matched.append((i, j))
+                    free_g[i] = free_t[j] = False
+            fg, ft = np.nonzero(free_g)[0], np.nonzero(free_t)[0]
+            if len(fg) and len(ft):
+                cost = np.where(valid[np.ix_(fg, ft)], 1 - iou[np.ix_(fg, ft)], 1e6)
+                for r, c in zip(*linear_sum_assignment(cost)):
+                    if cost[r, c] < 1e6:
+                        i, j = fg[r], ft[c]
+                        if g[i] in last_match and last_match[g[i]] != t[j]:
+                            idsw += 1
+                        matched.append((i, j))
+        for i, j in matched:
+            last_match[g[i]] = t[j]
+            iou_sum += iou[i, j]
+        tp += len(matched)
+        fp += len(t) - len(matched)
+        fn += len(g) - len(matched)
+
+    # Identity: one-to-one GT id <-> tracker id assignment maximizing matched frames
+    idtp = 0.0
+    if G and T:
+        r, c = linear_sum_assignment(-id_matches)
+        idtp = id_matches[r, c].sum()
+
+    # HOTA (Luiten et al. 2020): per frame, Hungarian on alignment-weighted similarity, then per alpha
+    hota_tp, hota_fn, hota_fp, loc_sum = np.zeros(A), np.zeros(A), np.zeros(A), np.zeros(A)
+    matches = np.zeros((A, G, T))
+    global_align = potential / np.maximum(gt_count[:, None] + tr_count[None, :] - potential, EPS)
+    for g, t, iou in per_frame:
+        if not len(g) or not len(t):
+            hota_fn += len(g)
+            hota_fp += len(t)
+            continue
+        r, c = linear_sum_assignment(-(global_align[np.ix_(g, t)] * iou))
+        sim = iou[r, c]
+        ok = sim[None, :] >= HOTA_ALPHAS[:, None] - EPS          # (A, K)
+        n = ok.sum(1)
+        hota_tp += n
+        hota_fn += len(g) - n
+        hota_fp += len(t) - n
+        loc_sum += (ok * sim[None, :]).sum(1)
+        a_idx, k_idx = np.nonzero(ok)
+        np.add.at(matches, (a_idx, g[r[k_idx]], t[c[k_idx]]), 1)
+    ass = matches / np.maximum(gt_count[None, :, None] + tr_count[None, None, :] - matches, EPS)
+    ass_sum = (matches * ass).sum((1, 2))
+
+    return {"frames": n_frames, "num_gt": len(gt), "num_tr": len(tr), "gt_ids": G, "tr_ids": T,
+            "tp": tp, "fp": fp, "fn": fn, "idsw": idsw, "iou_sum": iou_sum, "idtp": idtp,
+            "hota_tp": hota_tp, "hota_fn": hota_fn, "hota_fp": hota_fp, "hota_loc": loc_sum, "hota_ass": ass_sum}
+
+
+def summarize(counts):
+    """Combine per-sequence counts into metrics (HOTA combined as in TrackEval: sums per alpha)"""
+    total = {k: sum(c[k] for c in counts) for k in counts[0]}
+    num_gt, num_tr = total["num_gt"], total["num_tr"]
+    tp_a = total["hota_tp"]
+    det_a = tp_a / np.maximum(tp_a + total["hota_fn"] + total["hota_fp"], 1)
+    ass_a = total["hota_ass"] / np.maximum(tp_a, 1)
+    return {
+        "MOTA": 1 - (total["fn"] + total["fp"] + total["idsw"]) / max(num_gt, 1),
+        "MOTP": total["iou_sum"] / max(total["tp"], 1),
+        "IDF1": 2 * total["idtp"] / max(num_gt + num_tr, 1),
+        "IDP": total["idtp"] / max(num_tr, 1),
+        "IDR": total["idtp"] / max(num_gt, 1),
+        "HOTA": float(np.sqrt(det_a * ass_a).mean()),
+        "DetA": float(det_a.mean()),
+        "AssA": float(ass_a.mean()),
+        "LocA": float((total["hota_loc"] / np.maximum(tp_a, EPS)).mean()),
+        "IDSW": int(total["idsw"]),
+        "FP": int(total["fp"]),
+        "FN": int(total["fn"]),
+        "GT_IDs": int(total["gt_ids"]),
+        "IDs": int(total["tr_ids"]),
+    }
+
+
+# ----- Runs -----
+def evaluate_params(sequences, params, class_subset=None, output_dir=None):
+    """Track every sequence with one parameter set; returns (metrics or None, tracker fps, end-to-end fps)"""
+    counts = []
+    frames, track_seconds, det_seconds = 0, 0.0, 0.0
+    for video, dets, gt in sequences:
+        rows, seconds = run_tracker(dets, params, class_subset)
+        n = len(dets["offsets"]) - 1
+        frames, track_seconds, det_seconds = frames + n, track_seconds + seconds, det_seconds + float(dets["det_seconds"])
+        if output_dir:
+            write_mot(os.path.join(output_dir, os.path.splitext(os.path.basename(video))[0] + ".txt"), rows)
+        if gt is not None:
+            counts.append(evaluate_sequence(gt, rows[:, :6]))
+    metrics = summarize(counts) if counts else None
+    return metrics, frames / max(track_seconds, EPS), frames / max(track_seconds + det_seconds, EPS)
+
+
+def parse_sweep(items):
+    """['conf=0.25,0.3', 'max_age=15,30'] -> list of parameter dicts (cartesian product over DEFAULTS)"""
+    grid = {k: [v] for k, v in DEFAULTS.items()}
+    for item in items:
+        key, _, values = item.partition("=")
+        if key not in DEFAULTS or not values:
+            raise ValueError(f"bad --sweep entry '{item}'; expected one of {list(DEFAULTS)} as key=v1,v2,...")
+        grid[key] = [int(v) if key in INT_PARAMS else float(v) for v in values.split(",")]
+    return [dict(zip(grid, combo)) for combo in itertools.product(*grid.values())]
+
+
+def print_metrics(metrics, tracker_fps, total_fps):
+    if metrics:
+        print(f"HOTA {metrics['HOTA']:.3f}  DetA {metrics['DetA']:.3f}  AssA {metrics['AssA']:.3f}  "
+              f"LocA {metrics['LocA']:.3f}")
+        print(f"MOTA {metrics['MOTA']:.3f}  MOTP {metrics['MOTP']:.3f}  IDF1 {metrics['IDF1']:.3f}  "
+              f"IDSW {metrics['IDSW']}  FP {metrics['FP']}  FN {metrics['FN']}  IDs {metrics['IDs']}/{metrics['GT_IDs']}")
+    print(f"Tracker {tracker_fps:.1f} fps, detection + tracker {total_fps:.1f} fps")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MOT metrics (MOTA/IDF1/HOTA) and tracker FPS on recorded videos.")
+    parser.add_argument("--model", required=True, help="Path to the YOLO weights")
+    parser.add_argument("--videos", nargs="+", required=True, help="Recorded videos")
+    parser.add_argument("--gt-dir", default=None, help="Ground truth: <stem>.txt or <stem>/gt/gt.txt")
+    parser.add_argument("--output", default="runs/mot", help="Tracker outputs and metrics go here")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size")
+    parser.add_argument("--embedder", default="mobilenet",
+                        choices=["mobilenet", "torchreid", "clip_ViT-B/32", "histogram"],
+                        help="Appearance embedder (histogram is a fast torch-free color descriptor)")
+    parser.add_argument("--cache-dir", default="runs/mot_cache", help="Detection cache directory")
+    parser.add_argument("--device", default=None, help="Inference device, e.g. 0 or cpu")
+    parser.add_argument("--classes", type=int, nargs="+", default=None, help="Only track these class ids")
+    for key, value in DEFAULTS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value,
+                            help=f"Tracker setting (default: {value}, as in tracking.py)")
+    parser.add_argument("--sweep", nargs="+", default=None, metavar="PARAM=V1,V2",
+                        help=f"Grid over {', '.join(DEFAULTS)}; only the tracker re-runs")
+    parser.add_argument("--sort", default="HOTA", help="Sweep column to rank by (default: HOTA)")
+    args = parser.parse_args(argv)
+
+    sequences = []
+    for video in args.videos:
+        dets = load_or_detect(args.model, video, args.imgsz, args.embedder, args.cache_dir, args.device)
+        gt_path = find_gt(args.gt_dir, video) if args.gt_dir else None
+        if args.gt_dir and gt_path is None:
+            print(f"Warning: no ground truth for {video}; writing tracker output only")
+        sequences.append((video, dets, load_mot(gt_path, gt=True) if gt_path else None))
+    os.makedirs(args.output, exist_ok=True)
+
+    if not args.sweep:
+        params = {k: getattr(args, k) for k in DEFAULTS}
+        metrics, tracker_fps, total_fps = evaluate_params(sequences, params, args.classes, args.output)
+        print_metrics(metrics, tracker_fps, total_fps)
+        with open(os.path.join(args.output, "metrics.json"), "w") as f:
+            json.dump({"params": params, "metrics": metrics, "tracker_fps": tracker_fps, "total_fps": total_fps,
+                       "videos": args.videos, "model": args.model, "embedder": args.embedder}, f, indent=2)
+        print(f"MOTChallenge files and metrics.json written to: {args.output}")
+        return 0
+
+    if not any(gt is not None for _, _, gt in sequences):
+        parser.error("--sweep needs ground truth (--gt-dir)")
+    grid = parse_sweep(args.sweep)
+    if min(p["conf"] for p in grid) < BASE_CONF:
+        parser.error(f"detections are cached at conf >= {BASE_CONF}")
+    rows = []
+    start = time.perf_counter()
+    for i, params in enumerate(grid):
+        metrics, tracker_fps, total_fps = evaluate_params(sequences, params, args.classes)
+        rows.append({**params, **metrics, "tracker_fps": round(tracker_fps, 1), "total_fps": round(total_fps, 1)})
+        print(f"[{i + 1}/{len(grid)}] {params}  HOTA {metrics['HOTA']:.3f}  MOTA {metrics['MOTA']:.3f}  "
+              f"IDF1 {metrics['IDF1']:.3f}  IDSW {metrics['IDSW']}  {tracker_fps:.0f} fps")
+    print(f"Sweep of {len(grid)} settings took {time.perf_counter() - start:.1f}s")
+
+    rows.sort(key=lambda r: r[args.sort], reverse=args.sort not in ("IDSW", "FP", "FN"))
+    path = os.path.join(args.output, "sweep.csv")
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    best = rows[0]
+    print(f"Best by {args.sort}: " + ", ".join(f"{k}={best[k]}" for k in DEFAULTS))
+    print(f"Sweep table written to: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Run a declarative dataset pipeline (YAML or TOML spec) in a single process.
+
+Stages pass an in-memory dataset between each other instead of writing and
+re-scanning a directory after every step; only `write` stages touch the output
+disk. Stages whose inputs are ready run in parallel on a thread pool, failures
+stop every dependent stage, and per-stage timings are printed at the end.
+
+In-memory dataset:
+    {"names": [class names], "items": [item, ...]}
+    item = {"split", "image" (source image path), "name" (output file name),
+            "source" (dataset it came from), "labels" (list of YOLO label lines)}
+
+Stage types (each stage has a unique `name`, a `type` and `input`/`inputs`):
+    load             path                          read a YOLO dataset
+    annotate         source, classes[, splits, margin_px]
+                                                   classification folders -> full-frame boxes
+    polygon_to_bbox                                polygon rows -> boxes (segment_to_bbox.py)
+    relabel          mapping {old_index: name}, names
+                                                   remap class ids (changing_labels.py)
+    merge            mappings [{old_index: name}, ...], names
+                                                   merge several inputs (merge_4_datasets.py)
+    dedup            [threshold, prefer]           drop near-duplicates (dedup_dataset.py)
+    resplit          [ratios, seed, splits]        shuffle into new splits (dataset_resplit.py)
+    subsample        classes, max[, subsets, seed] cap images per class (subsample_dataset.py)
+    write            output[, link_mode]           write images, labels and data.yaml
+
+Example spec (pipeline.yaml):
+    stages:
+      - {name: general, type: load, path: datasets/general}
+      - {name: light, type: load, path: datasets/light5_split}
+      - {name: curat, type: annotate, source: train-curat-dataset, classes: [algae, peeling, stain]}
+      - {name: moisture, type: load, path: datasets/moisture}
+      - name: merged
+        type: merge
+        inputs: [general, light, curat, moisture]
+        mappings:
+          - {0: crack, 1: fire_extinguisher, 2: cabinet, 3: hose}
+          - {0: half_working_light, 1: light_off, 2: light_on}
+          - {0: algae, 1: peeling, 2: stain}
+          - {0: crack, 1: moisture}
+        names: [crack, fire_extinguisher, cabinet, hose, light_off, light_on,
+                half_working_light, algae, peeling, stain, moisture]
+      - {name: unique, type: dedup, input: merged}
+      - {name: final, type: write, input: unique, output: datasets/final}
+
+Usage:
+  python scripts/pipeline.py pipeline.yaml
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from multiprocessing import Pool
+
+import yaml
+
+from yolo_dataset import list_images, list_splits, load_class_names
+
+WRITE_SPLIT_NAMES = {"val": "valid"}
+
+
+# ----- Helpers -----
+def _input(inputs, stage):
+    if len(inputs) != 1:
+        raise ValueError(f"stage '{stage['name']}' expects exactly one input, got {len(inputs)}")
+    return inputs[0]
+
+
+def _with_labels(item, labels):
+    """Copy of item with new label lines (inputs may be shared by parallel stages)"""
+    new_item = dict(item)
+    new_item["labels"] = labels
+    return new_item
+
+
+def _int_keys(mapping):
+    return {int(k): v for k, v in (mapping or {}).items()}
+
+
+# ----- Stages -----
+def stage_load(inputs, stage):
+    path = stage["path"]
+    items = []
+    source = os.path.basename(os.path.normpath(path))
+    for split in list_splits(path):
+        images_dir = os.path.join(path, split, "images")
+        labels_dir = os.path.join(path, split, "labels")
+        for filename in list_images(images_dir):
+            label_path = os.path.join(labels_dir, os.path.splitext(filename)[0] + ".txt")
+            if not os.path.exists(label_path):
+                continue
+            with open(label_path, "r") as f:
+                labels = [line.strip() for line in f if line.strip()]
+            items.append({"split": split, "image": os.path.join(images_dir, filename),
+                          "name": filename, "source": source, "labels": labels})
+    if not items:
+        raise ValueError(f"no image/label pairs found in {path}")
+    return {"names": load_class_names(path), "items": items}
+
+
+def stage_annotate(inputs, stage):
+    import create_yolo_annotations as cya
+
+    source = stage["source"]
+    classes = stage.get("classes") or list(cya.class_mapping)
+    class_map = {name: i for i, name in enumerate(classes)}
+    splits = stage.get("splits", cya.SPLITS)
+    margin_px = stage.get("margin_px", 0)
+
+    paths = []
+    for split in splits:
+        for class_name in class_map:
+            class_dir = os.path.join(source, split, class_name)
+            if os.path.isdir(class_dir):
+                paths += [os.path.join(class_dir, f) for f in list_images(class_dir)]
+    with Pool() as pool:
+        inspected = {path: (digest, size) for path, digest, size
+                     in pool.imap_unordered(cya.inspect_image, paths, chunksize=64)}
+
+    items = []
+    for split in splits:
+        entries, _, _, _ = cya.collect_entries(os.path.join(source, split), class_map, inspected)
+        for entry in entries:
+            items.append({"split": split, "image": entry["src"], "name": entry["name"],
+                          "source": os.path.basename(os.path.normpath(source)),
+                          "labels": cya.yolo_label_lines(entry["class_ids"], *entry["size"], margin_px)})
+    return {"names": classes, "items": items}
+
+
+def stage_polygon_to_bbox(inputs, stage):
+    from segment_to_bbox import convert_line_to_bbox
+
+    dataset = _input(inputs, stage)
+    items = []
+    for item in dataset["items"]:
+        converted = (convert_line_to_bbox(line) for line in item["labels"])
+        items.append(_with_labels(item, [line for line in converted if line is not None]))
+    return {"names": dataset["names"], "items": items}
+
+
+def stage_relabel(inputs, stage):
+    from merge_4_datasets import convert_label_lines
+
+    dataset = _input(inputs, stage)
+    names = stage["names"]
+    class_dict = {name: i for i, name in enumerate(names)}
+    mapping = _int_keys(stage.get("mapping")) or dict(enumerate(dataset["names"]))
+    items = [_with_labels(item, convert_label_lines(item["labels"], mapping, item["name"], class_dict))
+             for item in dataset["items"]]
+    return {"names": names, "items": items}
+
+
+def stage_merge(inputs, stage):
+    from merge_4_datasets import convert_label_lines
+
+    names = stage["names"]
+    class_dict = {name: i for i, name in enumerate(names)}
+    mappings = stage.get("mappings") or [None] * len(inputs)
+    if len(mappings) != len(inputs):
+        raise ValueError(f"stage '{stage['name']}': {len(inputs)} inputs but {len(mappings)} mappings")
+
+    items = []
+    for i, (dataset, mapping) in enumerate(zip(inputs, mappings), start=1):
+        mapping = _int_keys(mapping) or dict(enumerate(dataset["names"]))
+        for item in dataset["items"]:
+            # Same naming as merge_3_datasets.py / merge_4_datasets.py
+            new_item = _with_labels(item, convert_label_lines(item["labels"], mapping, item["name"], class_dict))
+            new_item["name"] = f"ds{i}_{item['split']}_{item['name']}"
+            new_item["source"] = f"ds{i}"
+            items.append(new_item)
+    return {"names": names, "items": items}
+
+
+def stage_dedup(inputs, stage):
+    from dedup_dataset import DEFAULT_SPLIT_PRIORITY, DEFAULT_THRESHOLD, compute_hashes, find_duplicate_clusters
+
+    dataset = _input(inputs, stage)
+    records = [{"path": item["image"], "split": item["split"], "source": item["source"],
+                "size": os.path.getsize(item["image"]), "index": i}
+               for i, item in enumerate(dataset["items"])]
+    compute_hashes(records, stage.get("method", "dhash"))
+    clusters = find_duplicate_clusters(records, stage.get("threshold", DEFAULT_THRESHOLD),
+                                       stage.get("prefer"), stage.get("split_priority", DEFAULT_SPLIT_PRIORITY))
+    dropped = {path for c in clusters for path in c["drop"]}
+    print(f"  [{stage['name']}] dropping {len(dropped)} near-duplicates in {len(clusters)} clusters")
+    return {"names": dataset["names"],
+            "items": [item for item in dataset["items"] if item["image"] not in dropped]}
+
+
+def stage_resplit(inputs, stage):
+    from dataset_resplit import split_dataset
+
+    dataset = _input(inputs, stage)
+    ratios = stage.get("ratios", [0.8, 0.1, 0.1])
+    split_names = stage.get("splits", ["train", "valid", "test"])
+    items = list(dataset["items"])
+    splits = split_dataset(items, ratios[0], ratios[1], random.Random(stage.get("seed", 42)))
+    out = []
+    for split_name, (_, split_items) in zip(split_names, splits.items()):
+        for item in split_items:
+            new_item = dict(item)
+            new_item["split"] = split_name
+            out.append(new_item)
+    return {"names": dataset["names"], "items": out}
+
+
+def stage_subsample(inputs, stage):
+    from subsample_dataset import choose_deletions
+
+    dataset = _input(inputs, stage)
+    rng = random.Random(stage.get("seed", 42))
+    subsets = stage.get("subsets", ["train"])
+    deleted = set()
+    for subset in subsets:
+        present_by_item = {i: {int(line.split()[0]) for line in item["labels"]}
+                           for i, item in enumerate(dataset["items"]) if item["split"] == subset}
+        for _, to_delete in choose_deletions(present_by_item, stage["classes"], stage["max"], subset, rng):
+            deleted.update(to_delete)
+    return {"names": dataset["names"],
+            "items": [item for i, item in enumerate(dataset["items"]) if i not in deleted]}
+
+
+def stage_write(inputs, stage):
+    from create_yolo_annotations import link_image, unique_name
+
+    dataset = _input(inputs, stage)
+    output = stage["output"]
+    link_mode = stage.get("link_mode", "hardlink")
+    seen = set()
+    stems = {}                 # split -> label stems written so far
+    splits = []
+    for item in dataset["items"]:
+        split = WRITE_SPLIT_NAMES.get(item["split"], item["split"])
+        if split not in splits:
+            splits.append(split)
+        images_dir = os.path.join(output, split, "images")
+        labels_dir = os.path.join(output, split, "labels")
+        if split not in seen:
+            os.makedirs(images_dir, exist_ok=True)
+            os.makedirs(labels_dir, exist_ok=True)
+            seen.add(split)
+        # Labels are written per stem: x.jpg and x.png from one source must not share x.txt
+        name = unique_name(item["name"], item["source"], stems.setdefault(split, set()))
+        link_image(item["image"], os.path.join(images_dir, name), link_mode)
+        with open(os.path.join(labels_dir, os.path.splitext(name)[0] + ".txt"), "w") as f:
+            f.writelines(line + "\n" for line in item["labels"])
+
+    data = {"path": os.path.abspath(output), "nc": len(dataset["names"]), "names": list(dataset["names"])}
+    for key, split in (("train", "train"), ("val", "valid"), ("test", "test")):
+        if split in splits:
+            data[key] = f"{split}/images"
+    with open(os.path.join(output, "data.yaml"), "w") as f:
+        yaml.dump(data, f, default_flow_style=False)
+    with open(os.path.join(output, "classes.txt"), "w") as f:
+        f.writelines(name + "\n" for name in dataset["names"])
+    return dataset
+
+
+STAGES = {
+    "load": stage_load,
+    "annotate": stage_annotate,
+    "polygon_to_bbox": stage_polygon_to_bbox,
+    "relabel": stage_relabel,
+    "merge": stage_merge,
+    "dedup": stage_dedup,
+    "resplit": stage_resplit,
+    "subsample": stage_subsample,
+    "write": stage_write,
+}
+
+
+# ----- Runner -----
+def load_spec(path):
+    if path.endswith(".toml"):
+        import tomllib
+        with open(path, "rb") as f:
+            spec = tomllib.load(f)
+    else:
+        with open(path, "r") as f:
+            spec = yaml.safe_load(f)
+    stages = spec.get("stages", [])
+    names = set()
+    for stage in stages:
+        if stage.get("type") not in STAGES:
+            raise ValueError(f"unknown stage type {stage.get('type')!r} in {stage}")
+        if "input" in stage:
+            stage["inputs"] = [stage["input"]]
+        stage.setdefault("inputs", [])
+        if stage["name"] in names:
+            raise ValueError(f"duplicate stage name {stage['name']!r}")
+        names.add(stage["name"])
+    for stage in stages:
+        for dep in stage["inputs"]:
+            if dep not in names:
+                raise ValueError(f"stage {stage['name']!r} depends on unknown stage {dep!r}")
+    return stages
+
+
+def run_pipeline(stages, max_workers=4):
+    """
+    Execute the stages, running every stage whose inputs are ready in parallel.
+    Returns (results by stage name, timings list, failed stage names).
+    """
+    results, timings, failed = {}, [], set()
+    pending = {s["name"]: s for s in stages}
+    running = {}
+
+    def run(stage):
+        start = time.perf_counter()
+        out = STAGES[stage["type"]]([results[d] for d in stage["inputs"]], stage)
+        return out, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(d in failed for d in stage["inputs"]):
+                    print(f"[{name}] skipped: an input stage failed")
+                    failed.add(name)
+                    del pending[name]
+                elif all(d in results for d in stage["inputs"]):
+                    print(f"[{name}] {stage['type']} started")
+                    running[executor.submit(run, stage)] = stage
+                    del pending[name]
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    out, elapsed = future.result()
+                except Exception as e:
+                    print(f"[{stage['name']}] FAILED: {e}")
+                    failed.add(stage["name"])
+                    continue
+                results[stage["name"]] = out
+                timings.append((stage["name"], stage["type"], elapsed, len(out["items"])))
+                print(f"[{stage['name']}] done in {elapsed:.2f}s ({len(out['items'])} images)")
+    return results, timings, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run a YAML/TOML dataset pipeline (annotate, merge, relabel, resplit, ...) in one process."
+    )
+    parser.add_argument("spec", help="Pipeline spec file (.yaml/.yml or .toml)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Stages that may run at the same time (default: 4)")
+    args = parser.parse_args(argv)
+
+    stages = load_spec(args.spec)
+    start = time.perf_counter()
+    _, timings, failed = run_pipeline(stages, args.workers)
+
+    print("\nStage timings:")
+    for name, stage_type, elapsed, n_items in timings:
+        print(f"  {name:<20} {stage_type:<16} {elapsed:8.2f}s  {n_items:>8} images")
+    print(f"Total: {time.perf_counter() - start:.2f}s")
+    if failed:
+        print(f"Failed stages: {', '.join(sorted(failed))}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
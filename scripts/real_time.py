@@ -1,6 +1,13 @@
+import os
+import sys
+
 from ultralytics import YOLO
 import cv2
 
+# The overlay renderer lives next to detection.py in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from overlay import OverlayRenderer, result_labels
+
 # Load your YOLOv11 model (update with your actual weights path)
 model = YOLO('/home/ruhalis/coin/robodog-cv/runs/detect/train3/weights/best.pt')
 
@@ -11,6 +18,8 @@ if not cap.isOpened():
     print("Error: Could not open camera.")
     exit()
 
+overlay = OverlayRenderer()
+
 while True:
     ret, frame = cap.read()
     if not ret:
@@ -20,8 +29,9 @@ while True:
     # Run inference on the current frame; 'source' can be the frame itself
     results = model.predict(source=frame, conf=0.25)
     
-    # Get the annotated frame (bounding boxes and labels are drawn on it)
-    annotated_frame = results[0].plot()  # returns image in BGR format
+    # Draw bounding boxes and cached labels straight onto the frame
+    boxes = results[0].boxes
+    annotated_frame = overlay.detections(frame, boxes.xyxy.tolist(), boxes.cls.tolist(), result_labels(results[0]))
 
     # Display the annotated frame
     cv2.imshow("Real-Time YOLOv11", annotated_frame)
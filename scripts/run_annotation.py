@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
+import argparse
 import os
-import subprocess
 import sys
 
-def main():
+def main(argv=None):
     """Main function to run the entire annotation and YAML generation process"""
     # Check for required Python packages
     try:
@@ -16,40 +16,52 @@ def main():
         print("Please install the required packages using:")
         print("pip install numpy opencv-python pillow pyyaml")
         return 1
-    
-    # Get the current directory
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Check if scripts exist
-    annotation_script = os.path.join(current_dir, 'create_yolo_annotations.py')
-    yaml_script = os.path.join(current_dir, 'create_dataset_yaml.py')
-    
-    if not os.path.exists(annotation_script):
-        print(f"Error: Annotation script not found at {annotation_script}")
-        return 1
-    
-    if not os.path.exists(yaml_script):
-        print(f"Error: YAML script not found at {yaml_script}")
-        return 1
-    
+
+    # Both steps run in this interpreter instead of spawning a new one per step
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import create_yolo_annotations
+    from create_dataset_yaml import create_dataset_yaml
+
+    parser = argparse.ArgumentParser(
+        description="Create YOLO annotations from a classification dataset and write its dataset.yaml."
+    )
+    parser.add_argument("--source", default=create_yolo_annotations.source_base_dir,
+                        help="Classification dataset root")
+    parser.add_argument("--dest", default=create_yolo_annotations.dest_base_dir,
+                        help="Output YOLO dataset root")
+    parser.add_argument("--classes", nargs='+', default=list(create_yolo_annotations.class_mapping),
+                        help="Class folder names, in class-id order")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
     print("Starting annotation process...")
-    
-    # Run the annotation script
+
     try:
         print("Step 1: Creating YOLO annotations...")
-        os.system(f'python "{annotation_script}"')
-        
+        summary = create_yolo_annotations.convert(
+            args.source, args.dest, {name: i for i, name in enumerate(args.classes)},
+            workers=args.workers)
+        failed = sum(s['failed'] for s in summary.values())
+        if failed:
+            print(f"Error: {failed} images could not be written")
+            return 1
+        if not any(s['images'] for s in summary.values()):
+            print(f"Error: No images found under {args.source}")
+            return 1
+        create_yolo_annotations.print_dataset_summary(args.dest)
+
         print("\nStep 2: Creating dataset YAML configuration...")
-        os.system(f'python "{yaml_script}"')
-        
+        create_dataset_yaml(args.dest, args.classes)
+
         print("\nAnnotation process completed successfully!")
-        print("The YOLO dataset is ready at: train-curat-dataset-yolo/")
+        print(f"The YOLO dataset is ready at: {args.dest}/")
         print("You can use the dataset.yaml file with YOLOv11 for training.")
-        
+
         return 0
     except Exception as e:
         print(f"Error during annotation process: {e}")
         return 1
 
 if __name__ == "__main__":
-    sys.exit(main()) 
\ No newline at end of file
+    sys.exit(main())
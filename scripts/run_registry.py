@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Index every training run under runs/detect into one table and compare them.
+
+Each run directory with a results.csv (and usually an args.yaml) becomes one
+row: the training arguments that matter for cost (model, imgsz, batch, ...),
+time per epoch, throughput, best epoch by Ultralytics fitness
+(0.1 * mAP50 + 0.9 * mAP50-95), convergence speed and GPU time per mAP point.
+Per-epoch metrics of all runs are stored in a second long-format table.
+
+Tables are written as parquet when pyarrow/fastparquet is installed, CSV
+otherwise. --plots renders side-by-side comparisons with matplotlib.
+
+Throughput needs the number of batches per epoch, which Ultralytics doesn't
+log. It is recovered from the train_batch{N}.jpg mosaic that is plotted at the
+first close_mosaic epoch (N = (epochs - close_mosaic) * batches_per_epoch), or
+by counting the training images when the run's data.yaml is reachable.
+
+Example:
+  python scripts/run_registry.py --runs runs/detect --output runs/registry --plots
+  python scripts/run_registry.py --sort cost_h_per_map_point
+"""
+import argparse
+import glob
+import math
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from yolo_dataset import list_images
+
+ARG_COLUMNS = ["model", "data", "epochs", "batch", "imgsz", "optimizer", "lr0", "close_mosaic",
+               "fraction", "cache", "amp", "device", "workers", "patience"]
+METRIC_COLUMNS = {
+    "metrics/precision(B)": "precision",
+    "metrics/recall(B)": "recall",
+    "metrics/mAP50(B)": "map50",
+    "metrics/mAP50-95(B)": "map50_95",
+}
+CONVERGENCE_FRACTION = 0.95    # "converged" = first epoch reaching 95% of the best mAP50-95
+TRAIN_BATCH_RE = re.compile(r"^train_batch(\d+)\.jpg$")
+
+
+# ----- Per-run parsing -----
+
+def load_results(run_dir):
+    """results.csv as a DataFrame with stripped column names (older versions pad them)"""
+    df = pd.read_csv(os.path.join(run_dir, "results.csv"))
+    df.columns = [c.strip() for c in df.columns]
+    df = df.rename(columns=METRIC_COLUMNS)
+    df["fitness"] = 0.1 * df["map50"] + 0.9 * df["map50_95"]
+    return df
+
+
+def load_args(run_dir):
+    path = os.path.join(run_dir, "args.yaml")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return yaml.safe_load(f) or {}
+
+
+def batches_per_epoch(run_dir, args):
+    """Infer iterations per epoch from the close-mosaic train_batch plot, or None"""
+    epochs, close_mosaic = args.get("epochs"), args.get("close_mosaic") or 0
+    mosaic_epochs = (epochs or 0) - close_mosaic
+    if mosaic_epochs <= 0:
+        return None
+    indices = [int(m.group(1)) for m in (TRAIN_BATCH_RE.match(f) for f in os.listdir(run_dir)) if m]
+    # train_batch0..2 are always plotted; the close-mosaic ones are the only larger indices
+    late = [i for i in indices if i > 2]
+    if not late:
+        return None
+    nb, rem = divmod(min(late), mosaic_epochs)
+    return nb if rem == 0 else None
+
+
+def train_images_from_data(args):
+    """Count training images when the run's data.yaml is reachable from here, else None"""
+    data = args.get("data")
+    if not data or not os.path.exists(data):
+        return None
+    with open(data, "r") as f:
+        cfg = yaml.safe_load(f) or {}
+    base = cfg.get("path") or os.path.dirname(os.path.abspath(data))
+    train = cfg.get("train")
+    if not train:
+        return None
+    sources = train if isinstance(train, list) else [train]
+    total = 0
+    for src in sources:
+        src = src if os.path.isabs(src) else os.path.join(base, src)
+        if os.path.isdir(src):
+            total += len(list_images(src))
+    return total or None
+
+
+def summarize_run(run_dir, df, args):
+    """One registry row for a run"""
+    name = os.path.basename(os.path.normpath(run_dir))
+    row = {"run": name, "path": os.path.abspath(run_dir)}
+    row.update({k: args.get(k) for k in ARG_COLUMNS})
+    if isinstance(row["model"], str):
+        row["model"] = os.path.basename(row["model"])
+
+    # "time" is cumulative seconds since the start of training
+    times = df["time"].to_numpy(dtype=float) if "time" in df else np.full(len(df), np.nan)
+    epoch_times = np.diff(np.r_[0.0, times])
+    row["epochs_done"] = int(df["epoch"].max()) if len(df) else 0
+    row["finished"] = bool(args.get("epochs")) and row["epochs_done"] >= args["epochs"]
+    row["train_hours"] = float(times[-1] / 3600) if len(times) else np.nan
+    row["sec_per_epoch"] = float(np.median(epoch_times)) if len(epoch_times) else np.nan
+
+    batch = args.get("batch")
+    nb = batches_per_epoch(run_dir, args)
+    if nb and batch:
+        images = nb * batch
+    else:
+        images = train_images_from_data(args)
+        if images:
+            images = int(math.ceil(images * min(args.get("fraction") or 1.0, 1.0)))
+            nb = math.ceil(images / batch) if batch and batch > 0 else None
+    row["batches_per_epoch"] = nb
+    row["images_per_epoch"] = images
+    row["images_per_sec"] = images / row["sec_per_epoch"] if images and row["sec_per_epoch"] > 0 else np.nan
+
+    if len(df):
+        best = df.loc[df["fitness"].idxmax()]
+        row["best_epoch"] = int(best["epoch"])
+        row["best_fitness"] = float(best["fitness"])
+        for col in METRIC_COLUMNS.values():
+            row[f"best_{col}"] = float(best[col])
+        row["hours_to_best"] = float(best["time"] / 3600) if "time" in df else np.nan
+
+        # Convergence: first epoch within CONVERGENCE_FRACTION of the best mAP50-95
+        target = CONVERGENCE_FRACTION * df["map50_95"].max()
+        hit = df[df["map50_95"] >= target].iloc[0]
+        row["converge_epoch"] = int(hit["epoch"])
+        row["hours_to_converge"] = float(hit["time"] / 3600) if "time" in df else np.nan
+        map_points = 100 * row["best_map50_95"]
+        row["cost_h_per_map_point"] = row["hours_to_best"] / map_points if map_points > 0 else np.nan
+    return row
+
+
+def index_runs(runs_root):
+    """Return (registry, epochs) DataFrames for every run directory under runs_root"""
+    rows, curves = [], []
+    for results_csv in sorted(glob.glob(os.path.join(runs_root, "*", "results.csv"))):
+        run_dir = os.path.dirname(results_csv)
+        try:
+            df = load_results(run_dir)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, KeyError) as e:
+            print(f"Skipping {run_dir}: unreadable results.csv ({e})")
+            continue
+        args = load_args(run_dir)
+        row = summarize_run(run_dir, df, args)
+        rows.append(row)
+        curve = df.copy()
+        curve.insert(0, "run", row["run"])
+        curve["epoch_sec"] = np.diff(np.r_[0.0, curve["time"].to_numpy(dtype=float)]) if "time" in curve else np.nan
+        curves.append(curve)
+    registry = pd.DataFrame(rows)
+    epochs = pd.concat(curves, ignore_index=True) if curves else pd.DataFrame()
+    return registry, epochs
+
+
+# ----- Output -----
+
+def save_table(df, path_without_ext):
+    """Write parquet if an engine is installed, else CSV; returns the path written"""
+    try:
+        path = path_without_ext + ".parquet"
+        df.to_parquet(path, index=False)
+    except ImportError:
+        path = path_without_ext + ".csv"
+        df.to_csv(path, index=False)
+    return path
+
+
+def plot_comparison(registry, epochs, output_dir):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+    for run, curve in epochs.groupby("run", sort=False):
+        axes[0, 0].plot(curve["epoch"], curve["map50_95"], label=run)
+        axes[0, 1].plot(curve["time"] / 3600, curve["map50_95"], label=run)
+        axes[1, 0].plot(curve["epoch"], curve["epoch_sec"], label=run)
+    axes[0, 0].set(xlabel="epoch", ylabel="mAP50-95", title="mAP50-95 per epoch")
+    axes[0, 1].set(xlabel="training hours", ylabel="mAP50-95", title="mAP50-95 vs wall-clock")
+    axes[1, 0].set(xlabel="epoch", ylabel="seconds", title="Epoch time")
+    for ax in axes.flat[:3]:
+        ax.grid(alpha=0.3)
+        ax.legend(fontsize=8)
+
+    ax = axes[1, 1]
+    reg = registry.dropna(subset=["cost_h_per_map_point"])
+    ax.bar(reg["run"], reg["cost_h_per_map_point"] * 60, color="tab:orange")
+    ax.set(ylabel="GPU minutes per mAP50-95 point", title="Cost to best epoch per mAP point")
+    ax.tick_params(axis="x", rotation=30)
+    fig.tight_layout()
+    path = os.path.join(output_dir, "runs_comparison.png")
+    fig.savefig(path, dpi=150)
+    plt.close(fig)
+    return path
+
+
+def print_registry(registry):
+    cols = ["run", "model", "imgsz", "batch", "epochs_done", "sec_per_epoch", "images_per_sec",
+            "best_epoch", "best_map50", "best_map50_95", "converge_epoch", "hours_to_best", "cost_h_per_map_point"]
+    cols = [c for c in cols if c in registry]
+    with pd.option_context("display.max_columns", None, "display.width", 200, "display.float_format", "{:.3f}".format):
+        print(registry[cols].to_string(index=False))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index and compare Ultralytics training runs.")
+    parser.add_argument("--runs", default="runs/detect", help="Directory containing run directories")
+    parser.add_argument("--output", default="runs/registry", help="Where to write the registry tables/plots")
+    parser.add_argument("--sort", default="best_map50_95", help="Registry column to sort by (descending)")
+    parser.add_argument("--plots", action="store_true", help="Render side-by-side comparison plots")
+    args = parser.parse_args(argv)
+
+    registry, epochs = index_runs(args.runs)
+    if registry.empty:
+        print(f"No runs with results.csv under {args.runs}")
+        return 1
+    if args.sort in registry:
+        ascending = args.sort.startswith(("cost", "hours", "sec", "converge"))
+        registry = registry.sort_values(args.sort, ascending=ascending, na_position="last")
+    print_registry(registry)
+
+    os.makedirs(args.output, exist_ok=True)
+    print(f"\nRegistry: {save_table(registry, os.path.join(args.output, 'registry'))}")
+    print(f"Epochs:   {save_table(epochs, os.path.join(args.output, 'epochs'))}")
+    if args.plots:
+        print(f"Plots:    {plot_comparison(registry, epochs, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,30 @@ import random
 from pathlib import Path
 import os
 
+def choose_deletions(present_by_file, class_ids, max_count, subset="", rng=random):
+    """
+    Given {file: set of class IDs present}, yield (class ID, files to delete) so
+    that at most max_count files per class remain (files are picked at random).
+    """
+    # Map each class ID to its list of label files
+    cls_map = {cls: [] for cls in class_ids}
+    for label_file, present in present_by_file.items():
+        for cls in class_ids:
+            if cls in present:
+                cls_map[cls].append(label_file)
+
+    # For each class, select files exceeding the max_count
+    for cls, files in cls_map.items():
+        total = len(files)
+        if total <= max_count:
+            print(f"Class {cls} in subset '{subset}' has {total} images (<= {max_count}), skipping.")
+            continue
+        rng.shuffle(files)
+        to_delete = files[max_count:]
+        print(f"Deleting {len(to_delete)} images for class {cls} in subset '{subset}'.")
+        yield cls, to_delete
+
+
 def subsample(dataset_dir, class_ids, max_count, subsets):
     dataset_dir = Path(dataset_dir)
     for subset in subsets:
@@ -17,25 +41,14 @@ def subsample(dataset_dir, class_ids, max_count, subsets):
             print(f"Skipping subset '{subset}': images or labels directory does not exist.")
             continue
 
-        # Map each class ID to its list of label files
-        cls_map = {cls: [] for cls in class_ids}
+        # Classes present in each label file
+        present_by_file = {}
         for label_path in labels_dir.glob("*.txt"):
             with label_path.open('r') as f:
                 lines = [l.strip() for l in f if l.strip()]
-            present = set(int(l.split()[0]) for l in lines)
-            for cls in class_ids:
-                if cls in present:
-                    cls_map[cls].append(label_path)
+            present_by_file[label_path] = set(int(l.split()[0]) for l in lines)
 
-        # For each class, delete files exceeding the max_count
-        for cls, files in cls_map.items():
-            total = len(files)
-            if total <= max_count:
-                print(f"Class {cls} in subset '{subset}' has {total} images (<= {max_count}), skipping.")
-                continue
-            random.shuffle(files)
-            to_delete = files[max_count:]
-            print(f"Deleting {len(to_delete)} images for class {cls} in subset '{subset}'.")
+        for cls, to_delete in choose_deletions(present_by_file, class_ids, max_count, subset):
             for label_path in to_delete:
                 try:
                     label_path.unlink()
@@ -53,7 +66,7 @@ def subsample(dataset_dir, class_ids, max_count, subsets):
                         break
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Subsample YOLO dataset to limit images per class"
     )
@@ -77,7 +90,7 @@ def main():
         "--seed", type=int, default=42,
         help="Random seed for reproducibility"
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     random.seed(args.seed)
     subsample(args.dataset, args.classes, args.max, args.subsets)
 
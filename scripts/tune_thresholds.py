@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Pick a confidence threshold per class from cached validation predictions.
+
+For every class the cached predictions (see cached_eval.py) are sorted by score
+once; cumulative TP/FP counts then give precision, recall and F1 at every
+possible threshold in one vectorized pass. The chosen operating point either
+maximizes F1 or, with --min-precision, maximizes recall subject to a precision
+floor. The result is a threshold profile that detection.py, tracking.py and
+image_detection.py load with --thresholds.
+
+Example:
+  python scripts/tune_thresholds.py --model runs/detect/train2/weights/best.pt \
+      --data datasets/final/data.yaml --output thresholds.json
+  python scripts/tune_thresholds.py ... --min-precision 0.9 --classes moisture half_working_light
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from cached_eval import CachedEvaluator, file_sha1, load_or_predict
+
+MIN_THRESHOLD = 0.05          # never go below this, even if F1 keeps rising
+
+
+def sweep_class(tp, scores, n_gt):
+    """
+    Precision / recall / F1 at every distinct score of one class.
+    Returns (thresholds, precision, recall, f1), thresholds descending.
+    """
+    order = np.argsort(-scores, kind="stable")
+    scores, tp = scores[order], tp[order]
+    tpc = np.cumsum(tp)
+    fpc = np.cumsum(~tp)
+    # Only the last prediction of a run of equal scores is a valid cut point
+    last = np.r_[scores[1:] != scores[:-1], True]
+    scores, tpc, fpc = scores[last], tpc[last], fpc[last]
+    precision = tpc / np.maximum(tpc + fpc, 1)
+    recall = tpc / max(n_gt, 1)
+    f1 = 2 * precision * recall / np.maximum(precision + recall, 1e-16)
+    return scores, precision, recall, f1
+
+
+def choose_threshold(thresholds, precision, recall, f1, min_precision=None, min_threshold=MIN_THRESHOLD):
+    """Index of the chosen operating point, or None if no point qualifies"""
+    valid = thresholds >= min_threshold
+    if min_precision is not None:
+        valid &= precision >= min_precision
+        if not valid.any():
+            return None
+        return int(np.flatnonzero(valid)[np.argmax(recall[valid])])
+    if not valid.any():
+        return None
+    return int(np.flatnonzero(valid)[np.argmax(f1[valid])])
+
+
+def tune(evaluator, class_ids, min_precision=None, default=0.25, iou_index=0):
+    """Return {class name: {"threshold", "precision", "recall", "f1", "instances"}}"""
+    preds, gt = evaluator.preds, evaluator.gt
+    tp = evaluator.tp[:, iou_index]
+    profile = {}
+    for c in class_ids:
+        name = evaluator.names[c]
+        mask = preds["classes"] == c
+        n_gt = int((gt["classes"] == c).sum())
+        if n_gt == 0 or not mask.any():
+            print(f"  {name:<22} no validation {'labels' if n_gt == 0 else 'predictions'}; keeping default {default}")
+            continue
+        thresholds, precision, recall, f1 = sweep_class(tp[mask], preds["scores"][mask], n_gt)
+        i = choose_threshold(thresholds, precision, recall, f1, min_precision)
+        if i is None:
+            print(f"  {name:<22} no threshold reaches precision {min_precision}; keeping default {default}")
+            continue
+        profile[name] = {"threshold": round(float(thresholds[i]), 4), "precision": float(precision[i]),
+                         "recall": float(recall[i]), "f1": float(f1[i]), "instances": n_gt}
+    return profile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Optimize per-class confidence thresholds from cached validation predictions."
+    )
+    parser.add_argument("--model", required=True, help="Path to the YOLO weights")
+    parser.add_argument("--data", required=True, help="Path to the dataset data.yaml")
+    parser.add_argument("--split", default="val", help="data.yaml split to tune on (default: val)")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size (default: 640)")
+    parser.add_argument("--cache-dir", default="runs/eval_cache", help="Prediction cache directory")
+    parser.add_argument("--classes", nargs="+", default=None, help="Class names to tune (default: all)")
+    parser.add_argument("--min-precision", type=float, default=None,
+                        help="Maximize recall subject to this precision instead of maximizing F1")
+    parser.add_argument("--iou", type=float, default=0.5, choices=[0.5, 0.75],
+                        help="IoU that counts a detection as correct (default: 0.5)")
+    parser.add_argument("--default", type=float, default=0.25,
+                        help="Threshold for classes that cannot be tuned (default: 0.25)")
+    parser.add_argument("--output", default="thresholds.json", help="Profile to write")
+    args = parser.parse_args(argv)
+
+    preds, gt, names, _ = load_or_predict(args.model, args.data, args.split, args.imgsz, args.cache_dir)
+    evaluator = CachedEvaluator(preds, gt, names)
+    class_ids = [names.index(c) for c in args.classes] if args.classes else list(range(len(names)))
+    iou_index = 0 if args.iou == 0.5 else 5
+
+    print(f"Tuning {len(class_ids)} classes ({'precision >= ' + str(args.min_precision) if args.min_precision else 'max F1'})...")
+    profile = tune(evaluator, class_ids, args.min_precision, args.default, iou_index)
+    print(f"{'class':<22}{'thr':>7}{'P':>8}{'R':>8}{'F1':>8}")
+    for name, p in profile.items():
+        print(f"{name:<22}{p['threshold']:>7.3f}{p['precision']:>8.3f}{p['recall']:>8.3f}{p['f1']:>8.3f}")
+
+    out = {
+        "model": os.path.abspath(args.model),
+        "weights_sha1": file_sha1(args.model),
+        "objective": f"precision>={args.min_precision}" if args.min_precision else "max_f1",
+        "default": args.default,
+        "thresholds": {name: p["threshold"] for name, p in profile.items()},
+        "metrics": profile,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(out, f, indent=2)
+    print(f"Threshold profile written to: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Small helpers shared by the dataset scripts for walking YOLO-formatted datasets
+(<root>/<split>/images + <root>/<split>/labels).
+"""
+import os
+import re
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+SPLITS = ["train", "valid", "val", "test"]
+
+# Prefix written by merge_3_datasets.py / merge_4_datasets.py, e.g. "ds2_train_img.jpg"
+MERGE_PREFIX = re.compile(r"^(ds\d+)_")
+
+
+def is_image_file(filename):
+    """True if filename has one of the supported image extensions"""
+    return filename.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def list_splits(dataset_dir):
+    """Return the split names present in dataset_dir (those with an images folder)"""
+    return [split for split in SPLITS
+            if os.path.isdir(os.path.join(dataset_dir, split, "images"))]
+
+
+def list_images(images_dir):
+    """Sorted list of image file names in images_dir"""
+    if not os.path.isdir(images_dir):
+        return []
+    return sorted(f for f in os.listdir(images_dir) if is_image_file(f))
+
+
+def label_path_for_image(image_path):
+    """Map <split>/images/<name>.<ext> to <split>/labels/<name>.txt"""
+    images_dir, filename = os.path.split(image_path)
+    split_dir = os.path.dirname(images_dir)
+    return os.path.join(split_dir, "labels", os.path.splitext(filename)[0] + ".txt")
+
+
+def find_image(images_dir, stem):
+    """Return the path of the image named stem.<ext> in images_dir, or None"""
+    for ext in IMAGE_EXTENSIONS:
+        for candidate in (stem + ext, stem + ext.upper()):
+            path = os.path.join(images_dir, candidate)
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def image_size(image_path):
+    """
+    (width, height) of an image read from the file header only (no pixel decode).
+    Returns None if the file is not a readable image.
+    """
+    from PIL import Image
+    try:
+        with Image.open(image_path) as im:
+            return im.size
+    except Exception:
+        return None
+
+
+def load_class_names(dataset_dir):
+    """
+    Read class names from data.yaml / dataset.yaml or classes.txt in dataset_dir.
+    Returns an empty list if none of them exists.
+    """
+    for yaml_name in ("data.yaml", "dataset.yaml"):
+        yaml_path = os.path.join(dataset_dir, yaml_name)
+        if os.path.exists(yaml_path):
+            import yaml
+            with open(yaml_path, "r") as f:
+                data = yaml.safe_load(f) or {}
+            names = data.get("names", [])
+            if isinstance(names, dict):
+                names = [names[k] for k in sorted(names)]
+            return list(names)
+
+    classes_path = os.path.join(dataset_dir, "classes.txt")
+    if os.path.exists(classes_path):
+        with open(classes_path, "r") as f:
+            return [line.strip() for line in f if line.strip()]
+    return []
@@ -0,0 +1,66 @@
+"""Label files are written per file stem, so images that share a stem must get distinct output names."""
+import os
+import sys
+
+import cv2
+import numpy as np
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import create_yolo_annotations as cya  # noqa: E402
+import pipeline  # noqa: E402
+
+
+def make_classification_dataset(root):
+    """train/{algae,peeling,stain}: x.jpg in algae+peeling (same bytes), x.png and stain_x.jpg in stain"""
+    images = {"algae/x.jpg": 10, "peeling/x.jpg": 10, "stain/x.png": 200, "stain/stain_x.jpg": 120}
+    for rel, value in images.items():
+        path = os.path.join(root, "train", rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cv2.imwrite(path, np.full((24, 32, 3), value, np.uint8))
+
+
+def read_labels(labels_dir):
+    labels = {}
+    for filename in sorted(os.listdir(labels_dir)):
+        with open(os.path.join(labels_dir, filename)) as f:
+            labels[filename] = sorted(line.split()[0] for line in f if line.strip())
+    return labels
+
+
+def test_convert_keeps_labels_of_images_sharing_a_stem(tmp_path):
+    make_classification_dataset(tmp_path / "src")
+    cya.convert(str(tmp_path / "src"), str(tmp_path / "out"), splits=["train"], workers=1)
+
+    out = tmp_path / "out" / "train"
+    images = sorted(os.listdir(out / "images"))
+    labels = read_labels(out / "labels")
+    assert len(images) == 3
+    assert len(labels) == 3
+    assert sorted(os.path.splitext(name)[0] + ".txt" for name in images) == sorted(labels)
+    assert labels["x.txt"] == ["0", "1"]
+    assert sorted(labels.values()) == [["0", "1"], ["2"], ["2"]]
+
+
+def test_pipeline_write_keeps_labels_of_images_sharing_a_stem(tmp_path):
+    make_classification_dataset(tmp_path / "src")
+    spec = {"stages": [
+        {"name": "curat", "type": "annotate", "source": str(tmp_path / "src"),
+         "classes": ["algae", "peeling", "stain"], "splits": ["train"]},
+        {"name": "merged", "type": "merge", "inputs": ["curat"],
+         "mappings": [{0: "algae", 1: "peeling", 2: "stain"}], "names": ["algae", "peeling", "stain"]},
+        {"name": "final", "type": "write", "input": "merged", "output": str(tmp_path / "out")},
+    ]}
+    spec_path = tmp_path / "pipeline.yaml"
+    spec_path.write_text(yaml.dump(spec))
+    assert pipeline.main([str(spec_path)]) == 0
+
+    labels = read_labels(tmp_path / "out" / "train" / "labels")
+    assert len(os.listdir(tmp_path / "out" / "train" / "images")) == 3
+    assert sorted(labels.values()) == [["0", "1"], ["2"], ["2"]]
+
+
+def test_unique_name_prefixes_until_the_stem_is_free():
+    used = {"x", "stain_x"}
+    assert cya.unique_name("x.png", "stain", used) == "stain_stain_x.png"
+    assert "stain_stain_x" in used
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Thread budgets and core pinning for the live loops.
+
+PyTorch (YOLO and DeepSORT's embedder), OpenCV and the BLAS behind NumPy each
+size their thread pools to the whole machine by default, so on the 4-8 core
+robot computer they oversubscribe and frame latency jitters. A thread profile
+fixes the pool sizes once, and per pipeline stage (inference, tracker, render,
+...) the torch/OpenCV thread counts and the set of cores the calling thread may
+run on:
+
+  {
+    "interop_threads": 1,
+    "blas_threads": 1,
+    "stages": {
+      "inference": {"torch_threads": 3, "cv2_threads": 1, "cores": [0, 1, 2]},
+      "tracker":   {"torch_threads": 1, "cv2_threads": 1, "cores": [3]},
+      "render":    {"cv2_threads": 2}
+    }
+  }
+
+Settings are only touched when they change between stages. torch's intra-op
+workers inherit the affinity of the thread that first runs a parallel op, so
+the first stage to run inference decides where that pool lives.
+
+Usage:
+  budget = load_thread_profile(args.thread_profile)     # a no-op budget without a profile
+  budget.apply()
+  with budget.stage("inference"):
+      results = model(frame)
+  budget.use("render")                                  # same switch, without a block
+
+Search for the best allocation on this machine (each candidate runs in a fresh
+process, since torch's interop pool can only be sized once per process):
+  python thread_budget.py --search --model runs/detect/train2/weights/best.pt --output thread_profile.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+SEARCH_FRAMES = 40             # timed frames per candidate
+SEARCH_WARMUP = 5              # untimed frames per candidate
+BLAS_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def set_blas_threads(n):
+    """Limit BLAS/OpenMP pools; threadpoolctl reaches already loaded libraries, the env vars child processes"""
+    for var in BLAS_ENV:
+        os.environ[var] = str(n)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return None
+    return threadpool_limits(limits=n)
+
+
+def pin_current_thread(cores):
+    """Restrict the calling thread to `cores` (Linux); returns False where affinity is unsupported"""
+    if not hasattr(os, "sched_setaffinity"):
+        return False
+    os.sched_setaffinity(0, cores)
+    return True
+
+
+class ThreadBudget:
+    def __init__(self, stages=None, interop_threads=None, blas_threads=None):
+        self.stages = stages or {}
+        self.interop_threads = interop_threads
+        self.blas_threads = blas_threads
+        self.current = {}           # setting -> value currently in effect
+        self._blas_limits = None
+
+    @property
+    def enabled(self):
+        return bool(self.stages or self.interop_threads or self.blas_threads)
+
+    def to_dict(self):
+        return {"interop_threads": self.interop_threads, "blas_threads": self.blas_threads, "stages": self.stages}
+
+    def apply(self):
+        """Process-wide settings; call once before the model is loaded"""
+        if self.blas_threads:
+            self._blas_limits = set_blas_threads(self.blas_threads)
+        if self.interop_threads:
+            import torch
+            try:
+                torch.set_num_interop_threads(self.interop_threads)
+            except RuntimeError:
+                # Only allowed before the first inter-op parallel work in this process
+                print(f"Warning: torch interop threads already fixed at {torch.get_num_interop_threads()}")
+        return self
+
+    def _set(self, key, value):
+        if value is None or self.current.get(key) == value:
+            return
+        if key == "torch_threads":
+            import torch
+            torch.set_num_threads(value)
+        elif key == "cv2_threads":
+            cv2.setNumThreads(value)
+        elif key == "cores":
+            pin_current_thread(value)
+        self.current[key] = value
+
+    def use(self, name):
+        """Switch the calling thread to the stage's thread counts and cores (they stay until the next switch)"""
+        settings = self.stages.get(name)
+        if settings:
+            for key in ("cores", "torch_threads", "cv2_threads"):
+                self._set(key, settings.get(key))
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self.use(name)
+        yield
+
+    def describe(self):
+        parts = [f"interop={self.interop_threads}", f"blas={self.blas_threads}"]
+        for name, s in self.stages.items():
+            parts.append(name + "(" + ", ".join(f"{k}={v}" for k, v in s.items()) + ")")
+        return " ".join(parts)
+
+
+def load_thread_profile(path):
+    """ThreadBudget from a profile JSON; an empty (no-op) budget when path is None"""
+    if not path:
+        return ThreadBudget()
+    with open(path) as f:
+        profile = json.load(f)
+    budget = ThreadBudget(profile.get("stages"), profile.get("interop_threads"), profile.get("blas_threads"))
+    print(f"Thread profile {path}: {budget.describe()}")
+    return budget
+
+
+def add_thread_args(parser):
+    parser.add_argument("--thread-profile", type=str, default=None,
+                        help="Thread/core allocation from thread_budget.py --search")
+
+# ----- Search -----
+
+def candidate_budgets(cores):
+    """A small grid: inference threads x tracker threads, shared cores vs. split cores"""
+    n = len(cores)
+    inference_threads = sorted({max(1, min(n, t)) for t in (1, 2, n // 2, n - 1, n)})
+    candidates = []
+    for t in inference_threads:
+        for tracker_threads in sorted({1, min(2, n)}):
+            stages = {
+                "inference": {"torch_threads": t, "cv2_threads": 1},
+                "tracker": {"torch_threads": tracker_threads, "cv2_threads": 1},
+                "render": {"cv2_threads": max(1, min(2, n - t))},
+            }
+            candidates.append(ThreadBudget(stages, interop_threads=1, blas_threads=1))
+            if t < n:
+                # Inference on its own cores, everything else on the rest
+                split = {name: dict(s) for name, s in stages.items()}
+                split["inference"]["cores"] = cores[:t]
+                for name in ("tracker", "render", "capture"):
+                    split.setdefault(name, {})["cores"] = cores[t:]
+                candidates.append(ThreadBudget(split, interop_threads=1, blas_threads=1))
+    return candidates
+
+
+def measure_budget(budget, model_path, imgsz, frames=SEARCH_FRAMES, warmup=SEARCH_WARMUP):
+    """Per-frame latency of a tracking.py-like loop (resize, predict, DeepSORT, overlay) under a budget"""
+    from deep_sort_realtime.deepsort_tracker import DeepSort
+    from ultralytics import YOLO
+
+    from overlay import OverlayRenderer
+
+    budget.apply()
+    model = YOLO(model_path)
+    try:
+        tracker, embeds = DeepSort(max_age=30, n_init=3, max_cosine_distance=0.2), False
+    except Exception:
+        # The default embedder needs pkg_resources; time the tracker with supplied embeddings instead
+        tracker, embeds = DeepSort(max_age=30, n_init=3, max_cosine_distance=0.2, embedder=None), True
+    overlay = OverlayRenderer()
+    rng = np.random.default_rng(0)
+    source = rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+
+    times = []
+    for i in range(warmup + frames):
+        start = time.perf_counter()
+        with budget.stage("capture"):
+            frame = cv2.resize(source, (1280, 720))
+        with budget.stage("inference"):
+            r = model(frame, imgsz=imgsz, conf=0.25, verbose=False)[0]
+        xyxy = r.boxes.xyxy.cpu().numpy()
+        # The noise frame rarely yields detections; keep the tracker busy with a few drifting boxes
+        boxes = xyxy if len(xyxy) else np.array([[100 + 5 * i + 150 * k, 200, 180 + 5 * i + 150 * k, 320]
+                                                 for k in range(5)], np.float32)
+        dets = [([float(x1), float(y1), float(x2 - x1), float(y2 - y1)], 0.9, 0) for x1, y1, x2, y2 in boxes]
+        with budget.stage("tracker"):
+            if embeds:
+                tracks = tracker.update_tracks(dets, embeds=[rng.random(128) for _ in dets])
+            else:
+                tracks = tracker.update_tracks(dets, frame=frame)
+        with budget.stage("render"):
+            canvas = overlay.begin(frame)
+            for t in tracks:
+                overlay.box(canvas, t.to_ltrb(), f"ID:{t.track_id}", 0)
+        if i >= warmup:
+            times.append(time.perf_counter() - start)
+    ms = np.array(times) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)),
+            "mean_ms": float(ms.mean())}
+
+
+def search(model_path, imgsz, frames):
+    """Run every candidate in its own process; the lowest p95 latency wins"""
+    results = []
+    candidates = candidate_budgets(available_cores())
+    for i, budget in enumerate(candidates):
+        cmd = [sys.executable, os.path.abspath(__file__), "--measure", json.dumps(budget.to_dict()),
+               "--model", model_path, "--imgsz", str(imgsz), "--frames", str(frames)]
+        out = subprocess.run(cmd, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if out.returncode != 0:
+            print(f"[{i + 1}/{len(candidates)}] failed: {out.stderr.strip().splitlines()[-1:]}")
+            continue
+        stats = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"[{i + 1}/{len(candidates)}] p50 {stats['p50_ms']:.1f}ms  p95 {stats['p95_ms']:.1f}ms  "
+              f"{budget.describe()}")
+        results.append((stats, budget))
+    if not results:
+        raise RuntimeError("No candidate allocation could be measured")
+    return min(results, key=lambda r: (r[0]["p95_ms"], r[0]["p50_ms"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find and save the best thread/core allocation for this machine")
+    parser.add_argument("--search", action="store_true", help="Benchmark candidate allocations")
+    parser.add_argument("--measure", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--model", type=str, default="yolo11s.pt", help="YOLO weights used for the benchmark")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size")
+    parser.add_argument("--frames", type=int, default=SEARCH_FRAMES, help="Timed frames per candidate")
+    parser.add_argument("--output", type=str, default="thread_profile.json", help="Where to save the profile")
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        # Child process of --search: one candidate, stats as the last stdout line
+        d = json.loads(args.measure)
+        budget = ThreadBudget(d["stages"], d["interop_threads"], d["blas_threads"])
+        print(json.dumps(measure_budget(budget, args.model, args.imgsz, args.frames)))
+        return 0
+    if not args.search:
+        parser.error("nothing to do; pass --search")
+
+    cores = available_cores()
+    print(f"Searching thread allocations on {len(cores)} cores {cores}")
+    stats, best = search(args.model, args.imgsz, args.frames)
+    profile = {**best.to_dict(), "measured": stats, "cores": cores, "model": args.model, "imgsz": args.imgsz,
+               "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    with open(args.output, "w") as f:
+        json.dump(profile, f, indent=2)
+    print(f"Best: p50 {stats['p50_ms']:.1f}ms  p95 {stats['p95_ms']:.1f}ms  {best.describe()}")
+    print(f"Profile written to: {args.output} (use with --thread-profile)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Per-class confidence threshold profiles (written by scripts/tune_thresholds.py).
+
+A profile is a JSON/YAML file:
+    {"default": 0.25, "thresholds": {"light_on": 0.41, "moisture": 0.18, ...}}
+Classes missing from "thresholds" use "default".
+"""
+import numpy as np
+import yaml
+
+
+def load_threshold_profile(path, names, default=None):
+    """
+    Return a float32 array of per-class thresholds indexed by class id.
+    names: model class names (list or Ultralytics' {id: name} dict).
+    default: overrides the profile's default for classes it doesn't list.
+    """
+    if isinstance(names, dict):
+        names = [names[k] for k in sorted(names)]
+    with open(path, "r") as f:
+        profile = yaml.safe_load(f) or {}
+    fallback = default if default is not None else profile.get("default", 0.25)
+    per_class = profile.get("thresholds", {})
+    unknown = set(per_class) - set(names)
+    if unknown:
+        print(f"Warning: threshold profile {path} has classes the model doesn't know: {sorted(unknown)}")
+    return np.array([per_class.get(name, fallback) for name in names], dtype=np.float32)
+
+
+def class_threshold_mask(classes, scores, thresholds):
+    """Boolean mask of detections whose score passes their class threshold"""
+    classes = np.asarray(classes).astype(np.int64)
+    return np.asarray(scores) >= thresholds[np.clip(classes, 0, len(thresholds) - 1)]
+
+
+def filter_results(result, thresholds):
+    """Apply per-class thresholds to one Ultralytics Results object"""
+    if thresholds is None or len(result.boxes) == 0:
+        return result
+    mask = class_threshold_mask(result.boxes.cls.cpu().numpy(), result.boxes.conf.cpu().numpy(), thresholds)
+    return result[mask]
@@ -0,0 +1,187 @@
+"""
+Bounded-memory per-track summaries for long patrols.
+
+TrackStore keeps one small __slots__ record per live confirmed track: class
+histogram, first/last seen, best confidence with its box, and a trajectory that
+is decimated (every other point dropped, sampling stride doubled) whenever it
+reaches MAX_TRAJECTORY points. A track that has not been matched for `max_age`
+frames (DeepSORT's own deletion age) is finalized: its summary is queued for
+the sink and the record is dropped. Live memory therefore depends only on the
+number of simultaneously visible tracks, not on the patrol length.
+
+Sinks are chosen by file extension and written in batches (every BATCH_SIZE
+summaries or FLUSH_SECONDS, whichever comes first):
+  *.jsonl           one JSON summary per line
+  *.db / *.sqlite   a `tracks` table, one executemany() + commit per batch
+
+Usage:
+  store = TrackStore("runs/patrol.jsonl", names=model.names, max_age=30)
+  for frame in ...:
+      tracks = tracker.update_tracks(dets, frame=frame)
+      store.update(tracks)
+      print(store.unique_count)
+  store.close()                     # finalizes the remaining tracks
+"""
+import json
+import os
+import sqlite3
+import time
+
+MAX_TRAJECTORY = 64            # trajectory points kept per track before decimating
+BATCH_SIZE = 100               # finalized summaries per disk write
+FLUSH_SECONDS = 10.0           # ...or at least this often while summaries are pending
+
+
+class TrackRecord:
+    __slots__ = ("track_id", "first_frame", "last_frame", "first_seen", "last_seen", "hits",
+                 "class_counts", "best_conf", "best_box", "trajectory", "stride")
+
+    def __init__(self, track_id, frame_idx, timestamp):
+        self.track_id = track_id
+        self.first_frame = self.last_frame = frame_idx
+        self.first_seen = self.last_seen = timestamp
+        self.hits = 0
+        self.class_counts = {}
+        self.best_conf = -1.0
+        self.best_box = None
+        self.trajectory = []       # (frame, cx, cy), every `stride`-th hit
+        self.stride = 1
+
+    def add(self, frame_idx, timestamp, cls, conf, box):
+        self.last_frame, self.last_seen = frame_idx, timestamp
+        if cls is not None:
+            self.class_counts[cls] = self.class_counts.get(cls, 0) + 1
+        if conf is not None and conf > self.best_conf:
+            self.best_conf = float(conf)
+            self.best_box = [round(float(v), 1) for v in box]
+        if self.hits % self.stride == 0:
+            x1, y1, x2, y2 = box
+            self.trajectory.append((frame_idx, round(float(x1 + x2) / 2, 1), round(float(y1 + y2) / 2, 1)))
+            if len(self.trajectory) >= MAX_TRAJECTORY:
+                del self.trajectory[1::2]
+                self.stride *= 2
+        self.hits += 1
+
+    def summary(self, names=None):
+        names = names or {}
+        counts = {names.get(c, str(c)): n for c, n in sorted(self.class_counts.items())}
+        return {
+            "track_id": str(self.track_id),
+            "class": max(counts, key=counts.get) if counts else None,
+            "class_counts": counts,
+            "first_frame": self.first_frame,
+            "last_frame": self.last_frame,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "duration_s": round(self.last_seen - self.first_seen, 3),
+            "hits": self.hits,
+            "best_conf": round(self.best_conf, 4) if self.best_conf >= 0 else None,
+            "best_box": self.best_box,
+            "trajectory": [list(p) for p in self.trajectory],
+        }
+
+# ----- Sinks -----
+
+class JsonlSink:
+    def __init__(self, path):
+        self.f = open(path, "a")
+
+    def write(self, summaries):
+        self.f.write("".join(json.dumps(s) + "\n" for s in summaries))
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class SqliteSink:
+    COLUMNS = ("track_id", "class", "first_frame", "last_frame", "first_seen", "last_seen", "duration_s",
+               "hits", "best_conf", "best_box", "class_counts", "trajectory")
+    JSON_COLUMNS = ("best_box", "class_counts", "trajectory")
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS tracks (session TEXT, track_id TEXT, class TEXT, "
+                        "first_frame INTEGER, last_frame INTEGER, first_seen REAL, last_seen REAL, "
+                        "duration_s REAL, hits INTEGER, best_conf REAL, best_box TEXT, class_counts TEXT, "
+                        "trajectory TEXT)")
+        self.db.commit()
+        # DeepSORT restarts its ids at 1, so rows are told apart by the run they came from
+        self.session = time.strftime("%Y%m%d-%H%M%S")
+
+    def write(self, summaries):
+        rows = [(self.session,) + tuple(json.dumps(s[c]) if c in self.JSON_COLUMNS else s[c] for c in self.COLUMNS)
+                for s in summaries]
+        self.db.executemany(f"INSERT INTO tracks VALUES ({', '.join('?' * (len(self.COLUMNS) + 1))})", rows)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def open_sink(path):
+    if path is None:
+        return None
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.splitext(path)[1].lower() in (".db", ".sqlite", ".sqlite3"):
+        return SqliteSink(path)
+    return JsonlSink(path)
+
+# ----- Store -----
+
+class TrackStore:
+    def __init__(self, path=None, names=None, max_age=30, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.sink = open_sink(path)
+        self.names = names or {}
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.live = {}             # track_id -> TrackRecord
+        self.pending = []          # finalized summaries not yet written
+        self.last_flush = time.monotonic()
+        self.frame_idx = -1
+        self.unique_count = 0      # confirmed tracks ever seen
+        self.finalized = 0
+
+    def update(self, tracks, timestamp=None):
+        """Record this frame's matched confirmed tracks and finalize the ones gone for max_age frames"""
+        self.frame_idx += 1
+        timestamp = time.time() if timestamp is None else timestamp
+        for t in tracks:
+            # time_since_update > 0: only predicted this frame, not a detection
+            if not t.is_confirmed() or t.time_since_update > 0:
+                continue
+            record = self.live.get(t.track_id)
+            if record is None:
+                record = self.live[t.track_id] = TrackRecord(t.track_id, self.frame_idx, timestamp)
+                self.unique_count += 1
+            record.add(self.frame_idx, timestamp, t.det_class, t.det_conf, t.to_ltrb())
+
+        expired = [tid for tid, r in self.live.items() if self.frame_idx - r.last_frame > self.max_age]
+        for tid in expired:
+            self.finalize(tid)
+        # Time-based flush also on quiet frames, so a lone summary isn't held until the next track ends
+        if self.pending and time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def finalize(self, track_id):
+        record = self.live.pop(track_id)
+        self.finalized += 1
+        if self.sink is not None:
+            self.pending.append(record.summary(self.names))
+            if (len(self.pending) >= self.batch_size
+                    or time.monotonic() - self.last_flush >= self.flush_seconds):
+                self.flush()
+
+    def flush(self):
+        if self.sink is not None and self.pending:
+            self.sink.write(self.pending)
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        for tid in list(self.live):
+            self.finalize(tid)
+        self.flush()
+        if self.sink is not None:
+            self.sink.close()
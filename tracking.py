@@ -1,76 +1,198 @@
+import argparse
+import time
+
 import cv2
 import numpy as np
-from ultralytics import YOLO
-from deep_sort_realtime.deepsort_tracker import DeepSort
+
+from embedding_cache import REFRESH_EVERY, EmbeddingCache
+from frame_bus import open_capture
+from keyframe_flow import FlowDetector, add_flow_args
+from metrics import add_metrics_args, metrics_from_args
+from overlay import OverlayRenderer, add_overlay_args
+from quality_controller import QualityController, add_quality_args
+from roi_inference import DISCOVERY_INTERVAL, ROI_IMGSZ, RoiDetector
+from thread_budget import add_thread_args, load_thread_profile
+from track_store import TrackStore
+from thresholds import class_threshold_mask, load_threshold_profile
 
 # --- PARAMETERS ---
 CAM_IDX = 0                    # which camera to open
-CONF_THRESH = 0.324            # min detection confidence
+CONF_THRESH = 0.324            # min detection confidence (without a threshold profile)
 STATIONARY_THRESH = 5000       # max # of changed pixels to be 'stationary'
 DIFF_THRESH = 25               # per‑pixel diff threshold
+MODEL_PATH = '/home/ruhalis/github/yolo-detection-tracking/runs/detect/train2/weights/best.pt'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Real-time detection + DeepSORT tracking from a camera")
+    parser.add_argument("--model", type=str, default=MODEL_PATH, help="Path to the YOLO model weights")
+    parser.add_argument("--camera", type=int, default=CAM_IDX, help="Camera index")
+    parser.add_argument("--bus", type=str, default=None,
+                        help="Read frames from this frame_bus.py capture daemon instead of the camera")
+    parser.add_argument("--conf", type=float, default=CONF_THRESH, help="Confidence threshold")
+    parser.add_argument("--thresholds", type=str, default=None,
+                        help="Per-class threshold profile from scripts/tune_thresholds.py")
+    parser.add_argument("--roi", action="store_true",
+                        help="Between full-frame passes, only infer crops around predicted track positions")
+    parser.add_argument("--discovery-interval", type=int, default=DISCOVERY_INTERVAL,
+                        help="Full-frame pass every N frames in --roi mode")
+    parser.add_argument("--roi-imgsz", type=int, default=ROI_IMGSZ, help="Inference size for ROI crops")
+    parser.add_argument("--embed-cache", action="store_true",
+                        help="Reuse a track's appearance embedding while its box barely changes")
+    parser.add_argument("--embed-refresh", type=int, default=REFRESH_EVERY,
+                        help="With --embed-cache, re-embed every track at least every N frames")
+    parser.add_argument("--track-log", type=str, default=None,
+                        help="Stream per-track summaries to this .jsonl or .db (SQLite) file")
+    add_flow_args(parser)
+    add_quality_args(parser)
+    add_overlay_args(parser)
+    add_thread_args(parser)
+    add_metrics_args(parser)
+    args = parser.parse_args(argv)
+    if args.roi and args.keyframe_interval > 1:
+        parser.error("--roi and --keyframe-interval are alternative ways to skip full-frame inference; pick one")
+    # The quality controller reads the stage timings, so they are collected even without a metrics output
+    metrics = metrics_from_args(args, "tracking", enabled=args.latency_budget is not None)
+    # Thread pools are sized before torch spins them up
+    budget = load_thread_profile(args.thread_profile).apply()
+
+    # --- INITIALIZE ---
+    cap = open_capture(args.camera, args.bus)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open {'bus ' + args.bus if args.bus else 'camera ' + str(args.camera)}")
+
+    # Heavy imports only once the arguments are parsed, so --help stays instant
+    from ultralytics import YOLO
+    from deep_sort_realtime.deepsort_tracker import DeepSort
+
+    model = YOLO(args.model)
+    tracker = DeepSort(
+        max_age=30,       # frames to keep 'dead' tracks
+        n_init=3,         # frames until track is confirmed
+        max_cosine_distance=0.2
+    )
+    embed_cache = EmbeddingCache(tracker, refresh_every=args.embed_refresh) if args.embed_cache else None
+
+    # One threshold per class id; a flat array when no profile is given
+    if args.thresholds:
+        thresholds = load_threshold_profile(args.thresholds, model.names)
+    else:
+        thresholds = np.full(len(model.names), args.conf, dtype=np.float32)
+    min_conf = float(thresholds.min())
+    roi_detector = RoiDetector(model, conf=min_conf, discovery_interval=args.discovery_interval,
+                               roi_imgsz=args.roi_imgsz) if args.roi else None
+    flow = FlowDetector(model, conf=min_conf, thresholds=thresholds,
+                        keyframe_interval=args.keyframe_interval) if args.keyframe_interval > 1 else None
+    knobs = ("imgsz", "skip", "render_every") + (("embed_refresh",) if embed_cache is not None else ())
+    controller = QualityController(args.latency_budget, knobs=knobs, max_imgsz=args.max_imgsz,
+                                   min_imgsz=args.min_imgsz, embed_refresh=args.embed_refresh,
+                                   render_every=args.render_every) if args.latency_budget else None
+    tracks, raw_dets = [], []
+
+    overlay = OverlayRenderer(scale=args.display_scale, every=args.render_every)
+    # Per-track summaries in constant memory; dead tracks are finalized after DeepSORT's max_age
+    store = TrackStore(args.track_log, names=model.names, max_age=tracker.tracker.max_age)
+    last_gray = None
+
+    print("Press 'q' to quit.")
+    while True:
+        with metrics.stage("capture"), budget.stage("capture"):
+            ret, frame = cap.read()
+            if ret and args.bus:
+                # A bus frame is a view into a ring slot that the daemon reuses N frames later;
+                # this loop holds it for detection, embedding and drawing, so take a private copy
+                frame = frame.copy()
+        if not ret:
+            break
+
+
+
+        # The quality controller picks the inference size and may skip the detector and tracker on a frame
+        # (the last tracks stay on screen; max_age and n_init count tracker updates, so they are unaffected)
+        detect = controller is None or controller.detect_now()
+        if detect:
+            # 2) Run YOLO → get raw xyxy boxes + scores + classes
+            imgsz = controller.imgsz if controller is not None else None
+            if roi_detector is not None:
+                roi_detector.imgsz = imgsz
+                # Full frame or crops around where the tracks (tentative ones included) will be
+                with metrics.stage("inference"), budget.stage("inference"):
+                    xyxy, scores, classes = roi_detector(frame, tracker.tracker.tracks)
+            elif flow is not None:
+                flow.imgsz = imgsz
+                # Keyframe detection; boxes carried by optical flow in between
+                with metrics.stage("inference"), budget.stage("inference"):
+                    xyxy, scores, classes = flow(frame)
+            else:
+                with budget.stage("inference"):
+                    results = model(frame, conf=min_conf, verbose=False, **({"imgsz": imgsz} if imgsz else {}))[0]
+                metrics.record_speed(results.speed)
+                xyxy   = results.boxes.xyxy.cpu().numpy()    # (N,4): x1,y1,x2,y2
+                scores = results.boxes.conf.cpu().numpy()    # (N,)
+                classes= results.boxes.cls.cpu().numpy()     # (N,)
+
+            # Drop detections below their class threshold before they reach the tracker
+            keep = class_threshold_mask(classes, scores, thresholds)
+            xyxy, scores, classes = xyxy[keep], scores[keep], classes[keep]
+
+            # 3) Convert to DeepSORT's ([x,y,w,h], score, cls) tuples
+            raw_dets = []
+            for (x1,y1,x2,y2), conf, cls in zip(xyxy, scores, classes):
+                w = x2 - x1
+                h = y2 - y1
+                bbox_xywh = [float(x1), float(y1), float(w), float(h)]
+                raw_dets.append((bbox_xywh, float(conf), int(cls)))
+
+            # 4) Update DeepSORT
+            with metrics.stage("tracker"), budget.stage("tracker"):
+                if embed_cache is not None:
+                    if controller is not None:
+                        embed_cache.refresh_every = controller.embed_refresh
+                    tracks = embed_cache.update_tracks(raw_dets, frame)
+                else:
+                    tracks = tracker.update_tracks(raw_dets, frame=frame)
+        render_start = time.perf_counter()
+        budget.use("render")
+
+        # 5) Count, and draw on the overlay canvas (None on frames skipped by --render-every)
+        if detect:
+            store.update(tracks)
+        canvas = overlay.begin(frame)
+        if canvas is not None:
+            for t in tracks:
+                if not t.is_confirmed():
+                    continue
+                tid = t.track_id
+                cls = t.det_class  # get class id
+                class_name = model.names.get(cls, str(cls))
+                overlay.box(canvas, t.to_ltrb(), f"{class_name} ID:{tid}", cls)  # left, top, right, bottom
+
+            overlay.text(canvas, f"Unique objects: {store.unique_count}", (20, 10), font_scale=1.0)
+            if roi_detector is not None:
+                overlay.text(canvas, f"Pass: {roi_detector.last_mode}", (20, 50))
+            elif flow is not None:
+                overlay.text(canvas, f"Pass: {flow.last_mode}", (20, 50))
+            cv2.imshow("Inspection", canvas)
+        metrics.record("render", time.perf_counter() - render_start)
+        if controller is not None:
+            overlay.every = controller.render_every
+            if controller.frame_done(metrics):
+                print(f"Quality: {controller.describe()} "
+                      f"(frame {controller.frame_time * 1000:.0f} ms, target {args.latency_budget:.0f} ms)")
+        metrics.frame_done(detections=len(raw_dets), tracks=len(tracks))
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    store.close()
+    if embed_cache is not None:
+        print(f"Embeddings reused for {embed_cache.reuse_ratio:.0%} of detections")
+    if flow is not None:
+        print(f"Detector ran on {flow.keyframe_ratio:.0%} of frames ({flow.flow_failures} flow-check failures)")
+    if args.track_log:
+        print(f"{store.finalized} track summaries written to: {args.track_log}")
+    metrics.close()
+    cap.release()
+    cv2.destroyAllWindows()
 
-# --- INITIALIZE ---
-cap = cv2.VideoCapture(CAM_IDX)
-if not cap.isOpened():
-    raise RuntimeError(f"Cannot open camera {CAM_IDX}")
-
-model = YOLO('/home/ruhalis/github/yolo-detection-tracking/runs/detect/train2/weights/best.pt')     
-tracker = DeepSort(
-    max_age=30,       # frames to keep 'dead' tracks
-    n_init=3,         # frames until track is confirmed
-    max_cosine_distance=0.2
-)
-
-unique_ids = set()
-last_gray = None
-
-print("Press 'q' to quit.")
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-
-
-    # 2) Run YOLO → get raw xyxy boxes + scores + classes
-    results = model(frame)[0]
-    xyxy   = results.boxes.xyxy.cpu().numpy()    # (N,4): x1,y1,x2,y2
-    scores = results.boxes.conf.cpu().numpy()    # (N,)
-    classes= results.boxes.cls.cpu().numpy()     # (N,)
-
-    # 3) Convert to DeepSORT's ([x,y,w,h], score, cls) tuples
-    raw_dets = []
-    for (x1,y1,x2,y2), conf, cls in zip(xyxy, scores, classes):
-        if conf < CONF_THRESH:
-            continue
-        w = x2 - x1
-        h = y2 - y1
-        bbox_xywh = [float(x1), float(y1), float(w), float(h)]
-        raw_dets.append((bbox_xywh, float(conf), int(cls)))
-
-    # 4) Update DeepSORT
-    tracks = tracker.update_tracks(raw_dets, frame=frame)
-
-    # 5) Draw + count
-    for t in tracks:
-        if not t.is_confirmed():
-            continue
-        tid = t.track_id
-        cls = t.det_class  # get class id
-        class_name = model.names.get(cls, str(cls))
-        unique_ids.add(tid)
-        x1,y1,w,h = t.to_ltrb()  # left, top, right, bottom
-        x1, y1, x2, y2 = int(x1), int(y1), int(w), int(h)
-        cv2.rectangle(frame, (x1,y1), (x2,y2), (0,255,0), 2)
-        cv2.putText(frame, f"{class_name} ID:{tid}", (x1, y1-10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,0), 2)
-
-    cv2.putText(frame, f"Unique objects: {len(unique_ids)}", (20, 30),
-                cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255,255,0), 2)
-    cv2.imshow("Inspection", frame)
-
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-cap.release()
-cv2.destroyAllWindows()
+if __name__ == "__main__":
+    main()
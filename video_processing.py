@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Offline detection / tracking of recorded videos on every core.
+
+The video is cut into segments at keyframes (found with ffprobe when it is
+installed, otherwise at even frame counts) and each segment is processed by a
+worker process with its own model copy:
+  detect  batched YOLO predict over the segment's frames
+  track   the same plus DeepSORT; every segment after the first starts
+          --overlap frames early, and the tracks seen in that shared window
+          are matched (IoU over the common frames, Hungarian) to the previous
+          segment's tracks so IDs continue across segment boundaries
+The stitched results are written as per-frame YOLO label files
+(labels/<stem>_<frame>.txt: cls cx cy w h conf [id]) plus tracks.txt in
+MOTChallenge format when tracking. Then a second parallel pass draws them, and
+each worker hands its frames to a background encoder thread. The part videos
+are joined with ffmpeg when it is installed, otherwise by appending them with
+OpenCV.
+
+Example:
+  python video_processing.py --video patrol.mp4 --model runs/detect/train2/weights/best.pt --mode track
+  python video_processing.py --video patrol.mp4 --mode detect --workers 8 --no-video
+"""
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from detections import pairwise_overlap
+
+OVERLAP = 30                   # frames each tracking segment re-processes before its start
+BATCH = 8                      # frames per predict call in a worker
+STITCH_IOU = 0.5               # boxes on a shared frame count as the same object above this IoU
+STITCH_MIN_FRAMES = 3          # shared frames needed to carry an ID over a boundary
+WRITER_QUEUE = 64              # frames buffered for the encoder thread
+
+
+# ----- Segments -----
+def keyframe_indices(video, fps):
+    """Frame indices of the keyframes via ffprobe, or None when ffprobe is not installed"""
+    if shutil.which("ffprobe") is None:
+        return None
+    out = subprocess.run(["ffprobe", "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+                          "-show_entries", "frame=pts_time", "-of", "csv=p=0", video],
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        return None
+    times = [float(t) for t in out.stdout.split() if t.replace(".", "", 1).isdigit()]
+    return sorted({int(round(t * fps)) for t in times})
+
+
+def plan_segments(n_frames, n_segments, keyframes=None):
+    """[(start, end)] covering 0..n_frames, with boundaries snapped to the nearest keyframe"""
+    bounds = [round(i * n_frames / n_segments) for i in range(1, n_segments)]
+    if keyframes:
+        keys = np.array([k for k in keyframes if 0 < k < n_frames])
+        if len(keys):
+            bounds = [int(keys[np.abs(keys - b).argmin()]) for b in bounds]
+    bounds = sorted(set(b for b in bounds if 0 < b < n_frames))
+    edges = [0] + bounds + [n_frames]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def read_range(cap, start, end):
+    """Yield (frame index, frame) for start <= index < end (end=None reads to EOF)"""
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    idx = start
+    while end is None or idx < end:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield idx, frame
+        idx += 1
+
+
+# ----- Workers -----
+_worker = {}
+
+
+def init_worker(model_path, threads, thresholds_path, embedder):
+    """Pool initializer: one model (and thread budget) per process"""
+    import torch
+    from ultralytics import YOLO
+
+    from thresholds import load_threshold_profile
+
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(1)
+    model = YOLO(model_path)
+    _worker.update(model=model, embedder=embedder,
+                   thresholds=load_threshold_profile(thresholds_path, model.names) if thresholds_path else None)
+
+
+def detect_segment(task):
+    """Run one segment; saves frame/box/score/class/track-id arrays and returns (index, path, frames, names)"""
+    from thresholds import class_threshold_mask
+
+    index, video, start, end, read_from, conf, imgsz, batch, track, work_dir = task
+    model, thresholds = _worker["model"], _worker["thresholds"]
+    tracker = None
+    if track:
+        from deep_sort_realtime.deepsort_tracker import DeepSort
+        tracker = DeepSort(max_age=30, n_init=3, max_cosine_distance=0.2, embedder=_worker["embedder"])
+    if thresholds is not None:
+        conf = float(thresholds.min())
+
+    frames, boxes, scores, classes, ids = [], [], [], [], []
+
+    def flush(chunk):
+        results = model.predict(source=[f for _, f in chunk], conf=conf, imgsz=imgsz, verbose=False)
+        for (idx, frame), r in zip(chunk, results):
+            b = r.boxes.xyxy.cpu().numpy()
+            s = r.boxes.conf.cpu().numpy()
+            c = r.boxes.cls.cpu().numpy().astype(int)
+            if thresholds is not None:
+                keep = class_threshold_mask(c, s, thresholds)
+                b, s, c = b[keep], s[keep], c[keep]
+            if tracker is not None:
+                dets = [([float(x1), float(y1), float(x2 - x1), float(y2 - y1)], float(sc), int(cl))
+                        for (x1, y1, x2, y2), sc, cl in zip(b, s, c)]
+                tracks = [t for t in tracker.update_tracks(dets, frame=frame)
+                          if t.is_confirmed() and t.time_since_update == 0]
+                b = np.array([t.to_ltrb(orig=True) for t in tracks], np.float32).reshape(-1, 4)
+                s = np.array([t.det_conf or 0.0 for t in tracks], np.float32)
+                c = np.array([t.det_class for t in tracks], int)
+                ids.append(np.array([int(t.track_id) for t in tracks], np.int64))
+            frames.append(np.full(len(b), idx, np.int64))
+            boxes.append(b.astype(np.float32))
+            scores.append(s.astype(np.float32))
+            classes.append(c)
+
+    cap = cv2.VideoCapture(video)
+    chunk, n = [], 0
+    for idx, frame in read_range(cap, read_from, end):
+        chunk.append((idx, frame))
+        n += 1
+        # DeepSORT needs the frames in order, one at a time, so only detection is batched
+        if len(chunk) == batch:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    cap.release()
+
+    path = os.path.join(work_dir, f"segment_{index:04d}.npz")
+    cat = lambda parts, dtype, shape=(0,): np.concatenate(parts).astype(dtype) if parts else np.zeros(shape, dtype)
+    np.savez(path, frames=cat(frames, np.int64), boxes=cat(boxes, np.float32, (0, 4)),
+             scores=cat(scores, np.float32), classes=cat(classes, np.int64),
+             ids=cat(ids, np.int64) if track else np.zeros(0, np.int64))
+    return index, path, n, dict(model.names)
+
+
+def render_segment(task):
+    """Draw the final results on one segment and encode it to a part file"""
+    from overlay import OverlayRenderer
+
+    video, start, end, results_path, names, part_path, fps, size = task
+    res = np.load(results_path)
+    lo, hi = np.searchsorted(res["frames"], [start, end if end is not None else np.iinfo(np.int64).max])
+    frames, boxes, classes, scores = res["frames"][lo:hi], res["boxes"][lo:hi], res["classes"][lo:hi], res["scores"][lo:hi]
+    ids = res["ids"][lo:hi] if len(res["ids"]) else None
+    overlay = OverlayRenderer()
+    writer = AsyncWriter(part_path, fps, size)
+    cap = cv2.VideoCapture(video)
+    row = 0
+    for idx, frame in read_range(cap, start, end):
+        stop = np.searchsorted(frames, idx, side="right")
+        canvas = overlay.begin(frame)
+        for k in range(row, stop):
+            name = names.get(int(classes[k]), str(classes[k]))
+            label = f"{name} ID:{ids[k]}" if ids is not None else f"{name} {scores[k]:.1f}"
+            overlay.box(canvas, boxes[k], label, classes[k])
+        row = stop
+        writer.write(canvas)
+    cap.release()
+    writer.close()
+    return part_path
+
+
+class AsyncWriter:
+    """cv2.VideoWriter fed from a bounded queue by a background thread"""
+
+    def __init__(self, path, fps, size, fourcc="mp4v"):
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        self.queue = queue.Queue(maxsize=WRITER_QUEUE)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                break
+            self.writer.write(frame)
+
+    def write(self, frame):
+        self.queue.put(frame)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.writer.release()
+
+
+def join_parts(parts, output, fps, size):
+    """Concatenate part videos: stream copy with ffmpeg, else re-encode with OpenCV"""
+    if shutil.which("ffmpeg"):
+        list_path = output + ".parts.txt"
+        with open(list_path, "w") as f:
+            f.writelines(f"file '{os.path.abspath(p)}'\n" for p in parts)
+        out = subprocess.run(["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+                              "-c", "copy", output], capture_output=True)
+        os.remove(list_path)
+        if out.returncode == 0:
+            return
+    writer = AsyncWriter(output, fps, size)
+    for part in parts:
+        cap = cv2.VideoCapture(part)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            writer.write(frame)
+        cap.release()
+    writer.close()
+
+
+# ----- Stitching -----
+def stitch(segments, results):
+    """
+    Merge per-segment results into one frame-sorted set. Rows in a segment's
+    overlap window belong to the previous segment; in tracking mode they are
+    used to map the segment's local IDs onto the previous segment's global IDs.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    merged = {k: [] for k in ("frames", "boxes", "scores", "classes", "ids")}
+    prev = None                    # previous segment's rows, ids already global
+    next_id = 1
+    for (start, end), res in zip(segments, results):
+        res = {k: res[k] for k in res.files}
+        tracking = len(res["ids"]) or (prev is not None and len(prev["ids"]))
+        if tracking and len(res["frames"]):
+            mapping = {}
+            if prev is not None:
+                # Count the shared frames on which a local track and a previous global track coincide
+                shared = np.unique(res["frames"][res["frames"] < start])
+                local_ids, global_ids = np.unique(res["ids"]), np.unique(prev["ids"])
+                votes = np.zeros((len(local_ids), len(global_ids)))
+                for f in shared:
+                    a, b = res["frames"] == f, prev["frames"] == f
+                    if a.any() and b.any():
+                        gi, gj = np.nonzero(pairwise_overlap(res["boxes"][a], prev["boxes"][b]) >= STITCH_IOU)
+                        np.add.at(votes, (np.searchsorted(local_ids, res["ids"][a][gi]),
+                                          np.searchsorted(global_ids, prev["ids"][b][gj])), 1)
+                if votes.size:
+                    for r, c in zip(*linear_sum_assignment(-votes)):
+                        if votes[r, c] >= STITCH_MIN_FRAMES:
+                            mapping[local_ids[r]] = global_ids[c]
+            for lid in np.unique(res["ids"]):
+                if lid not in mapping:
+                    mapping[lid] = next_id
+                    next_id += 1
+            res["ids"] = np.array([mapping[i] for i in res["ids"]], np.int64)
+            next_id = max(next_id, int(res["ids"].max(initial=0)) + 1)
+        prev = res
+        own = (res["frames"] >= start) & (res["frames"] < end)
+        for k in merged:
+            if len(res[k]) or k != "ids":
+                merged[k].append(res[k][own] if len(res[k]) else res[k])
+    out = {k: np.concatenate(v) if v else np.zeros(0) for k, v in merged.items()}
+    order = np.argsort(out["frames"], kind="stable")
+    return {k: v[order] if len(v) == len(order) else v for k, v in out.items()}
+
+
+def write_labels(results, labels_dir, stem, size, tracking):
+    """Ultralytics-style per-frame label files, 1-based frame numbers"""
+    os.makedirs(labels_dir, exist_ok=True)
+    w, h = size
+    frames = results["frames"]
+    edges = np.flatnonzero(np.diff(frames)) + 1
+    for group in np.split(np.arange(len(frames)), edges):
+        if not len(group):
+            continue
+        lines = []
+        for k in group:
+            x1, y1, x2, y2 = results["boxes"][k]
+            line = (f"{int(results['classes'][k])} {(x1 + x2) / 2 / w:.6f} {(y1 + y2) / 2 / h:.6f} "
+                    f"{(x2 - x1) / w:.6f} {(y2 - y1) / h:.6f} {results['scores'][k]:.4f}")
+            lines.append(line + (f" {int(results['ids'][k])}" if tracking else ""))
+        with open(os.path.join(labels_dir, f"{stem}_{int(frames[group[0]]) + 1}.txt"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def write_tracks(results, path):
+    """MOTChallenge: frame, id, left, top, width, height, conf, -1, -1, -1"""
+    with open(path, "w") as f:
+        for frame, tid, (x1, y1, x2, y2), conf in zip(results["frames"], results["ids"], results["boxes"],
+                                                      results["scores"]):
+            f.write(f"{frame + 1},{tid},{x1:.2f},{y1:.2f},{x2 - x1:.2f},{y2 - y1:.2f},{conf:.4f},-1,-1,-1\n")
+
+
+# ----- Main -----
+def process_video(video, model_path, output, mode="detect", workers=None, segments=None, overlap=OVERLAP,
+                  conf=0.25, imgsz=640, batch=BATCH, thresholds=None, embedder="mobilenet", write_video=True):
+    workers = workers or os.cpu_count() or 1
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open {video}")
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    cap.release()
+
+    keyframes = keyframe_indices(video, fps)
+    plan = plan_segments(n_frames, segments or workers, keyframes)
+    # The last segment reads to EOF, since CAP_PROP_FRAME_COUNT is only an estimate for some containers
+    plan[-1] = (plan[-1][0], np.iinfo(np.int64).max)
+    print(f"{video}: ~{n_frames} frames at {fps:.1f} fps, {len(plan)} segments "
+          f"({'keyframe-aligned' if keyframes else 'even splits, ffprobe not found'}), {workers} workers")
+
+    stem = os.path.splitext(os.path.basename(video))[0]
+    work_dir = os.path.join(output, ".segments")
+    os.makedirs(work_dir, exist_ok=True)
+    track = mode == "track"
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    tasks = [(i, video, start, None if end == np.iinfo(np.int64).max else end,
+              max(0, start - overlap) if track else start, conf, imgsz, batch, track, work_dir)
+             for i, (start, end) in enumerate(plan)]
+
+    start_time = time.perf_counter()
+    # spawn: the workers load torch themselves instead of inheriting a forked parent
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers, initializer=init_worker, initargs=(model_path, threads, thresholds, embedder)) as pool:
+        done, names = {}, {}
+        for index, path, n, names in pool.imap_unordered(detect_segment, tasks):
+            done[index] = path
+            print(f"  segment {index + 1}/{len(plan)} done ({n} frames)")
+        results = stitch(plan, [np.load(done[i]) for i in range(len(plan))])
+        detect_seconds = time.perf_counter() - start_time
+        frames_done = len(np.unique(results["frames"]))
+
+        write_labels(results, os.path.join(output, "labels"), stem, size, track)
+        if track:
+            write_tracks(results, os.path.join(output, "tracks.txt"))
+        results_path = os.path.join(work_dir, "results.npz")
+        np.savez(results_path, **results)
+
+        annotated = None
+        if write_video:
+            parts = [os.path.join(work_dir, f"part_{i:04d}.mp4") for i in range(len(plan))]
+            render_tasks = [(video, start, None if end == np.iinfo(np.int64).max else end, results_path, names,
+                             part, fps, size) for (start, end), part in zip(plan, parts)]
+            list(pool.imap(render_segment, render_tasks))
+            annotated = os.path.join(output, f"{stem}_annotated.mp4")
+            join_parts(parts, annotated, fps, size)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    total = time.perf_counter() - start_time
+    print(f"{'Tracking' if track else 'Detection'}: {detect_seconds:.1f}s; total {total:.1f}s "
+          f"({n_frames / max(total, 1e-9):.1f} fps over ~{n_frames} frames)")
+    print(f"Labels: {os.path.join(output, 'labels')}" + (f", tracks: {os.path.join(output, 'tracks.txt')}" if track else ""))
+    if annotated:
+        print(f"Annotated video: {annotated}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline detection/tracking of a recorded video with parallel workers")
+    parser.add_argument("--video", required=True, help="Recorded video")
+    parser.add_argument("--model", type=str, default="yolo11s.pt", help="Path to the YOLO model weights")
+    parser.add_argument("--mode", choices=["detect", "track"], default="detect")
+    parser.add_argument("--output", default=None, help="Output directory (default: runs/video/<video stem>)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--segments", type=int, default=None, help="Number of segments (default: --workers)")
+    parser.add_argument("--overlap", type=int, default=OVERLAP,
+                        help="Frames each tracking segment re-processes to stitch IDs")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--thresholds", type=str, default=None,
+                        help="Per-class threshold profile from scripts/tune_thresholds.py")
+    parser.add_argument("--imgsz", type=int, default=640, help="Inference image size")
+    parser.add_argument("--batch", type=int, default=BATCH, help="Frames per predict call")
+    parser.add_argument("--embedder", default="mobilenet", help="DeepSORT embedder for --mode track")
+    parser.add_argument("--no-video", action="store_true", help="Only write label/track files")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.join("runs", "video", os.path.splitext(os.path.basename(args.video))[0])
+    process_video(args.video, args.model, output, args.mode, args.workers, args.segments, args.overlap,
+                  args.conf, args.imgsz, args.batch, args.thresholds, args.embedder, not args.no_video)
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
-import cv2
-import numpy as np
 import argparse
 import sys
 
+# cv2 and numpy are imported inside the functions that use them, so `--help` starts without them
+
 # ----------------------------------------------------------------------
 # configurable defaults
 CENTER_FRACTION = 0.33        # size of the centre ROI
@@ -16,6 +16,9 @@ RESIZE_HEIGHT = 1024          # target height for resizing
 
 def white_mask(image, sat_max=WHITE_SAT_MAX, val_min=WHITE_VAL_MIN):
     """binary mask of 'white enough' pixels in image"""
+    import cv2
+    import numpy as np
+
     hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
     
     # allow any hue, sat <= sat_max, val >= val_min
@@ -30,6 +33,32 @@ def white_mask(image, sat_max=WHITE_SAT_MAX, val_min=WHITE_VAL_MIN):
     return mask
 
 
+def white_coefficient(frame, center_fraction=CENTER_FRACTION, sat_max=WHITE_SAT_MAX,
+                      val_min=WHITE_VAL_MIN, use_roi=False):
+    """
+    White coefficient of a BGR frame → (coef, (x0, y0, x1, y1) or None, mask)
+    use_roi: measure only the centre ROI instead of the entire frame.
+    """
+    h, w = frame.shape[:2]
+    if not use_roi:
+        mask = white_mask(frame, sat_max, val_min)
+        return mask.mean() / 255.0, None, mask
+
+    # Calculate ROI dimensions (2x wider horizontally, 1.5x taller)
+    roi_w = int(min(h, w) * center_fraction / 2)
+    roi_h = int(min(h, w) * center_fraction * 1.5)
+    roi_h = min(roi_h, h)
+
+    # Extract ROI
+    x0 = (w - roi_w) // 2
+    y0 = (h - roi_h) // 2
+    roi = frame[y0:y0 + roi_h, x0:x0 + roi_w]
+
+    # Get mask for ROI
+    mask = white_mask(roi, sat_max, val_min)
+    return mask.mean() / 255.0, (x0, y0, x0 + roi_w, y0 + roi_h), mask
+
+
 def calculate_white_coefficient(image_path, center_fraction=CENTER_FRACTION,
                                sat_max=WHITE_SAT_MAX, val_min=WHITE_VAL_MIN, 
                                display=False, use_roi=False, resize=False):
@@ -48,6 +77,8 @@ def calculate_white_coefficient(image_path, center_fraction=CENTER_FRACTION,
     Returns:
         float: White coefficient (0-1)
     """
+    import cv2
+
     frame = cv2.imread(image_path)
     if frame is None:
         raise ValueError(f"could not read image: {image_path}")
@@ -61,30 +92,13 @@ def calculate_white_coefficient(image_path, center_fraction=CENTER_FRACTION,
         print(f"Resized image to {RESIZE_WIDTH}x{RESIZE_HEIGHT}")
 
     h, w = frame.shape[:2]
-    
-    if use_roi:
-        # Calculate ROI dimensions (2x wider horizontally, 1.5x taller)
-        roi_w = int(min(h, w) * center_fraction / 2)
-        roi_h = int(min(h, w) * center_fraction * 1.5)
-        roi_h = min(roi_h, h)
-        
-        # Extract ROI
-        x0 = (w - roi_w) // 2
-        y0 = (h - roi_h) // 2
-        roi = frame[y0:y0 + roi_h, x0:x0 + roi_w]
-        
-        # Get mask for ROI
-        mask = white_mask(roi, sat_max, val_min)
-        white_coef = mask.mean() / 255.0
-        
-        # For display
-        if display:
-            cv2.rectangle(frame, (x0, y0), (x0 + roi_w, y0 + roi_h),
-                        (0, 255, 0) if white_coef > COEFF_THRESH else (0, 0, 255), 2)
-    else:
-        # Process the entire image
-        mask = white_mask(frame, sat_max, val_min)
-        white_coef = mask.mean() / 255.0
+    white_coef, roi_box, mask = white_coefficient(frame, center_fraction, sat_max, val_min, use_roi)
+
+    # For display
+    if display and roi_box is not None:
+        x0, y0, x1, y1 = roi_box
+        cv2.rectangle(frame, (x0, y0), (x1, y1),
+                    (0, 255, 0) if white_coef > COEFF_THRESH else (0, 0, 255), 2)
 
     if display:
         # Add text with coefficient value